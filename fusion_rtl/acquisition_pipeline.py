@@ -1,45 +1,59 @@
+import logging
+
 from litex.gen import *
 from litex.soc.cores.clock.common import *
 from migen.genlib.fifo import SyncFIFO
 
 from .com.nor_interface import Stm32FmcNorInterface
-from .com.ft245 import ft245
+from .com.ft245 import ft245, ft245_sync
+from .com.ft60x import ft60x
+from .com.fmc_registers import FmcRegisterFile
+from .clk import ProgrammableClkDiv
 from .adc.ads92x4 import Ads92x4
-from .com.data_encoder import DataEncoder, DataEncoder2
-from .memories.fifo_8_to_32_bits import Fifo8to32Bits
+from .adc.ads92x4_ddr import Ads92x4DDR
+from .com.data_encoder import DataEncoder, DataEncoder2, DataEncoderWide
+from .com.rice_encoder import RiceEncoder
+from .memories.fifo_8_to_32_bits import Fifo8to32Bits, Fifo8toNBits
 from .memories.fifo_to_fifo import Fifo_to_Fifo
-from .memories.serialized_fifo import SerializeFifo
+from .memories.serialized_fifo import SerializeFifo, PipelinedSerializeFifo
+from .memories.bram_fifo import BramFifo
+from .dsp.fir_decimator import FirDecimator
+from .dsp.lock_in import LockIn
 
 
 class ADCFifo(LiteXModule):
-    def __init__(self, adc:Ads92x4, fifo_depth=256):
-        self._fifos = [SyncFIFO(width=16, depth=fifo_depth), SyncFIFO(width=16, depth=fifo_depth)]
-        self.submodules.fifo0 = self._fifos[0]
-        self.submodules.fifo1 = self._fifos[1]
+    """
+    Stores every sample set as a single word, so all the channels of all the
+    devices stay aligned. ``data`` lists the 16 bits channels in
+    ``samples`` order.
+
+    :param samples: Packed 16 bits channels, ``Ads92x4.data`` for instance.
+    :param smp_clk: One word is stored on each rising edge,
+        ``Ads92x4.smp_clk_out`` for instance.
+    """
+    def __init__(self, samples, smp_clk, fifo_depth=256):
+        self.fifo = BramFifo(width=len(samples), depth=fifo_depth)
         self.readable = Signal()
         self.re = Signal(reset=0)
-        self.data = [Signal(16), Signal(16)]
-        self.comb += self._fifos[0].din.eq(adc.data_cha)
-        self.comb += self._fifos[1].din.eq(adc.data_chb)
-        for i in (0,1):
-            self.comb += self.data[i].eq(self._fifos[i].dout)
-            self.comb += self._fifos[i].re.eq(self.re)
-        self.comb += self.readable.eq(self._fifos[0].readable)
+        self.data = [Signal(16) for _ in range(len(samples) // 16)]
+        self.comb += self.fifo.din.eq(samples)
+        for i, data in enumerate(self.data):
+            self.comb += data.eq(self.fifo.dout[16 * i : 16 * (i + 1)])
+        self.comb += self.fifo.re.eq(self.re)
+        self.comb += self.readable.eq(self.fifo.readable)
         
         
         self.fsm = FSM(reset_state="IDLE")
         self.fsm.act("IDLE",
-                     If(~adc.smp_clk_out & self._fifos[0].writable, NextState("READY")),
-                     NextValue(self._fifos[0].we,0),
-                     NextValue(self._fifos[1].we,0),
+                     If(~smp_clk & self.fifo.writable, NextState("READY")),
+                     NextValue(self.fifo.we,0),
                      )
         self.fsm.act("READY",
-                     If(adc.smp_clk_out, NextState("PUSH")),
+                     If(smp_clk, NextState("PUSH")),
                      )
         self.fsm.act("PUSH",
                      NextState("IDLE"),
-                     NextValue(self._fifos[0].we,1),
-                     NextValue(self._fifos[1].we,1),
+                     NextValue(self.fifo.we,1),
                      )
         
         
@@ -54,35 +68,104 @@ class AcquisitionPipelineFront(LiteXModule):
         smp_clk_is_synchronous=True,
         oversampling=1,
         zone=2,
+        pipelined_readout=False,
+        ddr_readout=False,
+        sys_clk_freq=None,
+        encoder_width=8,
+        samples_per_frame=1,
+        compression_block_size=None,
+        lock_in_ratio=None,
+        lock_in_increment=0,
     ):
+        """
+        :param ddr_readout: Read the ADCs with Ads92x4DDR, SCLK at twice the
+            sys clock, it needs the sys2x clock domain of Ecp5Sys2xCRG.
+        :param sys_clk_freq: Given to the Ads92x4, which logs the resulting
+            sample rate.
+        :param lock_in_ratio: Send the I and Q outputs of a LockIn decimating
+            by this even ratio instead of the samples, the encoder then gets
+            I0, Q0, I1, Q1... instead of the channels.
+        :param lock_in_increment: Nco phase increment of the LockIn, see
+            Nco.increment_for.
+        """
         self.smp_clk = Signal()
         self._data_encoder_has_enough_space = Signal()
-        self.adcs = []
-        self.adcs_fifos = []
-        
-        for i in range(adc_count):
-            adc = Ads92x4(
+
+        # One controller for all the ADCs, connect device i with lane=i
+        if ddr_readout:
+            assert not pipelined_readout, "The DDR readout is not pipelined"
+            self.adc = Ads92x4DDR(
+                smp_clk_is_synchronous=smp_clk_is_synchronous,
+                oversampling=oversampling,
+                zone=zone,
+                sys_clk_freq=sys_clk_freq,
+                adc_count=adc_count,
+            )
+        else:
+            self.adc = Ads92x4(
                 smp_clk_is_synchronous=smp_clk_is_synchronous,
                 oversampling=oversampling,
                 zone=zone,
+                pipelined=pipelined_readout,
+                sys_clk_freq=sys_clk_freq,
+                adc_count=adc_count,
             )
-            self.adcs.append(adc)
-            self.submodules+= adc
-            self.comb += adc.smp_clk.eq(self.smp_clk)
-            adc_fifo = ADCFifo(adc, fifo_depth=fifo_depth)
-            self.adcs_fifos.append(adc_fifo)
-            self.submodules += adc_fifo
+        self.submodules += self.adc
+        self.comb += self.adc.smp_clk.eq(self.smp_clk)
 
+        samples = self.adc.data
+        smp_clk_out = self.adc.smp_clk_out
+        inputs = adc_count * 2
+        if lock_in_ratio is not None:
+            assert lock_in_ratio % 2 == 0, "The LockIn FIR decimates by 2"
+            self.lock_in = LockIn(
+                channels=adc_count * 2,
+                increment=lock_in_increment,
+                cic_ratio=lock_in_ratio // 2,
+                fir_ratio=2,
+            )
+            # one input per conversion, on the rising edge of smp_clk_out
+            self._smp_clk_out_d = Signal()
+            self.sync += [
+                self._smp_clk_out_d.eq(self.adc.smp_clk_out),
+                If(
+                    self.adc.smp_clk_out & ~self._smp_clk_out_d,
+                    self.lock_in.sink.valid.eq(1),
+                ).Elif(self.lock_in.sink.ready, self.lock_in.sink.valid.eq(0)),
+            ]
+            self.comb += [
+                self.lock_in.sink.data.eq(self.adc.data),
+                self.lock_in.source.ready.eq(1),
+            ]
+            samples = self.lock_in.source.data
+            smp_clk_out = self.lock_in.source.valid
+            inputs = adc_count * 4
+
+        self.adc_fifo = ADCFifo(samples, smp_clk_out, fifo_depth=fifo_depth)
+        self.submodules += self.adc_fifo
 
-        self.data_encoder = DataEncoder2(inputs=adc_count*2)
+        if compression_block_size is not None:
+            assert encoder_width == 8, "Compressed stream is byte wide"
+            self.data_encoder = RiceEncoder(
+                inputs=inputs, block_size=compression_block_size
+            )
+        elif encoder_width == 8:
+            self.data_encoder = DataEncoder2(
+                inputs=inputs, samples_per_frame=samples_per_frame
+            )
+        else:
+            self.data_encoder = DataEncoderWide(
+                inputs=inputs,
+                data_width=encoder_width,
+                samples_per_frame=samples_per_frame,
+            )
         self.submodules.data_encoder = self.data_encoder
         
-        for i in range(adc_count):
-            self.comb += self.data_encoder.acd_data[i*2].eq(self.adcs_fifos[i].data[0])
-            self.comb += self.data_encoder.acd_data[(i*2)+1].eq(self.adcs_fifos[i].data[1])
-            self.comb += self.adcs_fifos[i].re.eq(self.data_encoder.adc_data_re)
+        for i, data in enumerate(self.adc_fifo.data):
+            self.comb += self.data_encoder.acd_data[i].eq(data)
+        self.comb += self.adc_fifo.re.eq(self.data_encoder.adc_data_re)
         
-        self.comb += self.data_encoder.adc_data_readable.eq(self.adcs_fifos[0].readable)
+        self.comb += self.data_encoder.adc_data_readable.eq(self.adc_fifo.readable)
 
 
 
@@ -94,15 +177,33 @@ class AcquisitionPipelineFT245(AcquisitionPipelineFront):
         smp_clk_is_synchronous=True,
         oversampling=1,
         zone=2,
+        pipelined_readout=False,
+        ddr_readout=False,
+        sys_clk_freq=None,
+        samples_per_frame=1,
+        compression_block_size=None,
+        ft245_synchronous=False,
+        lock_in_ratio=None,
+        lock_in_increment=0,
     ):
         super().__init__(
             adc_count=adc_count,
             fifo_depth=fifo_depth,
             smp_clk_is_synchronous=smp_clk_is_synchronous,
             oversampling=oversampling,
-            zone=zone
+            zone=zone,
+            pipelined_readout=pipelined_readout,
+            ddr_readout=ddr_readout,
+            sys_clk_freq=sys_clk_freq,
+            samples_per_frame=samples_per_frame,
+            compression_block_size=compression_block_size,
+            lock_in_ratio=lock_in_ratio,
+            lock_in_increment=lock_in_increment,
         )
-        self.ft245 = ft245(threshold=self.data_encoder.frame_size)
+        if ft245_synchronous:
+            self.ft245 = ft245_sync(threshold=self.data_encoder.frame_size)
+        else:
+            self.ft245 = ft245(threshold=self.data_encoder.frame_size)
         self.submodules += self.ft245
         
         self.comb += self.ft245.fifo_din.eq(self.data_encoder.fifo_din)
@@ -112,77 +213,263 @@ class AcquisitionPipelineFT245(AcquisitionPipelineFront):
         
 
 
+class AcquisitionPipelineFT60x(AcquisitionPipelineFront):
+    def __init__(
+        self,
+        adc_count,
+        data_width=32,
+        fifo_depth=256,
+        smp_clk_is_synchronous=True,
+        oversampling=1,
+        zone=2,
+        pipelined_readout=False,
+        ddr_readout=False,
+        sys_clk_freq=None,
+        samples_per_frame=1,
+        lock_in_ratio=None,
+        lock_in_increment=0,
+    ):
+        super().__init__(
+            adc_count=adc_count,
+            fifo_depth=fifo_depth,
+            smp_clk_is_synchronous=smp_clk_is_synchronous,
+            oversampling=oversampling,
+            zone=zone,
+            pipelined_readout=pipelined_readout,
+            ddr_readout=ddr_readout,
+            sys_clk_freq=sys_clk_freq,
+            encoder_width=data_width,
+            samples_per_frame=samples_per_frame,
+            lock_in_ratio=lock_in_ratio,
+            lock_in_increment=lock_in_increment,
+        )
+        self.ft60x = ft60x(threshold=self.data_encoder.frame_size, data_width=data_width)
+        self.submodules += self.ft60x
+
+        self.comb += self.ft60x.fifo_din.eq(self.data_encoder.fifo_din)
+        self.comb += self.ft60x.fifo_we.eq(self.data_encoder.fifo_we)
+
+        self.comb += self.data_encoder.fifo_has_enough_space.eq(self.ft60x.fifo_has_enough_space)
+
+
+
 class AcquisitionPipeline(LiteXModule):
+    # FMC register map, 0 is the data FIFO and 7 its level
+    SMP_CLK_DIV_ADDRESS = 1
+    CHANNEL_MASK_ADDRESS = 2
+    WATERMARK_ADDRESS = 3
+    FLUSH_TIMEOUT_ADDRESS = 4
+    STATUS_ADDRESS = 5
+    OVERFLOW_COUNT_ADDRESS = 6
+    # FirDecimator taps, need fmc_address_width >= 4
+    FIR_COEF_ADDRESS_ADDRESS = 8
+    FIR_COEF_DATA_ADDRESS = 9
+
     def __init__(
         self,
         adc_count,
         fmc_data_width=32,
         fmc_address_width=3,
         use_chained_fifo=True,
+        fifo_pipeline_stages=None,
         fifo_depth=256,
         fifo_count=16,
         smp_clk_is_synchronous=True,
         oversampling=1,
         zone=2,
+        pipelined_readout=False,
+        sys_clk_freq=None,
+        samples_per_frame=1,
+        fmc_burst=False,
+        fmc_data_latency=2,
+        fmc_watermark=32,
+        fmc_flush_timeout=0,
+        with_registers=False,
+        smp_clk_div=None,
+        fir_taps=None,
+        fir_ratio=1,
     ):
+        """
+        :param sys_clk_freq: Given to the Ads92x4, which logs the resulting
+            sample rate.
+        :param with_registers: Add a FmcRegisterFile, see the *_ADDRESS
+            constants for the register map.
+        :param smp_clk_div: Generate smp_clk internally by dividing the sys
+            clock, the ratio is then a register. Otherwise smp_clk is an input.
+        :param fir_taps: Decimate the samples with a FirDecimator before the
+            encoder, float taps or a number of taps for a low pass. With
+            registers and ``fmc_address_width`` >= 4 its taps can be
+            reloaded over FMC, otherwise they are fixed.
+        :param fir_ratio: Decimation ratio of the FirDecimator.
+        """
         self.smp_clk = Signal()
         self.have_data = Signal()
 
         self.nor_if = Stm32FmcNorInterface(
-            data_width=fmc_data_width, address_width=fmc_data_width
+            data_width=fmc_data_width,
+            address_width=fmc_address_width,
+            burst=fmc_burst,
+            data_latency=fmc_data_latency,
+            watermark=fmc_watermark,
+            flush_timeout=fmc_flush_timeout,
         )
         self.submodules += self.nor_if
-        self.adcs = [
-            Ads92x4(
-                smp_clk_is_synchronous=smp_clk_is_synchronous,
-                oversampling=oversampling,
-                zone=2,
-            )
-            for _ in range(adc_count)
-        ]
-        for adc in self.adcs:
-            self.submodules += adc
-            self.comb += adc.smp_clk.eq(self.smp_clk)
+        # One controller for all the ADCs, connect device i with lane=i
+        self.adc = Ads92x4(
+            smp_clk_is_synchronous=smp_clk_is_synchronous,
+            oversampling=oversampling,
+            zone=2,
+            pipelined=pipelined_readout,
+            sys_clk_freq=sys_clk_freq,
+            adc_count=adc_count,
+        )
+        self.submodules += self.adc
+        self.comb += self.adc.smp_clk.eq(self.smp_clk)
 
-        self.data_encoder = DataEncoder(adc_count=adc_count)
+        self.data_encoder = DataEncoder(
+            adc_count=adc_count, samples_per_frame=samples_per_frame
+        )
         self.submodules.data_encoder = self.data_encoder
 
-        for i, adc in enumerate(self.adcs):
-            self.comb += self.data_encoder.acd_data[i][0].eq(adc.data_cha)
-            self.comb += self.data_encoder.acd_data[i][1].eq(adc.data_chb)
+        samples = self.adc.data
+        smp_clk_out = self.adc.smp_clk_out
+        if fir_taps is not None:
+            # taps are written as plain FMC words
+            self.fir = FirDecimator(
+                fir_taps,
+                fir_ratio,
+                channels=2 * adc_count,
+                coef_width=min(18, fmc_data_width),
+            )
+            self.submodules += self.fir
+            # one input per conversion, on the rising edge of smp_clk_out
+            self._smp_clk_out_d = Signal()
+            self.sync += [
+                self._smp_clk_out_d.eq(self.adc.smp_clk_out),
+                If(
+                    self.adc.smp_clk_out & ~self._smp_clk_out_d,
+                    self.fir.sink.valid.eq(1),
+                ).Elif(self.fir.sink.ready, self.fir.sink.valid.eq(0)),
+            ]
+            self.comb += [
+                self.fir.sink.data.eq(self.adc.data),
+                self.fir.source.ready.eq(1),
+            ]
+            # the encoder registers its inputs, strobe it a clock later
+            smp_clk_out = Signal()
+            self.sync += smp_clk_out.eq(self.fir.source.valid)
+            samples = self.fir.source.data
+
+        # Disabled channels are sent as zeros, the frame layout does not change
+        self.channel_mask = Signal(2 * adc_count, reset=2 ** (2 * adc_count) - 1)
+        for i in range(2 * adc_count):
+            self.comb += self.data_encoder.acd_data[i // 2][i % 2].eq(
+                samples[16 * i : 16 * (i + 1)]
+                & Replicate(self.channel_mask[i], 16)
+            )
 
-        if use_chained_fifo:
+        if use_chained_fifo and fifo_pipeline_stages is not None:
+            self.fifo_8bits = PipelinedSerializeFifo(
+                width=8,
+                fifo_depth=fifo_depth,
+                fifo_count=fifo_count,
+                pipeline_stages=fifo_pipeline_stages,
+            )
+        elif use_chained_fifo:
             self.fifo_8bits = SerializeFifo(
                 width=8, fifo_depth=fifo_depth, fifo_count=fifo_count
             )
         else:
-            self.fifo_8bits = SyncFIFO(width=8, depth=fifo_depth * fifo_count)
+            self.fifo_8bits = BramFifo(width=8, depth=fifo_depth * fifo_count)
         self.submodules += self.fifo_8bits
 
         self.comb += self.fifo_8bits.din.eq(self.data_encoder.fifo_din)
         self.comb += self.fifo_8bits.we.eq(self.data_encoder.fifo_we)
         self.comb += self.data_encoder.fifo_writable.eq(self.fifo_8bits.writable)
 
-        self._fifo8to32 = Fifo8to32Bits()
+        # A frame is only started with room for all of it, as the FT245 and
+        # FT60x backends do with threshold=frame_size, the chain is filled
+        # from its head
+        if use_chained_fifo:
+            fifo_level, fifo_size = self.fifo_8bits.head_level, fifo_depth
+        else:
+            fifo_level, fifo_size = self.fifo_8bits.level, self.fifo_8bits.depth
+        frame_size = self.data_encoder.frame_size
+        assert frame_size < fifo_size - 1, "The FIFO cannot hold a frame"
+        self.sync += self.data_encoder.fifo_has_enough_space.eq(
+            fifo_level < (fifo_size - frame_size - 1)
+        )
+
+        self._fifo8to32 = Fifo8toNBits(out_width=fmc_data_width)
         self.submodules += self._fifo8to32
 
-        self.comb += self._fifo8to32.input_fifo_has_word.eq(self.fifo_8bits.level >= 4)
+        self.comb += self._fifo8to32.readable.eq(self.fifo_8bits.readable)
         self.comb += self._fifo8to32.din.eq(self.fifo_8bits.dout)
         self.comb += self.fifo_8bits.re.eq(self._fifo8to32.re)
 
-        self.nor_if_has_enough_space = Signal()
-        self.comb += self.nor_if_has_enough_space.eq(
-            self.nor_if.level < self.nor_if.fifo.depth - 4
-        )
-        self.comb += self._fifo8to32.output_fifo_has_enough_space.eq(
-            self.nor_if_has_enough_space
-        )
+        self.comb += self._fifo8to32.writable.eq(self.nor_if.fifo_writable)
         self.comb += self.nor_if.fifo_din.eq(self._fifo8to32.dout)
         self.comb += self.nor_if.fifo_we.eq(self._fifo8to32.we)
-        self.comb += self.data_encoder.smp_clk.eq(self.adcs[0].smp_clk_out)
+        self.comb += self.data_encoder.smp_clk.eq(smp_clk_out)
 
         self.comb += self.have_data.eq(self.nor_if.have_data)
 
+        # Bytes produced by the encoder while the FIFO chain was full
+        self.overflow_count = Signal(32, reset=0)
+        self.sync += If(
+            self.data_encoder.fifo_we & ~self.fifo_8bits.writable,
+            self.overflow_count.eq(self.overflow_count + 1),
+        )
+        self.status = Signal(4)
+        self.comb += self.status.eq(
+            Cat(
+                self.nor_if.have_data,
+                self.nor_if._flush,
+                self.fifo_8bits.readable,
+                ~self.fifo_8bits.writable,
+            )
+        )
+
+        if smp_clk_div is not None:
+            self.smp_clk_div = ProgrammableClkDiv(MaxValue=smp_clk_div)
+            self.submodules += self.smp_clk_div
+            self.comb += self.smp_clk.eq(self.smp_clk_div.clk_out)
+
+        if with_registers:
+            self.registers = FmcRegisterFile(self.nor_if)
+            self.submodules += self.registers
+            if smp_clk_div is not None:
+                self.registers.add_register(
+                    self.SMP_CLK_DIV_ADDRESS, self.smp_clk_div.max_value
+                )
+            self.registers.add_register(self.CHANNEL_MASK_ADDRESS, self.channel_mask)
+            self.registers.add_register(self.WATERMARK_ADDRESS, self.nor_if.watermark)
+            self.registers.add_register(
+                self.FLUSH_TIMEOUT_ADDRESS, self.nor_if.flush_timeout
+            )
+            self.registers.add_register(
+                self.STATUS_ADDRESS, self.status, writable=False
+            )
+            self.registers.add_register(
+                self.OVERFLOW_COUNT_ADDRESS, self.overflow_count, writable=False
+            )
+            if fir_taps is not None and fmc_address_width < 4:
+                logging.getLogger("AcquisitionPipeline").warning(
+                    f"No room for the FIR tap registers with {fmc_address_width} "
+                    "FMC address bits, the taps are fixed"
+                )
+            elif fir_taps is not None:
+                self.registers.add_register(
+                    self.FIR_COEF_ADDRESS_ADDRESS,
+                    self.fir.coef_address,
+                    strobe=self.fir.coef_address_written,
+                )
+                self.registers.add_register(
+                    self.FIR_COEF_DATA_ADDRESS,
+                    self.fir.coef_data,
+                    strobe=self.fir.coef_data_written,
+                )
+
 
 if __name__ == "__main__":
     from migen.fhdl.verilog import convert
@@ -190,3 +477,14 @@ if __name__ == "__main__":
     convert(AcquisitionPipeline(adc_count=2, use_chained_fifo=False)).write(
         "AcquisitionPipeline.v"
     )
+    convert(
+        AcquisitionPipeline(
+            adc_count=1,
+            use_chained_fifo=False,
+            fmc_address_width=4,
+            with_registers=True,
+            smp_clk_div=64,
+            fir_taps=7,
+            fir_ratio=2,
+        )
+    ).write("AcquisitionPipelineRegisters.v")
@@ -5,35 +5,55 @@ from migen.genlib.resetsync import AsyncResetSynchronizer
 from litex.gen import *
 
 
-from litex.soc.cores.dma import WishboneDMAWriter
 from litex.soc.cores.clock import *
 from litex.soc.interconnect.csr import CSRStorage, CSRStatus, CSRField, CSR, AutoCSR
 from litex.soc.interconnect.csr import bits_for
+from litex.soc.interconnect.csr_eventmanager import EventManager, EventSourcePulse, EventSourceLevel
 from litex.soc.interconnect import stream
 from litex.soc.interconnect import wishbone
+from litex.soc.integration.soc import SoCRegion
 
 
 from .ads92x4 import Ads92x4_Stream_Avg
 from ..dsp.simple_iir import SimpleIIR
-from ..streams import Stream2CSR, TestStreamCounter
+from ..dsp.fir_decimator import FirDecimator
+from ..dsp.welch_psd import WelchPsd
+from ..memories.wishbone_dma import WishboneBurstDMAWriter
+from ..streams import Stream2CSR, Stream2Wishbone, TestStreamCounter
 from ..clk import ClkDiv
 
 
 class ADC(LiteXModule):
-    def __init__(self, sys_clk_freq, oversampling=1, zone=2, fifo_depth=4096, target_freq=3e6, with_dma=False, soc=None, only_ch=None):
+    def __init__(self, sys_clk_freq, oversampling=1, zone=2, fifo_depth=4096, target_freq=3e6, with_dma=False, soc=None, only_ch=None, cic_order=1, fir_taps=None, fir_ratio=1, psd_fft_size=None, psd_averages=16, dma_burst_length=16, dma_tap=False):
         """
         ADC module for interfacing with the ADS92x4 ADC chip.
         
         TODO: make it configurable to support different ADCs.
         
         :param sys_clk_freq: System clock frequency.
-        :param oversampling: Oversampling factor (1, 2, or 4).
+        :param oversampling: Oversampling factor, any integer >= 1, samples are
+            decimated in gateware by a CIC filter.
         :param zone: Zone for the ADC (1 or 2).
         :param fifo_depth: Depth of the FIFO buffer for ADC data.
         :param target_freq: Target frequency for the ADC clock, default is 3MHz (maximum for ADS92x4).
+        :param with_dma: Write the samples to memory with a DMA, else with a
+            ``soc`` they are read through a Wishbone FIFO window. Without a
+            ``soc`` the DMA master is left in ``dma_bus``.
+        :param cic_order: Order of the decimation CIC filter, 1 is a plain average.
+        :param fir_taps: Add a FirDecimator after the CIC, float taps or a
+            number of taps for a low pass, they can be reloaded through CSRs.
+        :param fir_ratio: Decimation ratio of the FirDecimator.
+        :param psd_fft_size: Send averaged power spectra of the ``only_ch``
+            channel (a by default) computed by a WelchPsd instead of the
+            samples, one 32 bits word per bin.
+        :param psd_averages: Frames summed in each spectrum, can be lowered
+            through a CSR.
+        :param dma_burst_length: Words written per Wishbone burst by the DMA.
+        :param dma_tap: Also send the words written by the DMA to ``tap``,
+            for an SDLogger.
         """
         super().__init__()
-        assert oversampling in [1, 2, 4], "Oversampling must be one of [1, 2, 4]"
+        assert isinstance(oversampling, int) and oversampling >= 1, "Oversampling must be an integer >= 1"
         assert zone in [1, 2], "Zone must be one of [1, 2]"
         assert fifo_depth > 0, "FIFO depth must be greater than 0"
         assert target_freq > 0, "Target frequency must be greater than 0"
@@ -42,8 +62,9 @@ class ADC(LiteXModule):
 
         self.sys_clk_freq = sys_clk_freq
         self.target_freq = target_freq
-        self.sampling_freq = target_freq / oversampling
         self.oversampling = oversampling
+        self.fir_ratio = fir_ratio if fir_taps is not None else 1
+        self.sampling_freq = target_freq / (oversampling * self.fir_ratio)
         self.zone = zone
         
 
@@ -51,22 +72,35 @@ class ADC(LiteXModule):
         self.overflow = Signal(reset=0)
         
         self.submodules.adc = adc = Ads92x4_Stream_Avg(
-            smp_clk_is_synchronous=True, oversampling=oversampling, zone=zone, fifo_depth=fifo_depth
+            smp_clk_is_synchronous=True, oversampling=oversampling, zone=zone, fifo_depth=fifo_depth,
+            cic_order=cic_order, sys_clk_freq=sys_clk_freq
         )
         self.adc = adc
         self.pads = adc.pads
 
         self.source = adc.source
+        if fir_taps is not None:
+            self.add_fir_decimator(fir_taps, fir_ratio)
+        self.psd_fft_size = psd_fft_size
+        if psd_fft_size is not None:
+            self.add_psd(psd_fft_size, psd_averages, only_ch)
 
         self.add_clk_gen()
         self.add_enable_csr()
+        self.add_overflow_csr()
         if with_dma:
-            self.add_dma_interface(soc, only_ch)
+            self.add_dma_interface(soc, only_ch, dma_burst_length, dma_tap)
+        elif soc is not None:
+            self.add_stream_wishbone_interface(soc)
         else:
             self.add_stream_csr_interface()
             
         self.defines = {
             "ADC_OVERSAMPLING": oversampling,
+            "ADC_CIC_ORDER": cic_order,
+            "ADC_FIR_RATIO": self.fir_ratio,
+            "ADC_PSD_FFT_SIZE": psd_fft_size or 0,
+            "ADC_PSD_AVERAGES": psd_averages if psd_fft_size else 0,
             "ADC_ZONE": zone,
             "ADC_ACTIVE_CHANNEL_COUNT": 2 if only_ch is None else 1,
             "ADC_SAMPLING_FREQUENCY": int(self.sampling_freq),
@@ -77,7 +111,36 @@ class ADC(LiteXModule):
         divisor = int(self.sys_clk_freq // self.target_freq)
         self.submodules.clk_div = clk_div = ClkDiv(MaxValue=divisor)
         self.comb += self.adc.smp_clk.eq(clk_div.clk_out)
-        self.sampling_freq = self.sys_clk_freq / (divisor * self.oversampling)
+        self.sampling_freq = self.sys_clk_freq / (divisor * self.oversampling * self.fir_ratio)
+
+    def add_fir_decimator(self, taps, ratio):
+        self.fir = FirDecimator(taps, ratio, channels=2)
+        self.fir.add_csr()
+        source = stream.Endpoint([("data_a", 16), ("data_b", 16)])
+        self.comb += [
+            self.fir.sink.valid.eq(self.source.valid),
+            self.fir.sink.data.eq(Cat(self.source.data_a, self.source.data_b)),
+            self.source.ready.eq(self.fir.sink.ready),
+            source.valid.eq(self.fir.source.valid),
+            source.data_a.eq(self.fir.source.data[:16]),
+            source.data_b.eq(self.fir.source.data[16:]),
+            self.fir.source.ready.eq(source.ready),
+        ]
+        self.source = source
+
+    def add_psd(self, fft_size, averages, only_ch):
+        self.psd = WelchPsd(fft_size=fft_size, averages=averages)
+        self.psd.add_csr()
+        if only_ch in ('b', 'chb', 1):
+            ch = self.source.data_b
+        else:
+            ch = self.source.data_a
+        self.comb += [
+            self.psd.sink.valid.eq(self.source.valid),
+            self.psd.sink.data.eq(ch),
+            self.source.ready.eq(self.psd.sink.ready),
+        ]
+        self.source = self.psd.source
 
     def add_enable_csr(self):
         self.enable_csr = CSRStorage(fields=[
@@ -89,17 +152,74 @@ class ADC(LiteXModule):
             self.adc.enable.eq(self.enable)
         ]
 
-    def add_dma_interface(self, soc, only_ch):
-        bus = wishbone.Interface(data_width=soc.bus.data_width, address_width=soc.bus.address_width, addressing='word')
-        self.dma = WishboneDMAWriter(bus=bus, with_csr=True, endianness=soc.cpu.endianness)
-        dma_bus = getattr(soc, "dma_bus", soc.bus)
-        dma_bus.add_master(master=bus)
-        
-        if only_ch is None:
+    def add_overflow_csr(self):
+        self.comb += self.overflow.eq(self.adc.overflow)
+        self._overflows = CSRStatus(32, name="overflows",
+            description="Conversions lost since the ADC was enabled, saturates.")
+        enable_d = Signal()
+        self.sync += [
+            enable_d.eq(self.enable),
+            If(self.enable & ~enable_d,
+                self._overflows.status.eq(0)
+            ).Elif(self.overflow & (self._overflows.status != 2**32 - 1),
+                self._overflows.status.eq(self._overflows.status + 1)
+            )
+        ]
+
+    def add_dma_interface(self, soc, only_ch, burst_length=16, with_tap=False):
+        """
+        Samples are written by a WishboneBurstDMAWriter, with ``loop`` set it
+        writes ``length`` bytes from ``base`` over and over, the two halves
+        are used as ping-pong buffers: the ``half`` event fires once the first
+        half is written and ``full`` once the second is, while the CPU empties
+        one half the other is filled. ``dma_offset`` is the write pointer in
+        words.
+
+        Without ``soc`` the 32 bits little endian master is not added to a
+        bus, it is left in ``dma_bus``.
+
+        Setting ``dma_test`` feeds the DMA with a counter, one word per clock,
+        to measure the memory bandwidth.
+
+        With ``with_tap`` the samples also go to ``tap``, a word is passed on
+        when both the DMA and the tap are ready, they drop the words while
+        idle.
+        """
+        if soc is None:
+            bus = wishbone.Interface(data_width=32, address_width=32, addressing='word')
+            endianness = "little"
+        else:
+            bus = wishbone.Interface(data_width=soc.bus.data_width, address_width=soc.bus.address_width, addressing='word')
+            endianness = soc.cpu.endianness
+        self.dma_bus = bus
+        self.dma = WishboneBurstDMAWriter(bus=bus, burst_length=burst_length, with_csr=True, endianness=endianness)
+        if soc is not None:
+            dma_bus = getattr(soc, "dma_bus", soc.bus)
+            dma_bus.add_master(master=bus)
+
+        self.ev = EventManager()
+        self.ev.half = EventSourcePulse(description="First half of the buffer written.")
+        self.ev.full = EventSourcePulse(description="Second half of the buffer written.")
+        self.ev.finalize()
+        words = Signal(32)
+        self.comb += [
+            words.eq(self.dma.length[log2_int(bus.data_width//8):]),
+            self.ev.half.trigger.eq(self.dma.written & (self.dma.offset + 1 == words[1:])),
+            self.ev.full.trigger.eq(self.dma.last),
+        ]
+
+        samples = stream.Endpoint([("data", bus.data_width)])
+        if self.psd_fft_size is not None:
+            self.comb += [
+                samples.data.eq(self.source.data),
+                samples.valid.eq(self.source.valid),
+                self.source.ready.eq(samples.ready)
+            ]
+        elif only_ch is None:
             self.comb += [
-                self.dma.sink.data.eq(Cat(self.source.data_a, self.source.data_b)),
-                self.dma.sink.valid.eq(self.source.valid),
-                self.source.ready.eq(self.dma.sink.ready)
+                samples.data.eq(Cat(self.source.data_a, self.source.data_b)),
+                samples.valid.eq(self.source.valid),
+                self.source.ready.eq(samples.ready)
             ]
         else:
             self.submodules.up_conv = up_conv = stream.Converter(
@@ -111,13 +231,63 @@ class ADC(LiteXModule):
             else:
                 ch= self.source.data_b
             self.comb += [
-                self.dma.sink.data.eq(up_conv.source.data),
-                self.dma.sink.valid.eq(up_conv.source.valid),
-                up_conv.source.ready.eq(self.dma.sink.ready),
+                samples.data.eq(up_conv.source.data),
+                samples.valid.eq(up_conv.source.valid),
+                up_conv.source.ready.eq(samples.ready),
                 self.source.ready.eq(up_conv.sink.ready),
                 up_conv.sink.valid.eq(self.source.valid),
                 up_conv.sink.data.eq(ch)
             ]
 
+        if with_tap:
+            self.tap = tap = stream.Endpoint([("data", bus.data_width)])
+            connection = [
+                self.dma.sink.valid.eq(samples.valid & tap.ready),
+                self.dma.sink.data.eq(samples.data),
+                tap.valid.eq(samples.valid & self.dma.sink.ready),
+                tap.data.eq(samples.data),
+                samples.ready.eq(self.dma.sink.ready & tap.ready),
+            ]
+        else:
+            connection = samples.connect(self.dma.sink)
+        self._dma_test = CSRStorage(name="dma_test",
+            description="Feeds the DMA with a counter at one word per clock instead of the samples.")
+        test_count = Signal(bus.data_width, reset=0)
+        self.comb += If(self._dma_test.storage,
+            self.dma.sink.valid.eq(1),
+            self.dma.sink.data.eq(test_count)
+        ).Else(
+            connection
+        )
+        self.sync += If(~self._dma_test.storage,
+            test_count.eq(0)
+        ).Elif(self.dma.sink.ready,
+            test_count.eq(test_count + 1)
+        )
+
+    def add_stream_wishbone_interface(self, soc, fifo_depth=512, window_size=4096):
+        """
+        Samples are read by the CPU from the ``adc_window`` memory region
+        through a Stream2Wishbone, ``window_level`` words can be copied at
+        once, the ``watermark`` event fires when ``window_watermark`` words
+        are waiting.
+        """
+        self.window = Stream2Wishbone(self.source, fifo_depth=fifo_depth, with_irq=False)
+        soc.bus.add_slave(name="adc_window", slave=self.window.bus,
+            region=SoCRegion(size=window_size, cached=False))
+
+        self.ev = EventManager()
+        self.ev.watermark = EventSourceLevel(description="Window FIFO level at or above the watermark.")
+        self.ev.finalize()
+        self.comb += self.ev.watermark.trigger.eq(self.window.above_watermark)
+
     def add_stream_csr_interface(self):
-        self._stream_to_csr = Stream2CSR(self.stream)
\ No newline at end of file
+        self._stream_to_csr = Stream2CSR(self.stream)
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    # 3 MHz conversions, one every 20 clocks, small FIFOs to overflow them quickly
+    adc = ADC(sys_clk_freq=60e6, fifo_depth=16, with_dma=True, dma_burst_length=4)
+    convert(adc).write("ADC.v")
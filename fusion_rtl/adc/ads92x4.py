@@ -1,14 +1,60 @@
+import logging
+
 from litex.gen import *
 from litex.soc.cores.clock.common import *
 from litex.soc.interconnect import stream
 
+from ..dsp.cic import CicDecimator
+
 class Ads92x4(LiteXModule):
-    def __init__(self, smp_clk_is_synchronous=True, oversampling=1, zone=2):
+    """
+    ADS92x4R dual channel SAR ADC readout, one conversion per smp_clk rising
+    edge.
+
+    :param pipelined: Zone 2 only, start reading conversion N on the smp_clk
+        rising edge that starts conversion N+1 without waiting for READY nor
+        for smp_clk to go low, so conversion and readout fully overlap and a
+        sample only costs ``min_cycles_per_sample`` sys clocks.
+    :param sys_clk_freq: When given, the highest sample rate is computed at
+        elaboration time, logged and stored in ``max_throughput``.
+    :param adc_count: Number of devices read in lockstep. CONVST, CS, SCLK
+        and MOSI are shared, ``pads.miso_a`` and ``pads.miso_b`` have one bit
+        per device and READY is only taken from the first one. ``data`` holds
+        all the channels of a conversion, channel A then B of each device,
+        ``data_cha`` and ``data_chb`` are the ones of the first device.
+
+    ``min_cycles_per_sample`` is the shortest smp_clk period the readout
+    keeps up with, so ``max_throughput`` is an upper bound. Outside pipelined
+    mode it counts a single clock for the READY wait and for the wait for
+    smp_clk to go low: when READY comes from the pads (zone 1 or
+    oversampling) the conversion time adds to it, and so does every clock
+    smp_clk stays high beyond 19.
+
+    A smp_clk rising edge coming while a readout is still running is
+    dropped, no conversion is read for it, ``missed`` pulses and
+    ``missed_count`` counts them.
+    """
+    MAX_SAMPLE_RATE = 3e6
+
+    def __init__(
+        self,
+        smp_clk_is_synchronous=True,
+        oversampling=1,
+        zone=2,
+        pipelined=False,
+        sys_clk_freq=None,
+        adc_count=1,
+    ):
         super().__init__()
+        assert not pipelined or zone == 2, "Pipelined readout needs zone 2"
         self.smp_clk = Signal()
         self.smp_clk_out = Signal()
+        self.adc_count = adc_count
+        self.data = Signal(32 * adc_count)
         self.data_cha = Signal(16)
         self.data_chb = Signal(16)
+        self.missed = Signal()
+        self.missed_count = Signal(32, reset=0)
         self._ready_strobe_reg = Signal()
 
         self.pads = Record(
@@ -18,14 +64,27 @@ class Ads92x4(LiteXModule):
                 ("ready_strobe", 1),
                 ("sclk", 1),
                 ("mosi", 1),
-                ("miso_a", 1),
-                ("miso_b", 1),
+                ("miso_a", adc_count),
+                ("miso_b", adc_count),
             ]
         )
 
         self.read_cycles = Signal(5, reset=0)
-        self.shift_reg_a = Signal(16, reset=0)
-        self.shift_reg_b = Signal(16, reset=0)
+        self.shift_regs = [
+            (Signal(16, reset=0), Signal(16, reset=0)) for _ in range(adc_count)
+        ]
+        self.shift_reg_a, self.shift_reg_b = self.shift_regs[0]
+        _shift = []
+        for i, (shift_reg_a, shift_reg_b) in enumerate(self.shift_regs):
+            _shift += [
+                NextValue(shift_reg_a, Cat(self.pads.miso_a[i], shift_reg_a[:-1])),
+                NextValue(shift_reg_b, Cat(self.pads.miso_b[i], shift_reg_b[:-1])),
+            ]
+        _words = Cat(*[Cat(a, b) for a, b in self.shift_regs])
+        self.comb += [
+            self.data_cha.eq(self.data[:16]),
+            self.data_chb.eq(self.data[16:32]),
+        ]
         if oversampling == 2:
             averaging = 2
         elif oversampling == 4:
@@ -44,6 +103,8 @@ class Ads92x4(LiteXModule):
             self._smp_clk_reg = Signal()
             self.sync += self._smp_clk_reg.eq(self.smp_clk)
             self.sync += self._smp_clk.eq(self._smp_clk_reg)
+        self._smp_clk_d = Signal()
+        self.sync += self._smp_clk_d.eq(self._smp_clk)
 
         if zone == 1:
             self.sync += self._ready_strobe_reg.eq(self.pads.ready_strobe)
@@ -54,66 +115,105 @@ class Ads92x4(LiteXModule):
                 self.sync += self._ready_strobe_reg.eq(self.pads.ready_strobe)
 
         self.fsm = FSM(reset_state="IDLE")
-        self.fsm.act(
-            "IDLE",
-            NextValue(self.data_cha, self.shift_reg_a),
-            NextValue(self.data_chb, self.shift_reg_b),
-            NextValue(self.smp_clk_out, 1),
-            NextValue(self.read_cycles, 0),
-            NextValue(self.pads.cs, 1),
-            If(self._smp_clk, NextState("WAIT_RDY")),
-        )
-        self.fsm.act(
-            "WAIT_RDY",
-            If(
-                self._ready_strobe_reg,
-                NextState("ASSERT_CS"),
-                NextValue(self.pads.cs, 0),
-                NextValue(self.smp_clk_out, 0),
-            ),
-        )
+        if pipelined:
+            # IDLE, ASSERT_CS and 16 READ cycles
+            self.min_cycles_per_sample = 18
+            self.fsm.act(
+                "IDLE",
+                NextValue(self.data, _words),
+                NextValue(self.smp_clk_out, 1),
+                NextValue(self.read_cycles, 0),
+                NextValue(self.pads.cs, 1),
+                If(
+                    self._smp_clk & ~self._smp_clk_d,
+                    NextState("ASSERT_CS"),
+                    NextValue(self.pads.cs, 0),
+                    NextValue(self.smp_clk_out, 0),
+                ),
+            )
+        else:
+            # IDLE, WAIT_RDY, ASSERT_CS, 16 READ and ENSURE_SMP_CLK_LOW cycles
+            self.min_cycles_per_sample = 20
+            self.fsm.act(
+                "IDLE",
+                NextValue(self.data, _words),
+                NextValue(self.smp_clk_out, 1),
+                NextValue(self.read_cycles, 0),
+                NextValue(self.pads.cs, 1),
+                If(self._smp_clk, NextState("WAIT_RDY")),
+            )
+            self.fsm.act(
+                "WAIT_RDY",
+                If(
+                    self._ready_strobe_reg,
+                    NextState("ASSERT_CS"),
+                    NextValue(self.pads.cs, 0),
+                    NextValue(self.smp_clk_out, 0),
+                ),
+            )
         self.fsm.act(
             "ASSERT_CS",
             NextState("READ"),
-            NextValue(self.shift_reg_a, Cat(self.pads.miso_a, self.shift_reg_a[:-1])),
-            NextValue(self.shift_reg_b, Cat(self.pads.miso_b, self.shift_reg_b[:-1])),
+            *_shift,
             NextValue(self.config_reg, Cat(1, self.config_reg[:-1])),
         )
         self.fsm.act(
             "READ",
             If(
                 self.read_cycles == 15,
-                NextState("ENSURE_SMP_CLK_LOW"),
+                NextState("IDLE" if pipelined else "ENSURE_SMP_CLK_LOW"),
                 NextValue(self.pads.cs, 1),
                 NextValue(self.read_cycles, 0),
+                # the next conversion may start as soon as IDLE is reached
+                *(
+                    [
+                        NextValue(self.data, _words),
+                        NextValue(self.smp_clk_out, 1),
+                    ]
+                    if pipelined
+                    else []
+                ),
             ).Else(
                 NextValue(self.read_cycles, self.read_cycles + 1),
-                NextValue(
-                    self.shift_reg_a, Cat(self.pads.miso_a, self.shift_reg_a[:-1])
-                ),
-                NextValue(
-                    self.shift_reg_b, Cat(self.pads.miso_b, self.shift_reg_b[:-1])
-                ),
+                *_shift,
                 NextValue(self.config_reg, Cat(1, self.config_reg[:-1])),
             ),
         )
-        self.fsm.act(
-            "ENSURE_SMP_CLK_LOW",
-            NextValue(self.pads.cs, 1),
-            If(
-                ~self._smp_clk,
-                NextState("IDLE"),
-            ),
-        )
+        if not pipelined:
+            self.fsm.act(
+                "ENSURE_SMP_CLK_LOW",
+                NextValue(self.pads.cs, 1),
+                If(
+                    ~self._smp_clk,
+                    NextState("IDLE"),
+                ),
+            )
 
         self.comb += self.pads.sclk.eq(ClockSignal() & self.fsm.ongoing("READ"))
+
+        self.comb += self.missed.eq(
+            self._smp_clk & ~self._smp_clk_d & ~self.fsm.ongoing("IDLE")
+        )
+        self.sync += If(self.missed, self.missed_count.eq(self.missed_count + 1))
+
+        self.max_throughput = None
+        if sys_clk_freq is not None:
+            self.max_throughput = min(
+                self.MAX_SAMPLE_RATE, sys_clk_freq / self.min_cycles_per_sample
+            )
+            logging.getLogger("Ads92x4").info(
+                f"at least {self.min_cycles_per_sample} clocks per sample, at "
+                f"most {self.max_throughput / 1e6:.3f} MSPS at "
+                f"{sys_clk_freq / 1e6:.1f} MHz"
+            )
         
         
 class Ads92x4_Stream(LiteXModule):
-    def __init__(self, smp_clk_is_synchronous=True, oversampling=1, zone=2, fifo_depth=16):
+    def __init__(self, smp_clk_is_synchronous=True, oversampling=1, zone=2, fifo_depth=16, sys_clk_freq=None):
         super().__init__()
         self.submodules.analog = analog = Ads92x4(
-            smp_clk_is_synchronous=True, oversampling=oversampling, zone=zone
+            smp_clk_is_synchronous=True, oversampling=oversampling, zone=zone,
+            sys_clk_freq=sys_clk_freq
         )
         self.pads = analog.pads
         self.data_cha = analog.data_cha
@@ -121,6 +221,8 @@ class Ads92x4_Stream(LiteXModule):
         self.smp_clk = analog.smp_clk
         self._smp_clk = analog.smp_clk_out
         self.enable = Signal(reset=0)
+        # pulses when a conversion is lost because the FIFO is still full
+        self.overflow = Signal()
         self._valid = Signal(reset=0)
         self.source = stream.Endpoint(
             [
@@ -146,9 +248,12 @@ class Ads92x4_Stream(LiteXModule):
             read_fifo.sink.valid.eq(self._valid & self.enable),
         ]
         
+        # one push per conversion, smp_clk_out stays high between readouts
+        self._smp_clk_d = Signal()
+        self.sync += self._smp_clk_d.eq(self._smp_clk)
         self._push_to_fifo_fsm = FSM(reset_state="IDLE")
         self._push_to_fifo_fsm.act("IDLE",
-            If(self._smp_clk,
+            If(self._smp_clk & ~self._smp_clk_d,
                 NextValue(self._valid, 1),
                 NextState("Wait for ready")
             )
@@ -159,24 +264,38 @@ class Ads92x4_Stream(LiteXModule):
                 NextState("IDLE")
             )
         )
+        self.comb += self.overflow.eq(
+            self.enable & self._smp_clk & ~self._smp_clk_d
+            & self._push_to_fifo_fsm.ongoing("Wait for ready")
+        )
 
 class Ads92x4_Stream_Avg(LiteXModule):
-    def __init__(self, smp_clk_is_synchronous=True, oversampling=1, zone=2, fifo_depth=16):
+    """
+    Ads92x4_Stream followed by one CicDecimator per channel.
+
+    :param oversampling: Decimation ratio, any integer >= 1.
+    :param cic_order: Number of CIC stages, 1 is a plain average.
+    """
+    def __init__(
+        self,
+        smp_clk_is_synchronous=True,
+        oversampling=1,
+        zone=2,
+        fifo_depth=16,
+        cic_order=1,
+        sys_clk_freq=None,
+    ):
         super().__init__()
         self.submodules.analog = analog = Ads92x4_Stream(
-            smp_clk_is_synchronous=True, oversampling=1, zone=zone, fifo_depth=fifo_depth
+            smp_clk_is_synchronous=True, oversampling=1, zone=zone, fifo_depth=fifo_depth,
+            sys_clk_freq=sys_clk_freq
         )
         self.pads = analog.pads
         self.data_cha = Signal(16)
         self.data_chb = Signal(16)
-        self._avg_chan_a = Signal(18)
-        self._avg_chan_b = Signal(18)
-        self._chan_a_in = Signal(18)
-        self._chan_b_in = Signal(18)
-        self.sum_cnt = Signal(max=4, reset=0)
         self.smp_clk = analog.smp_clk
         self.enable = Signal(reset=0)
-        self._valid = Signal(reset=0)
+        self.overflow = analog.overflow
         self.source = stream.Endpoint(
             [
                 ("data_a", 16),
@@ -192,54 +311,46 @@ class Ads92x4_Stream_Avg(LiteXModule):
             depth=fifo_depth,
             buffered=True
         )
-        
+
+        # Both channels see the same handshakes so they stay in step
+        self.cic_a = CicDecimator(
+            width=16, ratio=oversampling, order=cic_order, output_width=16
+        )
+        self.cic_b = CicDecimator(
+            width=16, ratio=oversampling, order=cic_order, output_width=16
+        )
+        self.comb += [
+            self.cic_a.sink.valid.eq(analog.source.valid),
+            self.cic_b.sink.valid.eq(analog.source.valid),
+            self.cic_a.sink.data.eq(analog.source.data_a),
+            self.cic_b.sink.data.eq(analog.source.data_b),
+            analog.source.ready.eq(self.cic_a.sink.ready),
+            self.data_cha.eq(self.cic_a.source.data),
+            self.data_chb.eq(self.cic_b.source.data),
+            read_fifo.sink.valid.eq(self.cic_a.source.valid),
+            self.cic_a.source.ready.eq(read_fifo.sink.ready),
+            self.cic_b.source.ready.eq(read_fifo.sink.ready),
+        ]
+
         self.comb += [
             read_fifo.sink.data_a.eq(self.data_cha),
             read_fifo.sink.data_b.eq(self.data_chb),
             analog.enable.eq(self.enable),
-            read_fifo.sink.valid.eq(self._valid),
             read_fifo.source.connect(self.source)
         ]
-        
-        self._push_to_fifo_fsm = FSM(reset_state="IDLE")
-        self._push_to_fifo_fsm.act("IDLE",
-            If(analog.source.valid,
-                NextState("SUM"),
-                NextValue(analog.source.ready, 0),
-                NextValue(self._chan_a_in, Cat(analog.source.data_a, 2*[analog.source.data_a[-1]])),
-                NextValue(self._chan_b_in, Cat(analog.source.data_b, 2*[analog.source.data_b[-1]]))
-            ).Else(
-                NextValue(analog.source.ready, 1)
-            ),
-            If(self.sum_cnt == 0,
-                NextValue(self._avg_chan_a, 0),
-                NextValue(self._avg_chan_b, 0),
-            )
-        )
-        self._push_to_fifo_fsm.act("SUM",
-            NextValue(self._avg_chan_a, self._avg_chan_a + self._chan_a_in),
-            NextValue(self._avg_chan_b, self._avg_chan_b + self._chan_b_in),
-            If(self.sum_cnt < (oversampling - 1),
-                NextValue(self.sum_cnt, self.sum_cnt + 1),
-                NextState("IDLE")
-            ).Else(
-                NextValue(self.sum_cnt, 0),
-                NextValue(self.data_cha, self._avg_chan_a[2:]),
-                NextValue(self.data_chb, self._avg_chan_b[2:]),
-                NextValue(self._valid, 1),
-                NextState("WAIT_FOR_READY")
-            )
-        )
-        self._push_to_fifo_fsm.act("WAIT_FOR_READY",
-            If(read_fifo.sink.ready,
-                NextState("IDLE"),
-                NextValue(self._valid, 0),
-                NextValue(analog.source.ready, 1)
-            )
-        )
 
 
 if __name__ == "__main__":
+    import argparse
     from migen.fhdl.verilog import convert
 
-    convert(Ads92x4()).write("Ads92x4.v")
+    parser = argparse.ArgumentParser(description="Generate Verilog for the Ads92x4 readout")
+    parser.add_argument("--pipelined", action="store_true", help="Pipelined readout")
+    parser.add_argument(
+        "--adc-count", type=int, default=1, help="Number of devices read in lockstep"
+    )
+    args = parser.parse_args()
+
+    convert(Ads92x4(pipelined=args.pipelined, adc_count=args.adc_count)).write(
+        "Ads92x4.v"
+    )
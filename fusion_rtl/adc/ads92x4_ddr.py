@@ -0,0 +1,446 @@
+import logging
+
+from litex.gen import *
+from litex.soc.cores.clock.common import *
+from litex.soc.cores.clock import ECP5PLL
+from migen.genlib.resetsync import AsyncResetSynchronizer
+
+
+class Ecp5Sys2xCRG(LiteXModule):
+    """
+    sys and sys2x clock domains for the DDR readout, built as for the ECP5
+    DDR PHYs: the PLL makes twice the sys frequency, ECLKSYNCB drives the
+    edge clock tree with it and CLKDIVF divides it back into sys, so both
+    are phase aligned.
+
+    :param clkin: Input clock.
+    :param clkin_freq: Its frequency.
+    :param sys_clk_freq: Frequency of the sys domain.
+    """
+    def __init__(self, clkin, clkin_freq, sys_clk_freq):
+        self.rst = Signal()
+        self.stop = Signal()
+        self.cd_sys = ClockDomain()
+        self.cd_sys2x = ClockDomain()
+        self.cd_sys2x_i = ClockDomain(reset_less=True)
+
+        self.pll = pll = ECP5PLL()
+        self.comb += pll.reset.eq(self.rst)
+        pll.register_clkin(clkin, clkin_freq)
+        pll.create_clkout(self.cd_sys2x_i, 2 * sys_clk_freq, with_reset=False)
+        self.specials += [
+            Instance(
+                "ECLKSYNCB",
+                i_ECLKI=self.cd_sys2x_i.clk,
+                i_STOP=self.stop,
+                o_ECLKO=self.cd_sys2x.clk,
+            ),
+            Instance(
+                "CLKDIVF",
+                p_DIV="2.0",
+                i_ALIGNWD=0,
+                i_CLKI=self.cd_sys2x.clk,
+                i_RST=self.rst,
+                o_CDIVX=self.cd_sys.clk,
+            ),
+            AsyncResetSynchronizer(self.cd_sys, ~pll.locked | self.rst),
+            AsyncResetSynchronizer(self.cd_sys2x, ~pll.locked | self.rst),
+        ]
+
+
+class Ecp5Ads92x4Phy(LiteXModule):
+    """
+    ECP5 IOs of the DDR readout, SCLK and MOSI go through ODDRX2F and each
+    MISO through a DELAYF then an IDDRX2F, so every sys clock carries four
+    quarter period slots per line (slot 0 is the first one on the wire).
+    Needs a ``sys2x`` edge clock phase aligned with sys, see Ecp5Sys2xCRG.
+
+    :param pads: Ads92x4DDR pads record, the lanes are miso_a then miso_b of
+        each device.
+    :param clock_domain_2x: Edge clock domain at twice the sys frequency.
+    """
+    taps = 128
+
+    def __init__(self, pads, clock_domain_2x="sys2x"):
+        lane_pads = []
+        for i in range(len(pads.miso_a)):
+            lane_pads += [pads.miso_a[i], pads.miso_b[i]]
+        self.lanes = len(lane_pads)
+        self.sclk = Signal(4)
+        self.mosi = Signal(4)
+        self.miso = [Signal(4) for _ in range(self.lanes)]
+        self.dly_loadn = [Signal(reset=1) for _ in range(self.lanes)]
+        self.dly_move = [Signal() for _ in range(self.lanes)]
+        self.dly_direction = [Signal() for _ in range(self.lanes)]
+        self.dly_cflag = [Signal() for _ in range(self.lanes)]
+
+        eclk = ClockSignal(clock_domain_2x)
+        sclk = ClockSignal("sys")
+        rst = ResetSignal("sys")
+        for pins, slots in ((pads.sclk, self.sclk), (pads.mosi, self.mosi)):
+            for pad in pins:
+                self.specials += Instance(
+                    "ODDRX2F",
+                    i_D0=slots[0],
+                    i_D1=slots[1],
+                    i_D2=slots[2],
+                    i_D3=slots[3],
+                    i_ECLK=eclk,
+                    i_SCLK=sclk,
+                    i_RST=rst,
+                    o_Q=pad,
+                )
+        for i, pad in enumerate(lane_pads):
+            delayed = Signal()
+            self.specials += Instance(
+                "DELAYF",
+                p_DEL_MODE="USER_DEFINED",
+                p_DEL_VALUE=0,
+                i_A=pad,
+                i_LOADN=self.dly_loadn[i],
+                i_MOVE=self.dly_move[i],
+                i_DIRECTION=self.dly_direction[i],
+                o_Z=delayed,
+                o_CFLAG=self.dly_cflag[i],
+            )
+            self.specials += Instance(
+                "IDDRX2F",
+                i_D=delayed,
+                i_ECLK=eclk,
+                i_SCLK=sclk,
+                i_RST=rst,
+                i_ALIGNWD=0,
+                o_Q0=self.miso[i][0],
+                o_Q1=self.miso[i][1],
+                o_Q2=self.miso[i][2],
+                o_Q3=self.miso[i][3],
+            )
+
+
+class _BitAligner(LiteXModule):
+    """
+    Bang-bang alignment of one MISO lane. Each sys clock gives two data
+    samples (slots ``phase`` and ``phase + 2``) and the edge sample between
+    them. On a data transition the edge sample tells whether the sampling
+    point is early or late, votes are summed over ``window`` transitions and
+    the DELAYF moves one tap the majority way. At the end of the tap range
+    the data slots move by a quarter period instead. The lane is locked
+    after ``reversals`` direction changes, the delay is frozen from then on.
+    """
+    def __init__(self, phy, lane, window=32, reversals=4):
+        self.samples = Signal(4)
+        self.valid = Signal()
+        self.enable = Signal()
+        self.phase = Signal(reset=0)
+        self.locked = Signal(reset=0)
+
+        self.tap = Signal(max=phy.taps, reset=0)
+        self._votes = Signal((bits_for(window) + 1, True), reset=0)
+        self._count = Signal(max=window + 1, reset=0)
+        self._last_dir = Signal(reset=0)
+        self._reversals = Signal(max=reversals + 1, reset=0)
+
+        first = Signal()
+        edge = Signal()
+        second = Signal()
+        self.comb += [
+            first.eq(Mux(self.phase, self.samples[1], self.samples[0])),
+            edge.eq(Mux(self.phase, self.samples[2], self.samples[1])),
+            second.eq(Mux(self.phase, self.samples[3], self.samples[2])),
+        ]
+
+        # later: the transition is after the edge sample, sample later by
+        # removing delay from the data, earlier: add delay.
+        later = Signal()
+        self.comb += later.eq(self._votes > 0)
+        move = phy.dly_move[lane]
+        direction = phy.dly_direction[lane]
+        self.sync += [
+            move.eq(0),
+            If(
+                self.enable & ~self.locked & self.valid & (first != second),
+                self._count.eq(self._count + 1),
+                If(
+                    edge == first,
+                    self._votes.eq(self._votes + 1),
+                ).Else(
+                    self._votes.eq(self._votes - 1),
+                ),
+            ),
+            If(
+                self._count == window,
+                self._count.eq(0),
+                self._votes.eq(0),
+                If(
+                    self._votes != 0,
+                    If(
+                        later != self._last_dir,
+                        self._reversals.eq(self._reversals + 1),
+                        If(self._reversals == reversals - 1, self.locked.eq(1)),
+                    ),
+                    self._last_dir.eq(later),
+                    If(
+                        later,
+                        If(
+                            self.tap == 0,
+                            If(~self.phase, self.phase.eq(1)),
+                        ).Else(
+                            self.tap.eq(self.tap - 1),
+                            direction.eq(1),
+                            move.eq(1),
+                        ),
+                    ).Else(
+                        If(
+                            self.tap == phy.taps - 1,
+                            If(self.phase, self.phase.eq(0)),
+                        ).Else(
+                            self.tap.eq(self.tap + 1),
+                            direction.eq(0),
+                            move.eq(1),
+                        ),
+                    ),
+                ),
+            ),
+        ]
+
+
+class Ads92x4DDR(LiteXModule):
+    """
+    Ads92x4 readout with SCLK at twice the sys clock, through ECP5 ODDRX2F,
+    IDDRX2F and DELAYF. Same interface as Ads92x4 plus ``calibrated``,
+    except that ``pads.sclk`` and ``pads.mosi`` have one bit per device, an
+    ODDRX2F only drives a single pin.
+
+    Each sys clock shifts two bits per lane, a 16 bits word takes 8 clocks.
+    At power up every lane is aligned on the incoming data transitions (see
+    _BitAligner), samples are delivered from the start but are only
+    guaranteed once ``calibrated`` is set. CS stays low until the last
+    delayed slot is captured.
+
+    :param adc_count: Number of devices read in lockstep, as for Ads92x4.
+    :param capture_latency: Sys clocks between a slot leaving the ODDRX2F
+        and the same slot coming out of the IDDRX2F.
+    :param bit_delay: Whole SCLK periods of SCLK to SDO delay (device, board
+        and IOs) left once the lanes are aligned, 0 to 2.
+    :param phy: IO module class, built with the pads record.
+    :param sys_clk_freq: When given, the highest sample rate is computed at
+        elaboration time, logged and stored in ``max_throughput``.
+    """
+    MAX_SAMPLE_RATE = 3e6
+
+    def __init__(
+        self,
+        smp_clk_is_synchronous=True,
+        oversampling=1,
+        zone=2,
+        capture_latency=3,
+        bit_delay=0,
+        clock_domain_2x="sys2x",
+        phy=Ecp5Ads92x4Phy,
+        sys_clk_freq=None,
+        adc_count=1,
+    ):
+        assert capture_latency >= 1
+        assert 0 <= bit_delay <= 2
+        self.smp_clk = Signal()
+        self.smp_clk_out = Signal()
+        self.adc_count = adc_count
+        self.data = Signal(32 * adc_count)
+        self.data_cha = Signal(16)
+        self.data_chb = Signal(16)
+        self.missed = Signal()
+        self.missed_count = Signal(32, reset=0)
+        self.calibrated = Signal()
+        self._ready_strobe_reg = Signal()
+
+        self.pads = Record(
+            [
+                ("conv_st", 1),
+                ("cs", 1),
+                ("ready_strobe", 1),
+                ("sclk", adc_count),
+                ("mosi", adc_count),
+                ("miso_a", adc_count),
+                ("miso_b", adc_count),
+            ]
+        )
+
+        self.phy = phy = phy(self.pads, clock_domain_2x=clock_domain_2x)
+        self.comb += [
+            self.data_cha.eq(self.data[:16]),
+            self.data_chb.eq(self.data[16:32]),
+        ]
+
+        if oversampling == 2:
+            averaging = 2
+        elif oversampling == 4:
+            averaging = 3
+        else:
+            averaging = 0
+        self.config_reg = Signal(16, reset=0x1600 + averaging)
+
+        self.comb += self.pads.conv_st.eq(self.smp_clk)
+
+        self._smp_clk = Signal()
+        if smp_clk_is_synchronous:
+            self.comb += self._smp_clk.eq(self.smp_clk)
+        else:
+            self._smp_clk_reg = Signal()
+            self.sync += self._smp_clk_reg.eq(self.smp_clk)
+            self.sync += self._smp_clk.eq(self._smp_clk_reg)
+        self._smp_clk_d = Signal()
+        self.sync += self._smp_clk_d.eq(self._smp_clk)
+
+        if zone == 1 or oversampling != 1:
+            self.sync += self._ready_strobe_reg.eq(self.pads.ready_strobe)
+        else:
+            self.comb += self._ready_strobe_reg.eq(1)
+
+        # IDLE, WAIT_RDY, ASSERT_CS, 8 READ, the capture latency plus one,
+        # DONE and ENSURE_SMP_CLK_LOW, the waits counted as a single clock
+        # as for Ads92x4
+        self.min_cycles_per_sample = 3 + 8 + capture_latency + 1 + 2
+        self.max_throughput = None
+        if sys_clk_freq is not None:
+            self.max_throughput = min(
+                self.MAX_SAMPLE_RATE, sys_clk_freq / self.min_cycles_per_sample
+            )
+            logging.getLogger("Ads92x4DDR").info(
+                f"at least {self.min_cycles_per_sample} clocks per sample, at "
+                f"most {self.max_throughput / 1e6:.3f} MSPS at "
+                f"{sys_clk_freq / 1e6:.1f} MHz"
+            )
+
+        self.read_cycles = Signal(max=8 + capture_latency + 2, reset=0)
+        self._reading = Signal()
+        self._window = Signal()
+        # the 8 READ clocks and the next one are captured, delayed by the IO
+        # latency, the extra clock makes room for bit_delay
+        self._window_pipe = Signal(capture_latency + 1, reset=0)
+        self.sync += self._window_pipe.eq(Cat(self._reading, self._window_pipe[:-1]))
+        self.comb += self._window.eq(self._window_pipe[-1] | self._window_pipe[-2])
+
+        self.aligners = []
+        self._history = []
+        for lane in range(phy.lanes):
+            aligner = _BitAligner(phy, lane)
+            self.submodules += aligner
+            self.aligners.append(aligner)
+            self.comb += [
+                aligner.samples.eq(phy.miso[lane]),
+                aligner.valid.eq(self._window),
+            ]
+            # two data samples per clock over the 9 captured clocks, the
+            # newest at the LSB
+            history = Signal(18, reset=0)
+            self.sync += If(
+                self._window,
+                history.eq(
+                    Cat(
+                        Mux(aligner.phase, phy.miso[lane][3], phy.miso[lane][2]),
+                        Mux(aligner.phase, phy.miso[lane][1], phy.miso[lane][0]),
+                        history[:-2],
+                    )
+                ),
+            )
+            self._history.append(history)
+        self.comb += self.calibrated.eq(
+            Reduce("AND", [aligner.locked for aligner in self.aligners])
+        )
+
+        # Once aligned the edge sample sits on the SDO transitions, so the
+        # first data sample of READ is bit 0 whatever the phase, unless the
+        # SDO delay exceeds a whole SCLK period. Lanes are miso_a then miso_b
+        # of each device, packed as Ads92x4.data.
+        words = Cat(
+            *[history[2 - bit_delay : 18 - bit_delay] for history in self._history]
+        )
+
+        self.fsm = FSM(reset_state="IDLE")
+        self.fsm.act(
+            "IDLE",
+            NextValue(self.pads.cs, 1),
+            NextValue(self.read_cycles, 0),
+            *[NextValue(aligner.enable, 1) for aligner in self.aligners],
+            If(self._smp_clk, NextState("WAIT_RDY")),
+        )
+        self.fsm.act(
+            "WAIT_RDY",
+            If(
+                self._ready_strobe_reg,
+                NextState("ASSERT_CS"),
+                NextValue(self.pads.cs, 0),
+                NextValue(self.smp_clk_out, 0),
+            ),
+        )
+        self.fsm.act(
+            "ASSERT_CS",
+            NextState("READ"),
+        )
+        self.fsm.act(
+            "READ",
+            self._reading.eq(1),
+            self.phy.sclk.eq(0b0101),
+            self.phy.mosi.eq(
+                Cat(
+                    self.config_reg[-1],
+                    self.config_reg[-1],
+                    self.config_reg[-2],
+                    self.config_reg[-2],
+                )
+            ),
+            NextValue(self.config_reg, Cat(1, 1, self.config_reg[:-2])),
+            NextValue(self.read_cycles, self.read_cycles + 1),
+            If(
+                self.read_cycles == 7,
+                NextValue(self.read_cycles, 0),
+                NextState("CAPTURE"),
+            ),
+        )
+        # SCLK and SDO are still on the wire for the capture latency, CS
+        # only rises once the window is closed
+        self.fsm.act(
+            "CAPTURE",
+            NextValue(self.read_cycles, self.read_cycles + 1),
+            If(
+                self.read_cycles == capture_latency,
+                NextValue(self.pads.cs, 1),
+                NextState("DONE"),
+            ),
+        )
+        self.fsm.act(
+            "DONE",
+            NextValue(self.data, words),
+            NextValue(self.smp_clk_out, 1),
+            NextState("ENSURE_SMP_CLK_LOW"),
+        )
+        self.fsm.act(
+            "ENSURE_SMP_CLK_LOW",
+            If(
+                ~self._smp_clk,
+                NextState("IDLE"),
+            ),
+        )
+
+        self.comb += self.missed.eq(
+            self._smp_clk & ~self._smp_clk_d & ~self.fsm.ongoing("IDLE")
+        )
+        self.sync += If(self.missed, self.missed_count.eq(self.missed_count + 1))
+
+
+if __name__ == "__main__":
+    import argparse
+    from migen.fhdl.verilog import convert
+
+    parser = argparse.ArgumentParser(description="Generate Verilog for the Ads92x4DDR readout")
+    parser.add_argument(
+        "--adc-count", type=int, default=1, help="Number of devices read in lockstep"
+    )
+    parser.add_argument(
+        "--capture-latency", type=int, default=3, help="ODDRX2F to IDDRX2F latency"
+    )
+    args = parser.parse_args()
+
+    convert(
+        Ads92x4DDR(adc_count=args.adc_count, capture_latency=args.capture_latency)
+    ).write("Ads92x4DDR.v")
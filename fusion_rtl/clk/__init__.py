@@ -8,6 +8,19 @@ class ClkDiv(LiteXModule):
         self.counter = Signal(reset=0, max=(MaxValue//2)-1)
         self.sync += If(self.counter==0, self.clk_out.eq(~self.clk_out))
         self.sync += If(self.counter<((MaxValue//2)-1), self.counter.eq(self.counter + 1)).Else(self.counter.eq(0))
+
+
+class ProgrammableClkDiv(LiteXModule):
+    """
+    ClkDiv with a run time division ratio, max_value LSB is ignored.
+    """
+    def __init__(self, MaxValue, width=16):
+        assert 2*(MaxValue//2)==MaxValue
+        self.max_value = Signal(width, reset=MaxValue)
+        self.clk_out = Signal(reset=0)
+        self.counter = Signal(width - 1, reset=0)
+        self.sync += If(self.counter==0, self.clk_out.eq(~self.clk_out))
+        self.sync += If(self.counter<(self.max_value[1:]-1), self.counter.eq(self.counter + 1)).Else(self.counter.eq(0))
         
         
         
@@ -3,7 +3,9 @@ from litex.soc.cores.clock.common import *
 
 
 class DataEncoder(LiteXModule):
-    def __init__(self, adc_count=1):
+    def __init__(self, adc_count=1, samples_per_frame=1):
+        assert samples_per_frame >= 1
+        self.samples_per_frame = samples_per_frame
         self.acd_data = [(Signal(16), Signal(16)) for _ in range(adc_count)]
 
         self.smp_clk = Signal()
@@ -16,6 +18,7 @@ class DataEncoder(LiteXModule):
         self.comb += self._smp_clk.eq(self.smp_clk)
 
         self._frame_counter = Signal(16, reset=0)
+        self._sample_cnt = Signal(max=max(samples_per_frame, 2), reset=0)
 
         self._frame = [Signal(8) for _ in range(4 + adc_count * 4)]
 
@@ -56,11 +59,18 @@ class DataEncoder(LiteXModule):
         )
 
 
+        # Only the first sample set of a frame is preceded by the header,
+        # the following ones start straight at the samples bytes.
         self.fsm = FSM(reset_state="IDLE")
         self.fsm.act(
             "IDLE",
             NextValue(self.fifo_we, 0),
             If(
+                self._smp_clk & (self._sample_cnt != 0),
+                NextState(f"push_data_{self.header_size + 1}"),
+                NextValue(self.fifo_we, 1),
+                NextValue(self.fifo_din, self._frame[self.header_size]),
+            ).Elif(
                 self._smp_clk & self.fifo_has_enough_space,
                 NextState("push_data_1"),
                 NextValue(self.fifo_we, 1),
@@ -80,6 +90,12 @@ class DataEncoder(LiteXModule):
             NextState("wait_for_smp_clk_low"),
             NextValue(self.fifo_din, self._frame[-1]),
             NextValue(self.fifo_we, 1),
+            If(
+                self._sample_cnt == samples_per_frame - 1,
+                NextValue(self._sample_cnt, 0),
+            ).Else(
+                NextValue(self._sample_cnt, self._sample_cnt + 1),
+            ),
         )
         self.fsm.act(
             "wait_for_smp_clk_low",
@@ -92,11 +108,15 @@ class DataEncoder(LiteXModule):
         
     @property
     def frame_size(self):
-        return len(self._frame)
+        return self.header_size + self.samples_per_frame * (
+            len(self._frame) - self.header_size
+        )
 
 
 class DataEncoder2(LiteXModule):
-    def __init__(self, inputs):
+    def __init__(self, inputs, samples_per_frame=1):
+        assert samples_per_frame >= 1
+        self.samples_per_frame = samples_per_frame
         self.acd_data = [Signal(16) for _ in range(inputs)]
         self.adc_data_readable = Signal()
         self.adc_data_re = Signal(reset=0)
@@ -107,6 +127,7 @@ class DataEncoder2(LiteXModule):
         self.fifo_has_enough_space = Signal()
 
         self.frame_counter = Signal(16, reset=0)
+        self._sample_cnt = Signal(max=max(samples_per_frame, 2), reset=0)
 
         self.frame = [Signal(8) for _ in range(4 + inputs * 2)]
 
@@ -166,20 +187,173 @@ class DataEncoder2(LiteXModule):
         )
         self.fsm.act(
             f"ACK",
-            NextState("IDLE"),
             NextValue(self.fifo_we, 0),
             NextValue(self.adc_data_re, 0),
+            If(
+                self._sample_cnt == samples_per_frame - 1,
+                NextState("IDLE"),
+                NextValue(self._sample_cnt, 0),
+            ).Else(
+                NextState("WAIT_SAMPLES"),
+                NextValue(self._sample_cnt, self._sample_cnt + 1),
+            ),
+        )
+        # Next sample set of the same frame, self.frame registers still hold
+        # the previous one here so the first byte is taken from acd_data.
+        self.fsm.act(
+            "WAIT_SAMPLES",
+            If(
+                self.adc_data_readable,
+                NextState(f"push_data_{self.header_size + 1}"),
+                NextValue(self.fifo_we, 1),
+                NextValue(self.fifo_din, self.acd_data[0][:8]),
+            ),
         )
         
         
     @property
     def frame_size(self):
-        return len(self.frame)
+        return self.header_size + self.samples_per_frame * (
+            len(self.frame) - self.header_size
+        )
+
+
+class DataEncoderWide(LiteXModule):
+    """
+    Word-wide variant of DataEncoder2.
+
+    Emits the same byte stream as DataEncoder2 (0xF0, 0x0F, frame counter,
+    samples, all little endian) but packs it into ``data_width`` bits words,
+    first byte in the LSBs, and pushes up to one word per clock. Sample sets
+    are packed back to back, frames are padded with zeros up to a whole
+    number of words.
+
+    :param inputs: Number of 16 bits inputs.
+    :param data_width: Output word width, must be a multiple of 16.
+    :param samples_per_frame: Number of sample sets sharing one header.
+    """
+    def __init__(self, inputs, data_width=32, samples_per_frame=1):
+        assert data_width % 16 == 0, "Data width must be a multiple of 16"
+        assert samples_per_frame >= 1
+        self.samples_per_frame = samples_per_frame
+        self.acd_data = [Signal(16) for _ in range(inputs)]
+        self.adc_data_readable = Signal()
+        self.adc_data_re = Signal()
 
+        self.fifo_din = Signal(data_width)
+        self.fifo_we = Signal(reset=0)
+        self.fifo_writable = Signal()
+        self.fifo_has_enough_space = Signal()
+
+        self.frame_counter = Signal(16, reset=0)
+
+        self.header_size = 4
+        self.bytes_per_word = data_width // 8
+        set_size = inputs * 2
+
+        frame_bytes = [("const", 0xF0), ("const", 0x0F), ("cnt", 0), ("cnt", 1)]
+        for k in range(samples_per_frame):
+            frame_bytes += [("smp", k, j) for j in range(set_size)]
+        while len(frame_bytes) % self.bytes_per_word:
+            frame_bytes.append(("const", 0))
+        self.frame_bytes = len(frame_bytes)
+        words = [
+            frame_bytes[i : i + self.bytes_per_word]
+            for i in range(0, len(frame_bytes), self.bytes_per_word)
+        ]
+
+        # Static schedule, one step per clock: each step may push one word
+        # and/or pop one sample set from the ADC FIFOs. Sample sets already
+        # popped but still needed by a word are kept in a small history.
+        steps = []
+        head = 0
+        for word in words:
+            last_set = max([src[1] for src in word if src[0] == "smp"], default=-1)
+            while last_set > head:
+                steps.append((None, head, True))
+                head += 1
+            pop = ("smp", head, set_size - 1) in word
+            steps.append((word, head, pop))
+            head += pop
+
+        history_depth = max(
+            [
+                head - src[1]
+                for word, head, _ in steps
+                if word is not None
+                for src in word
+                if src[0] == "smp" and src[1] < head
+            ],
+            default=0,
+        )
+        self._history = [
+            [Signal(16) for _ in range(inputs)] for _ in range(history_depth)
+        ]
+        if history_depth:
+            self.sync += If(
+                self.adc_data_re,
+                [self._history[0][i].eq(self.acd_data[i]) for i in range(inputs)],
+                [
+                    self._history[d][i].eq(self._history[d - 1][i])
+                    for d in range(1, history_depth)
+                    for i in range(inputs)
+                ],
+            )
+
+        def _byte(src, head):
+            if src[0] == "const":
+                return C(src[1], 8)
+            if src[0] == "cnt":
+                # frame_counter already counts the sets popped in this frame
+                counter = self.frame_counter - head if head else self.frame_counter
+                return counter[8 * src[1] : 8 * (src[1] + 1)]
+            _, k, j = src
+            sample = self.acd_data[j // 2] if k == head else self._history[head - k - 1][j // 2]
+            return sample[8 * (j % 2) : 8 * (j % 2 + 1)]
+
+        self.frame = words
+        self._step = Signal(max=max(len(steps), 2), reset=0)
+        push_cases = {}
+        pop_cases = {}
+        for n, (word, head, pop) in enumerate(steps):
+            uses_fifo = pop or any(
+                src[0] == "smp" and src[1] == head for src in word or []
+            )
+            condition = self.adc_data_readable if uses_fifo else 1
+            if n == 0:
+                condition = condition & self.fifo_has_enough_space
+            actions = [self._step.eq((n + 1) % len(steps))]
+            if word is not None:
+                actions += [
+                    self.fifo_we.eq(1),
+                    self.fifo_din.eq(Cat(*[_byte(src, head) for src in word])),
+                ]
+            if pop:
+                actions += [self.frame_counter.eq(self.frame_counter + 1)]
+                pop_cases[n] = self.adc_data_re.eq(condition)
+            push_cases[n] = If(condition, *actions)
+
+        self.sync += [
+            self.fifo_we.eq(0),
+            Case(self._step, push_cases),
+        ]
+        self.comb += Case(self._step, pop_cases)
+
+    @property
+    def frame_size(self):
+        return len(self.frame)
 
 
 if __name__ == "__main__":
+    import argparse
     from migen.fhdl.verilog import convert
 
-    convert(DataEncoder()).write("DataEncoder.v")
-    convert(DataEncoder2(4)).write("DataEncoder2.v")
+    parser = argparse.ArgumentParser(description="Generate Verilog for the data encoders")
+    parser.add_argument("--samples-per-frame", type=int, default=1, help="Sample sets per header")
+    parser.add_argument("--data-width", type=int, default=32, help="DataEncoderWide word width")
+    args = parser.parse_args()
+
+    spf = args.samples_per_frame
+    convert(DataEncoder(samples_per_frame=spf)).write("DataEncoder.v")
+    convert(DataEncoder2(4, samples_per_frame=spf)).write("DataEncoder2.v")
+    convert(DataEncoderWide(4, data_width=args.data_width, samples_per_frame=spf)).write("DataEncoderWide.v")
@@ -0,0 +1,54 @@
+from litex.gen import *
+from litex.soc.cores.clock.common import *
+
+
+class FmcRegisterFile(LiteXModule):
+    """
+    Registers on the non data addresses of a Stm32FmcNorInterface, so the
+    STM32 can retune the gateware at run time with plain FMC reads and
+    writes. Registers are declared with add_register, the address decoding
+    is built when the module is finalized.
+
+    :param nor_if: The Stm32FmcNorInterface to attach to.
+    """
+    def __init__(self, nor_if):
+        self.nor_if = nor_if
+        self.registers = {}
+
+    def add_register(self, address, signal, writable=True, strobe=None):
+        """
+        :param strobe: Signal pulsed for one clock each time the register is
+            written, along with the new value.
+        """
+        assert address not in (self.nor_if.data_address, self.nor_if.level_address)
+        assert address not in self.registers, f"Address {address} already used"
+        assert 0 <= address < 2**self.nor_if.address.nbits
+        assert strobe is None or writable
+        self.registers[address] = (signal, writable, strobe)
+
+    def do_finalize(self):
+        self.comb += Case(
+            self.nor_if.read_address,
+            {
+                address: self.nor_if.reg_rdata.eq(signal)
+                for address, (signal, _, _) in self.registers.items()
+            }
+            | {"default": self.nor_if.reg_rdata.eq(0)},
+        )
+        self.sync += [
+            strobe.eq(0)
+            for _, _, strobe in self.registers.values()
+            if strobe is not None
+        ]
+        self.sync += If(
+            self.nor_if.reg_we,
+            Case(
+                self.nor_if.reg_address,
+                {
+                    address: [signal.eq(self.nor_if.reg_wdata)]
+                    + ([strobe.eq(1)] if strobe is not None else [])
+                    for address, (signal, writable, strobe) in self.registers.items()
+                    if writable
+                },
+            ),
+        )
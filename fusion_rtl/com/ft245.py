@@ -1,7 +1,8 @@
 from litex.gen import *
 from litex.soc.cores.clock.common import *
 from migen.fhdl.specials import Tristate
-from migen.genlib.fifo import SyncFIFO
+from migen.genlib.fifo import SyncFIFO, AsyncFIFOBuffered
+from ..memories.bram_fifo import BramFifo
 
 
 
@@ -35,7 +36,7 @@ class ft245(LiteXModule):
 
         self._fifo_re = Signal(reset=0)
 
-        self.fifo = SyncFIFO(width=8, depth=fifo_depth)
+        self.fifo = BramFifo(width=8, depth=fifo_depth)
         self.submodules += self.fifo
         
         self.fifo_reg = FifoOutputReg(8, self.fifo)
@@ -76,3 +77,123 @@ class ft245(LiteXModule):
                 oe=self.data_oe,
                 i=self._data_r[i],
             )
+
+
+class _SyncFifoWriter(LiteXModule):
+    """
+    Sync 245 write side, runs on the FTDI CLKOUT. The FTDI takes the word on
+    a rising edge where both TXE# and WR# are low, the same edge is used here
+    to know whether the presented word was accepted. WR# and DATA are only
+    driven from registers so no pad to pad path limits the clock rate.
+    """
+    def __init__(self, fifo, width=8):
+        self.txf = Signal()
+        self.wr = Signal(reset=1)
+        self.oe = Signal(reset=1)
+        self.data_oe = Signal(reset=0)
+        self.dout = Signal(width)
+
+        self._valid = Signal(reset=0)
+        _accepted = Signal()
+        _load = Signal()
+        _valid = Signal()
+
+        self.comb += [
+            _accepted.eq(~self.wr & ~self.txf),
+            _load.eq(~self._valid | _accepted),
+            fifo.re.eq(_load & fifo.readable),
+            _valid.eq(Mux(_load, fifo.readable, self._valid)),
+        ]
+        self.sync += [
+            If(_load, self._valid.eq(fifo.readable), self.dout.eq(fifo.dout)),
+            self.wr.eq(~(_valid & ~self.txf & self.data_oe)),
+            # no read path, OE# stays high and the bus is only driven once the
+            # FTDI had a clock to release it
+            self.data_oe.eq(self.oe),
+        ]
+
+
+class ft245_sync(LiteXModule):
+    """
+    FT2232H/FT232H synchronous 245 FIFO mode, transmit only.
+
+    Same user side as ft245 (fifo_din, fifo_we, fifo_has_enough_space) in the
+    sys clock domain. Bytes cross to ``clock_domain``, clocked by the FTDI
+    60 MHz CLKOUT, through an AsyncFIFO and are written one per clock while
+    TXE# is low.
+
+    Only the transmit direction is supported, there is no receive path and
+    so no OE#/RD# turnaround: RD# and OE# are held high, the FPGA drives the
+    data bus one clock after reset and keeps it, and SIWU# is held high, the
+    FTDI flushes its buffer on its own. RXF# is not read, it is not routed
+    on PCB_LOB either.
+
+    :param threshold: Free space needed to assert fifo_has_enough_space.
+    :param fifo_depth: Depth of the sys side buffer.
+    :param clock_domain: Clock domain of the FTDI CLKOUT.
+    """
+    def __init__(self, threshold, fifo_depth=2**14, clock_domain="ftdi"):
+        self._data_r = Signal(8)
+        self._data_w = Signal(8)
+        self.rd = Signal(reset=1)
+        self.wr = Signal(reset=1)
+        self.oe = Signal(reset=1)
+        self.siwu = Signal(reset=1)
+        self.txf = Signal()
+        self.data_oe = Signal()
+
+        self.fifo_din = Signal(8)
+        self.fifo_we = Signal()
+        self.fifo_writable = Signal()
+        self.fifo_has_enough_space = Signal()
+
+        self.fifo = BramFifo(width=8, depth=fifo_depth)
+        self.submodules += self.fifo
+
+        self.cdc = ClockDomainsRenamer({"write": "sys", "read": clock_domain})(
+            AsyncFIFOBuffered(width=8, depth=16)
+        )
+        self.submodules += self.cdc
+
+        self.writer = ClockDomainsRenamer(clock_domain)(_SyncFifoWriter(self.cdc))
+        self.submodules += self.writer
+
+        self.sync += self.fifo_has_enough_space.eq(self.fifo.level<(fifo_depth-threshold-1))
+
+        self._connect(self.fifo.din, self.fifo_din)
+        self._connect(self.fifo.we, self.fifo_we)
+        self._connect(self.fifo_writable, self.fifo.writable)
+
+        self._connect(self.cdc.din, self.fifo.dout)
+        self.comb += self.cdc.we.eq(self.fifo.readable & self.cdc.writable)
+        self.comb += self.fifo.re.eq(self.fifo.readable & self.cdc.writable)
+
+        self._connect(self.writer.txf, self.txf)
+        self._connect(self.writer.oe, self.oe)
+        self._connect(self.oe, 1)
+        self._connect(self.rd, 1)
+        self._connect(self.siwu, 1)
+        self._connect(self.wr, self.writer.wr)
+        self._connect(self.data_oe, self.writer.data_oe)
+        self._connect(self._data_w, self.writer.dout)
+
+    def _connect(self, a, b, invert=False):
+        if invert:
+            self.comb += a.eq(~b)
+        else:
+            self.comb += a.eq(b)
+
+    def connect_data_pads(self, data_pads):
+        for i in range(self._data_r.nbits):
+            self.specials += Tristate(
+                target=data_pads[i],
+                o=self._data_w[i],
+                oe=self.data_oe,
+                i=self._data_r[i],
+            )
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(ft245_sync(threshold=64, fifo_depth=2**11)).write("ft245_sync.v")
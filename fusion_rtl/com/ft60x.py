@@ -0,0 +1,102 @@
+from litex.gen import *
+from litex.soc.cores.clock.common import *
+from migen.fhdl.specials import Tristate
+from migen.genlib.fifo import AsyncFIFOBuffered
+from ..memories.bram_fifo import BramFifo
+from .ft245 import _SyncFifoWriter
+
+
+class ft60x(LiteXModule):
+    """
+    FT600 (16 bits) / FT601 (32 bits) 245 synchronous FIFO mode, transmit only.
+
+    Words are written in the sys clock domain with their byte enables
+    (fifo_be, all bytes by default) and cross to ``clock_domain``, clocked by
+    the FT60x 100 MHz CLK, through an AsyncFIFO. The FT60x side writes one
+    word per CLK while TXE_N is low but the buffer feeds the AsyncFIFO one
+    word per sys clock, the sustained rate is one word per clock of the
+    slower of the two, 250 MB/s for an FT601 with a 62.5 MHz sys clock.
+
+    :param threshold: Free space, in words, needed to assert
+        fifo_has_enough_space.
+    :param data_width: 16 for the FT600, 32 for the FT601.
+    :param fifo_depth: Depth of the sys side buffer in words.
+    :param clock_domain: Clock domain of the FT60x CLK.
+    """
+    def __init__(self, threshold, data_width=32, fifo_depth=2**12, clock_domain="ft60x"):
+        assert data_width in (16, 32)
+        be_width = data_width // 8
+        self._data_r = Signal(data_width)
+        self._data_w = Signal(data_width)
+        self._be_r = Signal(be_width)
+        self._be_w = Signal(be_width)
+        self.rd = Signal(reset=1)
+        self.wr = Signal(reset=1)
+        self.oe = Signal(reset=1)
+        self.siwu = Signal(reset=1)
+        self.txf = Signal()
+        self.data_oe = Signal()
+
+        self.fifo_din = Signal(data_width)
+        self.fifo_be = Signal(be_width, reset=2**be_width - 1)
+        self.fifo_we = Signal()
+        self.fifo_writable = Signal()
+        self.fifo_has_enough_space = Signal()
+
+        self.fifo = BramFifo(width=data_width + be_width, depth=fifo_depth)
+        self.submodules += self.fifo
+
+        self.cdc = ClockDomainsRenamer({"write": "sys", "read": clock_domain})(
+            AsyncFIFOBuffered(width=data_width + be_width, depth=16)
+        )
+        self.submodules += self.cdc
+
+        self.writer = ClockDomainsRenamer(clock_domain)(
+            _SyncFifoWriter(self.cdc, width=data_width + be_width)
+        )
+        self.submodules += self.writer
+
+        self.sync += self.fifo_has_enough_space.eq(self.fifo.level<(fifo_depth-threshold-1))
+
+        self.comb += self.fifo.din.eq(Cat(self.fifo_din, self.fifo_be))
+        self._connect(self.fifo.we, self.fifo_we)
+        self._connect(self.fifo_writable, self.fifo.writable)
+
+        self._connect(self.cdc.din, self.fifo.dout)
+        self.comb += self.cdc.we.eq(self.fifo.readable & self.cdc.writable)
+        self.comb += self.fifo.re.eq(self.fifo.readable & self.cdc.writable)
+
+        self._connect(self.writer.txf, self.txf)
+        self._connect(self.writer.oe, self.oe)
+        self._connect(self.wr, self.writer.wr)
+        self._connect(self.data_oe, self.writer.data_oe)
+        self._connect(self._data_w, self.writer.dout[:data_width])
+        self._connect(self._be_w, self.writer.dout[data_width:])
+
+    def _connect(self, a, b, invert=False):
+        if invert:
+            self.comb += a.eq(~b)
+        else:
+            self.comb += a.eq(b)
+
+    def connect_data_pads(self, data_pads, be_pads):
+        for i in range(self._data_r.nbits):
+            self.specials += Tristate(
+                target=data_pads[i],
+                o=self._data_w[i],
+                oe=self.data_oe,
+                i=self._data_r[i],
+            )
+        for i in range(self._be_r.nbits):
+            self.specials += Tristate(
+                target=be_pads[i],
+                o=self._be_w[i],
+                oe=self.data_oe,
+                i=self._be_r[i],
+            )
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(ft60x(threshold=64, data_width=32, fifo_depth=2**10)).write("ft60x.v")
@@ -6,13 +6,47 @@ from ..memories.serialized_fifo import SerializeFifo
 
 
 class Stm32FmcNorInterface(LiteXModule):
-    def __init__(self, data_width, address_width):
+    def __init__(
+        self,
+        data_width,
+        address_width,
+        burst=False,
+        data_latency=2,
+        watermark=32,
+        flush_timeout=0,
+    ):
+        """
+        STM32 FMC NOR/PSRAM slave draining a FIFO.
+
+        Reads at ``data_address`` (0) pop the FIFO, reads at
+        ``level_address`` (the last address) return the number of valid words
+        in the FIFO without popping it. The other addresses and all writes go
+        to the reg_* port, see FmcRegisterFile. During the data phase
+        reads return the word of ``read_address``, the address latched when
+        the access started.
+
+        :param burst: Use the FMC synchronous burst read mode, one word per
+            FMC clock. The FMC clock must be the sys clock, NWAIT is active
+            low and asserted during the wait state (WAITCFG=1). When NADV is
+            not routed the burst starts on NE.
+        :param data_latency: Burst mode only, number of FMC clocks between
+            the edge sampling NADV low and the one sampling the first data.
+        :param watermark: Reset value of the programmable ``watermark``,
+            have_data is asserted once the FIFO holds that many words.
+        :param flush_timeout: Reset value of the programmable
+            ``flush_timeout``, once the oldest word waited that many clocks
+            have_data is asserted for a partial burst, 0 disables it. The
+            flush ends when the FIFO is empty or the level is read.
+        """
+        assert data_latency >= 1
         self._data_r = Signal(data_width)
         self._data_w = Signal(data_width)
         self.address = Signal(address_width)
         self.ne = Signal()
         self.noe = Signal()
         self.nwe = Signal()
+        self.nadv = Signal()
+        self.nwait = Signal(reset=1)
         self.data_oe = Signal()
 
         self.fifo_din = Signal(data_width)
@@ -29,26 +63,143 @@ class Stm32FmcNorInterface(LiteXModule):
         
         self.submodules += self.fifo
 
-        self.sync += self.have_data.eq(self.fifo.level >= 32)
+        self.data_address = 0
+        self.level_address = 2**address_width - 1
+        self.watermark = Signal(self.fifo.level.nbits, reset=watermark)
+        self.flush_timeout = Signal(32, reset=flush_timeout)
+        self._address = Signal(address_width, name="latched_address")
+        self._level_read = Signal()
+
+        self.reg_address = Signal(address_width)
+        self.reg_we = Signal()
+        self.reg_wdata = Signal(data_width)
+        self.reg_rdata = Signal(data_width)
+
+        # Access type, seen at any time while NE is low, used when it ends
+        self._read = Signal(reset=0)
+        self._write = Signal(reset=0)
+        self._end = Signal()
+        self.sync += If(
+            self._end,
+            self._read.eq(0),
+            self._write.eq(0),
+        ).Elif(
+            ~self.ne,
+            If(~self.noe, self._read.eq(1)),
+            If(~self.nwe, self._write.eq(1), self.reg_wdata.eq(self._data_r)),
+        )
+        self.comb += [
+            self.reg_address.eq(self._address),
+            self.reg_we.eq(self._end & self._write),
+            self._level_read.eq(
+                self._end & self._read & (self._address == self.level_address)
+            ),
+        ]
+        self._age = Signal(32, reset=0)
+        self._flush = Signal(reset=0)
+        _reached = Signal()
+        self.comb += _reached.eq(self.fifo.level >= self.watermark)
+        self.sync += [
+            If(
+                (self.fifo.level == 0) | _reached | self._level_read,
+                self._age.eq(0),
+                self._flush.eq(0),
+            ).Else(
+                self._age.eq(self._age + 1),
+                If(
+                    (self.flush_timeout != 0) & (self._age >= self.flush_timeout),
+                    self._flush.eq(1),
+                ),
+            ),
+            self.have_data.eq(_reached | self._flush),
+        ]
+
         self._connect(self.data_oe, self.noe, invert=True)
-        self._connect(self._data_w, self.fifo.dout)
+        # once latched, the data phase returns the word of the address the
+        # pops are decided on, the pins may carry another one during a burst
+        self.read_address = Signal(address_width)
+        self.comb += If(
+            self.read_address == self.data_address,
+            self._data_w.eq(self.fifo.dout),
+        ).Elif(
+            self.read_address == self.level_address,
+            self._data_w.eq(self.fifo.level),
+        ).Else(
+            self._data_w.eq(self.reg_rdata),
+        )
         self._connect(self.fifo.re, self._fifo_re)
         self._connect(self.fifo.din, self.fifo_din)
         self._connect(self.fifo.we, self.fifo_we)
         self._connect(self.fifo_writable, self.fifo.writable)
 
         self.fsm = FSM(reset_state="IDLE")
-        self.fsm.act(
-            "IDLE", If(~self.ne, NextState("ADDR")), NextValue(self._fifo_re, 0)
-        )
-        self.fsm.act("ADDR", NextState("DATA"))
-        self.fsm.act(
-            "DATA",
-            If(
-                self.ne,
-                NextState("IDLE"),
-                NextValue(self._fifo_re, 1),
-            ),
+        if burst:
+            self._latency = Signal(max=max(data_latency, 2))
+            self.fsm.act(
+                "IDLE",
+                If(
+                    ~self.ne & ~self.nadv,
+                    NextValue(self._address, self.address),
+                    NextValue(self._latency, max(data_latency - 2, 0)),
+                    NextState("DATA" if data_latency == 1 else "LATENCY"),
+                ),
+            )
+            self.fsm.act(
+                "LATENCY",
+                If(
+                    self.ne,
+                    self._end.eq(1),
+                    NextState("IDLE"),
+                ).Elif(
+                    self._latency == 0,
+                    NextState("DATA"),
+                ).Else(
+                    NextValue(self._latency, self._latency - 1),
+                ),
+            )
+            # The FMC samples a word on each clock edge unless NWAIT is low,
+            # so the FIFO is popped on every clock it has data.
+            self.fsm.act(
+                "DATA",
+                If(
+                    self.ne,
+                    self._end.eq(1),
+                    NextState("IDLE"),
+                ),
+                self._fifo_re.eq(
+                    ~self.ne
+                    & ~self.noe
+                    & self.fifo.readable
+                    & (self._address == self.data_address)
+                ),
+                self.nwait.eq(
+                    self.fifo.readable | (self._address != self.data_address)
+                ),
+            )
+        else:
+            self.fsm.act(
+                "IDLE",
+                If(~self.ne, NextValue(self._address, self.address), NextState("ADDR")),
+                NextValue(self._fifo_re, 0),
+            )
+            self.fsm.act("ADDR", NextState("DATA"))
+            self.fsm.act(
+                "DATA",
+                If(
+                    self.ne,
+                    self._end.eq(1),
+                    NextState("IDLE"),
+                    NextValue(
+                        self._fifo_re,
+                        self._read & (self._address == self.data_address),
+                    ),
+                ),
+            )
+        self.comb += If(
+            self.fsm.ongoing("DATA"),
+            self.read_address.eq(self._address),
+        ).Else(
+            self.read_address.eq(self.address),
         )
 
     def _connect(self, a, b, invert=False):
@@ -65,3 +216,23 @@ class Stm32FmcNorInterface(LiteXModule):
                 oe=self.data_oe,
                 i=self._data_r[i],
             )
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+    from .fmc_registers import FmcRegisterFile
+
+    convert(Stm32FmcNorInterface(data_width=32, address_width=3)).write(
+        "Stm32FmcNorInterface.v"
+    )
+    # with a register file: a writable register and its strobe at 1, a read
+    # only input at 2
+    nor_if = Stm32FmcNorInterface(
+        data_width=32, address_width=3, burst=True, flush_timeout=256
+    )
+    nor_if.registers = FmcRegisterFile(nor_if)
+    nor_if.registers.add_register(
+        1, Signal(32, reset=0x1234, name="reg1"), strobe=Signal(name="reg1_written")
+    )
+    nor_if.registers.add_register(2, Signal(32, name="reg2"), writable=False)
+    convert(nor_if).write("Stm32FmcNorInterfaceBurst.v")
@@ -0,0 +1,159 @@
+"""
+Bit exact Python model of the RiceEncoder gateware.
+
+Stream format, one block per ``block_size`` sample sets, every block starts
+byte aligned and can be decoded on its own:
+
+    0xF0 0x0F                  sync word
+    counter (16 bits, LE)      block counter
+    k[c] (4 bits each)         Rice parameter of each channel
+    first sample set           raw 16 bits per channel
+    block_size - 1 sets        Rice coded deltas, channel after channel
+    zero padding               up to the next byte boundary
+
+Deltas are computed modulo 2**16 and zigzag mapped. A value ``zz`` is coded
+as ``q = zz >> k`` ones, a zero and the ``k`` LSBs of ``zz``, or, when
+``q >= q_max``, as ``q_max`` ones followed by the raw 16 bits ``zz``. The
+bitstream is MSB first. The Rice parameter of a block is the smallest ``k``
+such that ``(block_size - 1) << k`` is greater or equal to the sum of the
+zigzag values of the same channel in the previous block.
+"""
+
+SYNC = (0xF0, 0x0F)
+
+
+def zigzag(delta):
+    delta &= 0xFFFF
+    sign = delta >> 15
+    return ((delta << 1) & 0xFFFF) ^ (0xFFFF if sign else 0)
+
+
+def unzigzag(zz):
+    return (zz >> 1) ^ (0xFFFF if zz & 1 else 0)
+
+
+def next_k(total, block_size):
+    for k in range(15):
+        if (block_size - 1) << k >= total:
+            return k
+    return 15
+
+
+class _BitWriter:
+    def __init__(self):
+        self.bytes = bytearray()
+        self._acc = 0
+        self._nbits = 0
+
+    def write(self, value, nbits):
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._nbits += nbits
+        while self._nbits >= 8:
+            self._nbits -= 8
+            self.bytes.append((self._acc >> self._nbits) & 0xFF)
+        self._acc &= (1 << self._nbits) - 1
+
+    def align(self):
+        if self._nbits:
+            self.write(0, 8 - self._nbits)
+
+
+class _BitReader:
+    def __init__(self, data, offset):
+        self._data = data
+        self.position = offset * 8
+
+    def read(self, nbits):
+        value = 0
+        for _ in range(nbits):
+            byte = self._data[self.position >> 3]
+            value = (value << 1) | ((byte >> (7 - (self.position & 7))) & 1)
+            self.position += 1
+        return value
+
+    def align(self):
+        self.position = (self.position + 7) & ~7
+
+
+def encode(sample_sets, channels, block_size=64, q_max=16):
+    """
+    Encode a list of sample sets (sequences of ``channels`` 16 bits codes).
+    Only complete blocks are emitted, as the gateware would.
+    """
+    writer = _BitWriter()
+    k = [0] * channels
+    for counter, start in enumerate(
+        range(0, len(sample_sets) - block_size + 1, block_size)
+    ):
+        block = sample_sets[start : start + block_size]
+        writer.write(SYNC[0] << 8 | SYNC[1], 16)
+        writer.write((counter & 0xFF) << 8 | (counter >> 8) & 0xFF, 16)
+        for c in range(channels):
+            writer.write(k[c], 4)
+        totals = [0] * channels
+        for c in range(channels):
+            writer.write(block[0][c] & 0xFFFF, 16)
+        for t in range(1, block_size):
+            for c in range(channels):
+                zz = zigzag(block[t][c] - block[t - 1][c])
+                totals[c] += zz
+                q = zz >> k[c]
+                if q < q_max:
+                    writer.write(((1 << q) - 1) << 1, q + 1)
+                    writer.write(zz, k[c])
+                else:
+                    writer.write((1 << q_max) - 1, q_max)
+                    writer.write(zz, 16)
+        writer.align()
+        k = [next_k(total, block_size) for total in totals]
+    return bytes(writer.bytes)
+
+
+def _decode_block(data, offset, channels, block_size, q_max):
+    reader = _BitReader(data, offset)
+    if tuple(data[offset : offset + 2]) != SYNC:
+        raise ValueError("No sync word")
+    reader.read(16)
+    counter = reader.read(8) | reader.read(8) << 8
+    k = [reader.read(4) for _ in range(channels)]
+    sets = [[reader.read(16) for _ in range(channels)]]
+    for _ in range(1, block_size):
+        sample_set = []
+        for c in range(channels):
+            q = 0
+            while q < q_max and reader.read(1):
+                q += 1
+            if q < q_max:
+                zz = (q << k[c]) | reader.read(k[c])
+            else:
+                zz = reader.read(16)
+            sample_set.append((sets[-1][c] + unzigzag(zz)) & 0xFFFF)
+        sets.append(sample_set)
+    reader.align()
+    return counter, sets, reader.position >> 3
+
+
+def decode(data, channels, block_size=64, q_max=16):
+    """
+    Decode a RiceEncoder stream, returns a list of ``(counter, sample_sets)``
+    tuples, one per block. Corrupted or truncated blocks are skipped by
+    searching the next sync word.
+    """
+    blocks = []
+    offset = 0
+    while offset < len(data) - 1:
+        try:
+            counter, sets, end = _decode_block(
+                data, offset, channels, block_size, q_max
+            )
+        except (ValueError, IndexError):
+            offset += 1
+            continue
+        # a block is only trusted when followed by the next sync word or
+        # by the end of the stream
+        if end < len(data) - 1 and tuple(data[end : end + 2]) != SYNC:
+            offset += 1
+            continue
+        blocks.append((counter, sets))
+        offset = end
+    return blocks
@@ -0,0 +1,218 @@
+from litex.gen import *
+from litex.soc.cores.clock.common import *
+
+
+class RiceEncoder(LiteXModule):
+    """
+    Lossless per channel delta + Rice encoder.
+
+    Drop-in replacement for DataEncoder2 on a byte link: same ADC FIFO side
+    (acd_data, adc_data_readable, adc_data_re) and same output FIFO side
+    (fifo_din, fifo_we, fifo_has_enough_space). Data are sent by blocks of
+    ``block_size`` sample sets, each block starts with the usual 0xF0 0x0F
+    header and a block counter and can be decoded on its own, see
+    fusion_rtl.com.rice_codec for the stream format and the Python decoder.
+
+    :param inputs: Number of 16 bits inputs.
+    :param block_size: Number of sample sets per block.
+    :param q_max: Longest unary prefix before escaping to a raw value.
+    """
+    def __init__(self, inputs, block_size=64, q_max=16):
+        assert block_size >= 1
+        assert 1 <= q_max <= 16
+        self.block_size = block_size
+        self.q_max = q_max
+        self.inputs = inputs
+        self.acd_data = [Signal(16) for _ in range(inputs)]
+        self.adc_data_readable = Signal()
+        self.adc_data_re = Signal()
+
+        self.fifo_din = Signal(8)
+        self.fifo_we = Signal(reset=0)
+        self.fifo_writable = Signal()
+        self.fifo_has_enough_space = Signal()
+
+        self.block_counter = Signal(16, reset=0)
+
+        # Bit packer, MSB aligned accumulator, at most one byte out and one
+        # code (up to 32 bits) in per clock.
+        acc_width = 48
+        self._acc = Signal(acc_width, reset=0)
+        self._acc_bits = Signal(max=acc_width + 1, reset=0)
+        self._code = Signal(32)
+        self._code_len = Signal(6)
+        self._code_valid = Signal()
+        self._code_ready = Signal()
+
+        _out = Signal()
+        _acc = Signal(acc_width)
+        _acc_bits = Signal(max=acc_width + 1)
+        _shift = Signal(max=acc_width + 1)
+        self.comb += [
+            _out.eq((self._acc_bits >= 8) & self.fifo_has_enough_space),
+            If(
+                _out,
+                _acc.eq(self._acc << 8),
+                _acc_bits.eq(self._acc_bits - 8),
+            ).Else(
+                _acc.eq(self._acc),
+                _acc_bits.eq(self._acc_bits),
+            ),
+            self._code_ready.eq(_acc_bits <= acc_width - 32),
+            _shift.eq(acc_width - _acc_bits - self._code_len),
+        ]
+        self.sync += [
+            self.fifo_we.eq(_out),
+            self.fifo_din.eq(self._acc[-8:]),
+            If(
+                self._code_valid & self._code_ready,
+                self._acc.eq(_acc | (self._code << _shift)),
+                self._acc_bits.eq(_acc_bits + self._code_len),
+            ).Else(
+                self._acc.eq(_acc),
+                self._acc_bits.eq(_acc_bits),
+            ),
+        ]
+
+        # Per channel state
+        self._channel = Signal(max=max(inputs, 2), reset=0)
+        self._set = Signal(max=max(block_size, 2), reset=0)
+        self._prev = Array(Signal(16) for _ in range(inputs))
+        self._k = Array(Signal(4, reset=0) for _ in range(inputs))
+        self._sums = Array(
+            Signal(16 + bits_for(block_size), reset=0) for _ in range(inputs)
+        )
+
+        sample = Signal(16)
+        delta = Signal(16)
+        zz = Signal(16)
+        k = Signal(4)
+        q = Signal(16)
+        unary = Signal(16)
+        self.comb += [
+            sample.eq(Array(self.acd_data)[self._channel]),
+            delta.eq(sample - self._prev[self._channel]),
+            zz.eq(Cat(0, delta[:15]) ^ Replicate(delta[15], 16)),
+            k.eq(self._k[self._channel]),
+            q.eq(zz >> k),
+            unary.eq((1 << q[:4]) - 1),
+        ]
+
+        self._next_k = []
+        for i in range(inputs):
+            next_k = Signal(4)
+            self.comb += next_k.eq(15)
+            for _k in reversed(range(15)):
+                self.comb += If(
+                    ((block_size - 1) << _k) >= self._sums[i], next_k.eq(_k)
+                )
+            self._next_k.append(next_k)
+
+        _last_channel = self._channel == inputs - 1
+        _accepted = self._code_valid & self._code_ready
+        _next_channel = If(
+            _last_channel,
+            NextValue(self._channel, 0),
+            self.adc_data_re.eq(1),
+        ).Else(NextValue(self._channel, self._channel + 1))
+
+        self.fsm = FSM(reset_state="IDLE")
+        self.fsm.act(
+            "IDLE",
+            If(self.adc_data_readable, NextState("SYNC")),
+        )
+        self.fsm.act(
+            "SYNC",
+            self._code_valid.eq(1),
+            self._code.eq(0xF00F),
+            self._code_len.eq(16),
+            If(_accepted, NextState("COUNTER")),
+        )
+        self.fsm.act(
+            "COUNTER",
+            self._code_valid.eq(1),
+            self._code.eq(Cat(self.block_counter[8:], self.block_counter[:8])),
+            self._code_len.eq(16),
+            If(_accepted, NextState("K")),
+        )
+        self.fsm.act(
+            "K",
+            self._code_valid.eq(1),
+            self._code.eq(k),
+            self._code_len.eq(4),
+            If(
+                _accepted,
+                If(
+                    _last_channel,
+                    NextValue(self._channel, 0),
+                    NextState("RAW"),
+                ).Else(NextValue(self._channel, self._channel + 1)),
+            ),
+        )
+        self.fsm.act(
+            "RAW",
+            self._code_valid.eq(self.adc_data_readable),
+            self._code.eq(sample),
+            self._code_len.eq(16),
+            If(
+                _accepted,
+                NextValue(self._prev[self._channel], sample),
+                NextValue(self._sums[self._channel], 0),
+                _next_channel,
+                If(
+                    _last_channel,
+                    NextValue(self._set, 1),
+                    NextState("FLUSH" if block_size == 1 else "DELTA"),
+                ),
+            ),
+        )
+        self.fsm.act(
+            "DELTA",
+            self._code_valid.eq(self.adc_data_readable),
+            If(
+                q < q_max,
+                self._code.eq((unary << (k + 1)) | (zz & ((1 << k) - 1))),
+                self._code_len.eq(q + 1 + k),
+            ).Else(
+                self._code.eq(Cat(zz, Replicate(1, q_max))),
+                self._code_len.eq(q_max + 16),
+            ),
+            If(
+                _accepted,
+                NextValue(self._prev[self._channel], sample),
+                NextValue(self._sums[self._channel], self._sums[self._channel] + zz),
+                _next_channel,
+                If(
+                    _last_channel,
+                    If(
+                        self._set == block_size - 1,
+                        NextState("FLUSH"),
+                    ).Else(NextValue(self._set, self._set + 1)),
+                ),
+            ),
+        )
+        self.fsm.act(
+            "FLUSH",
+            self._code_valid.eq(1),
+            self._code.eq(0),
+            self._code_len.eq((8 - self._acc_bits[:3])[:3]),
+            If(
+                _accepted,
+                NextValue(self.block_counter, self.block_counter + 1),
+                *[NextValue(self._k[i], self._next_k[i]) for i in range(inputs)],
+                NextState("IDLE"),
+            ),
+        )
+
+    @property
+    def frame_size(self):
+        """Worst case block size in bytes."""
+        bits = 32 + 4 * self.inputs + 16 * self.inputs
+        bits += (self.block_size - 1) * self.inputs * (self.q_max + 16)
+        return (bits + 7) // 8
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(RiceEncoder(4)).write("RiceEncoder.v")
@@ -0,0 +1,199 @@
+"""
+Bit exact numpy model of the BiquadCascade, DspEngine and FirDecimator
+gateware and coefficient presets.
+
+Each section is a direct form II transposed biquad:
+
+    y[n]    = b0 x[n] + s1[n]
+    s1[n+1] = b1 x[n] - a1 y[n] + s2[n]
+    s2[n+1] = b2 x[n] - a2 y[n]
+
+Coefficients are signed ``coef_width`` bits integers with ``frac_bits``
+fractional bits. ``s1`` and ``s2`` keep the full product precision on
+``acc_width`` bits and wrap around like the gateware. ``y`` is rounded half
+up to ``data_width`` bits and saturated before being fed back and passed to
+the next section. FIR sections (see Fir) use the same arithmetic in
+transposed form.
+"""
+import numpy as np
+
+# (b, a) sections, a[0] is always 1.
+PRESETS = {
+    # 6th order low pass, -3 dB at 0.0485 fs, 80 dB stop band from 0.1 fs.
+    "lowpass_0.05": [
+        (
+            [0.0003093761776877881, 0.00027126310014594703, 0.00030937617768778814],
+            [1.0, -1.449543617902121, 0.5298911166658338],
+        ),
+        (
+            [1.0, -0.9780833528217364, 1.0],
+            [1.0, -1.570227988783793, 0.6515750588208723],
+        ),
+        (
+            [1.0, -1.3786886998937251, 1.0],
+            [1.0, -1.7779954896683987, 0.8644540496942458],
+        ),
+    ],
+}
+
+
+def float_to_fixed(val, frac_bits):
+    return int(round(val * (2**frac_bits)))
+
+
+def default_frac_bits(coef_width):
+    """Q2.x coefficients, enough for the a1 of any stable section."""
+    return coef_width - 2
+
+
+def accumulator_width(data_width, coef_width):
+    return data_width + coef_width + 2
+
+
+class Fir(tuple):
+    """FIR section, the taps in a tuple. Biquads are ``(b, a)`` pairs."""
+
+
+def is_fir(section):
+    return isinstance(section, Fir)
+
+
+def _to_fixed(coefs, coef_width, frac_bits):
+    fixed = tuple(float_to_fixed(c, frac_bits) for c in coefs)
+    for c in fixed:
+        if not -(2 ** (coef_width - 1)) <= c < 2 ** (coef_width - 1):
+            raise ValueError(
+                f"Coefficient {c / 2**frac_bits} does not fit in "
+                f"{coef_width} bits with {frac_bits} fractional bits"
+            )
+    return fixed
+
+
+def quantize(sections, coef_width=18, frac_bits=None):
+    """
+    Convert float sections to ``(b0, b1, b2, a1, a2)`` integer tuples, FIR
+    sections to tuples of taps. Raises ValueError when a coefficient does
+    not fit in ``coef_width`` bits.
+    """
+    frac_bits = default_frac_bits(coef_width) if frac_bits is None else frac_bits
+    fixed = []
+    for section in sections:
+        if is_fir(section):
+            fixed.append(Fir(_to_fixed(section, coef_width, frac_bits)))
+            continue
+        b, a = section
+        assert a[0] == 1.0, "Sections must be normalized, a[0] = 1"
+        fixed.append(_to_fixed((*b, a[1], a[2]), coef_width, frac_bits))
+    return fixed
+
+
+def scale_sections(sections, points=4096):
+    """
+    Spread the gain between sections so that the response up to the output
+    of every section peaks at 1 (L-infinity scaling), which keeps the
+    intermediate signals in range without losing resolution.
+    """
+    z = np.exp(-1j * np.linspace(0, np.pi, points))
+    response = np.ones_like(z)
+    scaled = []
+    for b, a in sections:
+        section = np.polyval(b[::-1], z) / np.polyval(a[::-1], z)
+        gain = 1.0 / np.abs(response * section).max()
+        response = response * section * gain
+        scaled.append(([c * gain for c in b], list(a)))
+    return scaled
+
+
+def _wrap(value, width):
+    value &= (1 << width) - 1
+    return value - (1 << width) if value >> (width - 1) else value
+
+
+def _round_saturate(value, frac_bits, data_width):
+    if frac_bits:
+        value = (value + (1 << (frac_bits - 1))) >> frac_bits
+    high = 2 ** (data_width - 1) - 1
+    return max(-high - 1, min(high, value))
+
+
+def _biquad(x, coefficients, frac_bits, data_width, acc_width):
+    b0, b1, b2, a1, a2 = coefficients
+    s1 = s2 = 0
+    y = []
+    for v in x:
+        out = _round_saturate(_wrap(b0 * v + s1, acc_width), frac_bits, data_width)
+        s1, s2 = (
+            _wrap(b1 * v - a1 * out + s2, acc_width),
+            _wrap(b2 * v - a2 * out, acc_width),
+        )
+        y.append(out)
+    return y
+
+
+def _fir(x, taps, frac_bits, data_width, acc_width):
+    """Transposed form, ``s[k]`` holds the partial sum of taps k+1 and up."""
+    s = [0] * (len(taps) - 1)
+    y = []
+    for v in x:
+        first = s[0] if s else 0
+        y.append(
+            _round_saturate(_wrap(taps[0] * v + first, acc_width), frac_bits, data_width)
+        )
+        s = [
+            _wrap(taps[k + 1] * v + (s[k + 1] if k + 1 < len(s) else 0), acc_width)
+            for k in range(len(s))
+        ]
+    return y
+
+
+def lowpass_fir(count, ratio, cutoff=None, beta=8.0):
+    """
+    Kaiser windowed sinc low pass with a unity DC gain, to decimate by
+    ``ratio``. ``cutoff`` is in fractions of the input rate, 0.4 / ratio by
+    default so that the transition band ends close to the new Nyquist.
+    """
+    cutoff = 0.4 / ratio if cutoff is None else cutoff
+    n = np.arange(count) - (count - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(count, beta)
+    return Fir(float(t) for t in taps / taps.sum())
+
+
+def fir_accumulator_width(data_width, coef_width, taps):
+    return data_width + coef_width + (taps - 1).bit_length()
+
+
+def fir_decimate(samples, taps, ratio, data_width=16, coef_width=18, frac_bits=None):
+    """
+    Bit exact model of FirDecimator, keeps one output every ``ratio``
+    inputs, the first one is computed on input ``ratio - 1``. The history
+    starts at zero and the sums are exact, only the output is rounded and
+    saturated. ``taps`` are floats or already quantized integers.
+    """
+    frac_bits = default_frac_bits(coef_width) if frac_bits is None else frac_bits
+    if not isinstance(taps[0], (int, np.integer)):
+        taps = _to_fixed(taps, coef_width, frac_bits)
+    history = [0] * len(taps)
+    y = []
+    for n, v in enumerate(samples):
+        history = [int(v)] + history[:-1]
+        if n % ratio == ratio - 1:
+            total = sum(t * x for t, x in zip(taps, history))
+            y.append(_round_saturate(total, frac_bits, data_width))
+    return np.array(y, dtype=np.int64)
+
+
+def biquad_cascade(samples, sections, data_width=16, coef_width=18, frac_bits=None):
+    """
+    Filter ``samples`` (signed integers) through float or already quantized
+    sections, biquads or FIR, returns the output of the last section as an
+    int64 array.
+    """
+    frac_bits = default_frac_bits(coef_width) if frac_bits is None else frac_bits
+    if sections and not isinstance(sections[0][0], (int, np.integer)):
+        sections = quantize(sections, coef_width, frac_bits)
+    acc_width = accumulator_width(data_width, coef_width)
+    x = [int(v) for v in samples]
+    for section in sections:
+        apply = _fir if is_fir(section) else _biquad
+        x = apply(x, section, frac_bits, data_width, acc_width)
+    return np.array(x, dtype=np.int64)
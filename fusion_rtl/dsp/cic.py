@@ -0,0 +1,138 @@
+import math
+
+from litex.gen import *
+from litex.soc.interconnect import stream
+
+
+class CicDecimator(LiteXModule):
+    """
+    Pipelined CIC decimator, ``order`` integrators running at the input rate
+    followed by ``order`` combs running at the output rate. One sample can be
+    accepted every clock, every stage is a register so the longest path is a
+    single adder whatever the order.
+
+    The integrators and combs work modulo 2**``full_width`` with
+    ``full_width = width + order * ceil(log2(ratio * diff_delay))``, so they
+    never overflow. The DC gain is ``(ratio * diff_delay) ** order``, the
+    output keeps the ``output_width`` MSBs. When they are truncated and
+    ``ratio * diff_delay`` is not a power of two, the inputs are first
+    multiplied by ``compensation / 2**width``, bringing the gain up to
+    ``2**(full_width - width)`` as for a power of two, and offset so that
+    the output is rounded, in a register that delays them by one more
+    sample. With ``output_width == width`` the output is then always the
+    mean of the inputs. ``gain`` is the resulting DC gain at ``full_width``.
+
+    :param width: Input width, samples are signed.
+    :param ratio: Decimation ratio, any integer >= 1.
+    :param order: Number of integrator/comb pairs.
+    :param diff_delay: Differential delay of the combs.
+    :param output_width: Output width, defaults to ``full_width``.
+    """
+    def __init__(self, width=16, ratio=4, order=3, diff_delay=1, output_width=None):
+        assert ratio >= 1
+        assert order >= 1
+        assert diff_delay >= 1
+        self.ratio = ratio
+        self.order = order
+        self.diff_delay = diff_delay
+        self.full_width = width + order * math.ceil(math.log2(ratio * diff_delay))
+        self.output_width = output_width or self.full_width
+        assert self.output_width <= self.full_width
+        self.gain = (ratio * diff_delay) ** order
+        growth = self.full_width - width
+        self.compensation = None
+        integrator_width = self.full_width
+        if self.output_width < self.full_width and self.gain != 2**growth:
+            # rounded down so the compensated sums still fit
+            self.compensation = 2 ** (growth + width) // self.gain
+            integrator_width += width
+            # half an output LSB once summed over the filter
+            rounding = 2 ** (integrator_width - self.output_width - 1) // self.gain
+            self.gain = self.gain * self.compensation / 2**width
+
+        self.sink = sink = stream.Endpoint([("data", width)])
+        self.source = source = stream.Endpoint([("data", self.output_width)])
+
+        # The whole pipeline moves one step per accepted sample, an output is
+        # only produced when the previous one has been consumed.
+        accept = Signal()
+        self.comb += [
+            sink.ready.eq(~source.valid | source.ready),
+            accept.eq(sink.valid & sink.ready),
+        ]
+
+        self.integrators = [
+            Signal((integrator_width, True), reset=0) for _ in range(order)
+        ]
+        if self.compensation is None:
+            _input = Signal((integrator_width, True))
+            self.comb += _input.eq(
+                Cat(sink.data, Replicate(sink.data[-1], integrator_width - width))
+            )
+        else:
+            _sample = Signal((width, True))
+            _input = Signal((integrator_width, True), reset=0)
+            self.comb += _sample.eq(sink.data)
+            self.sync += If(
+                accept, _input.eq(_sample * self.compensation + rounding)
+            )
+        for i, integrator in enumerate(self.integrators):
+            previous = _input if i == 0 else self.integrators[i - 1]
+            self.sync += If(accept, integrator.eq(integrator + previous))
+
+        self._phase = Signal(max=max(ratio, 2), reset=0)
+        decimate = Signal()
+        self.comb += decimate.eq(accept & (self._phase == ratio - 1))
+        self.sync += If(
+            accept,
+            If(
+                self._phase == ratio - 1,
+                self._phase.eq(0),
+            ).Else(self._phase.eq(self._phase + 1)),
+        )
+
+        # The last comb is registered by the source itself
+        self.combs = []
+        previous = self.integrators[-1]
+        for i in range(order):
+            delay_line = [
+                Signal((integrator_width, True), reset=0) for _ in range(diff_delay)
+            ]
+            difference = Signal((integrator_width, True))
+            self.comb += difference.eq(previous - delay_line[-1])
+            self.sync += If(
+                decimate,
+                delay_line[0].eq(previous),
+                *[delay_line[j].eq(delay_line[j - 1]) for j in range(1, diff_delay)],
+            )
+            if i < order - 1:
+                output = Signal((integrator_width, True), reset=0)
+                self.sync += If(decimate, output.eq(difference))
+                self.combs.append(output)
+                previous = output
+
+        self.sync += [
+            If(source.ready, source.valid.eq(0)),
+            If(
+                decimate,
+                source.valid.eq(1),
+                source.data.eq(difference[integrator_width - self.output_width :]),
+            ),
+        ]
+
+
+if __name__ == "__main__":
+    import argparse
+    from migen.fhdl.verilog import convert
+
+    parser = argparse.ArgumentParser(description="Generate Verilog for the CicDecimator")
+    parser.add_argument("--ratio", type=int, default=5, help="Decimation ratio")
+    parser.add_argument("--order", type=int, default=3, help="Number of stages")
+    parser.add_argument("--output-width", type=int, default=24, help="Output width")
+    args = parser.parse_args()
+
+    convert(
+        CicDecimator(
+            width=16, ratio=args.ratio, order=args.order, output_width=args.output_width
+        )
+    ).write("CicDecimator.v")
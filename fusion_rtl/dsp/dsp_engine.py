@@ -0,0 +1,347 @@
+import logging
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+
+from .biquad_model import accumulator_width, default_frac_bits, is_fir, quantize
+
+
+# Micro instruction fields, LSB first. A group of instructions accumulates
+# into the single accumulator, the first one sets its initial value and the
+# last one writes it back.
+def _instruction_layout(coefs, states, registers, channels):
+    return [
+        ("valid", 1),
+        ("coef", bits_for(max(coefs - 1, 1))),
+        # operand: an input channel or a register
+        ("from_input", 1),
+        ("operand", bits_for(max(channels, registers) - 1)),
+        # initial value: a state, zero, or the accumulator for the others
+        ("init_state", 1),
+        ("init_zero", 1),
+        ("state", bits_for(max(states - 1, 1))),
+        # write backs to the state or register ``target``, states keep the
+        # full precision, registers and outputs get the rounded and
+        # saturated value
+        ("write_state", 1),
+        ("write_register", 1),
+        ("target", bits_for(max(states, registers) - 1)),
+        ("write_output", 1),
+        ("channel", bits_for(max(channels - 1, 1))),
+    ]
+
+
+class _Group:
+    def __init__(self, channel, instructions, write_register=None):
+        self.channel = channel
+        self.instructions = instructions
+        self.write_register = write_register
+
+
+class DspEngine(LiteXModule):
+    """
+    Runs the same chain of biquad and FIR sections on every channel with a
+    single multiplier, filter states and intermediate values are kept in
+    block RAM.
+
+    At elaboration time the sections are compiled into a micro program that
+    computes one sample of every channel, groups of the different channels
+    are interleaved to fill the 4 clocks between writing a value and reading
+    it back. The program is run once per sample set, ``cycles_per_sample``
+    clocks, which must be less than the sys clock to sample rate ratio. The
+    arithmetic is the one of biquad_model, outputs are bit exact with
+    ``biquad_model.biquad_cascade`` on each channel.
+
+    :param channels: Number of channels, packed in ``sink.data`` and
+        ``source.data`` with channel 0 at the LSB, as in ``Ads92x4.data``.
+    :param sections: ``(b, a)`` biquads and ``biquad_model.Fir`` sections.
+    """
+    # clocks between issuing an instruction and reading what it wrote
+    LATENCY = 4
+
+    def __init__(self, channels, sections, data_width=16, coef_width=18, frac_bits=None):
+        frac_bits = default_frac_bits(coef_width) if frac_bits is None else frac_bits
+        acc_width = accumulator_width(data_width, coef_width)
+        self.channels = channels
+        self.sink = sink = stream.Endpoint([("data", data_width * channels)])
+        self.source = source = stream.Endpoint([("data", data_width * channels)])
+
+        self.coefficients = quantize(sections, coef_width, frac_bits)
+        self._compile(channels)
+        # the program, the pipeline drain and the stream handshakes
+        self.cycles_per_sample = len(self.program) + self.LATENCY + 3
+        logging.getLogger("DspEngine").info(
+            f"{channels} channels, {len(self.program)} instructions, "
+            f"{self.nops} idle, {self.cycles_per_sample} clocks per sample"
+        )
+
+        layout = _instruction_layout(
+            len(self._coef_init), self.states, self.registers, channels
+        )
+        self.rom = Memory(
+            layout_len(layout), max(len(self.program), 2),
+            init=[self._pack(layout, fields) for fields in self.program],
+        )
+        # migen memories need at least two words
+        self.coef_mem = Memory(
+            coef_width, max(len(self._coef_init), 2),
+            init=[c & (2**coef_width - 1) for c in self._coef_init],
+        )
+        self.state_mem = Memory(acc_width, max(self.states, 2))
+        self.register_mem = Memory(data_width, max(self.registers, 2))
+        rom_port = self.rom.get_port()
+        coef_port = self.coef_mem.get_port()
+        state_rd = self.state_mem.get_port()
+        state_wr = self.state_mem.get_port(write_capable=True)
+        register_rd = self.register_mem.get_port()
+        register_wr = self.register_mem.get_port(write_capable=True)
+        self.specials += [
+            self.rom, self.coef_mem, self.state_mem, self.register_mem,
+            rom_port, coef_port, state_rd, state_wr, register_rd, register_wr,
+        ]
+
+        self.inputs = Array(Signal((data_width, True)) for _ in range(channels))
+        self.outputs = Array(Signal(data_width) for _ in range(channels))
+        self.comb += source.data.eq(Cat(*self.outputs))
+
+        # Sequencer
+        self._pc = Signal(max=len(self.program) + 1, reset=0)
+        self._running = Signal(reset=0)
+        self._drain = Signal(max=self.LATENCY + 2, reset=0)
+        self.comb += [
+            sink.ready.eq(~self._running & (self._drain == 0) & ~source.valid),
+            rom_port.adr.eq(self._pc),
+        ]
+        self.sync += [
+            If(source.ready, source.valid.eq(0)),
+            If(
+                sink.valid & sink.ready,
+                self._running.eq(1),
+                self._pc.eq(0),
+                *[
+                    self.inputs[i].eq(sink.data[data_width * i : data_width * (i + 1)])
+                    for i in range(channels)
+                ],
+            ).Elif(
+                self._running,
+                self._pc.eq(self._pc + 1),
+                If(
+                    self._pc == len(self.program) - 1,
+                    self._running.eq(0),
+                    self._drain.eq(self.LATENCY + 1),
+                ),
+            ).Elif(
+                self._drain != 0,
+                self._drain.eq(self._drain - 1),
+                If(self._drain == 1, source.valid.eq(1)),
+            ),
+        ]
+
+        # E1: instruction out of the ROM, memory reads
+        stages = [Record(layout) for _ in range(4)]
+        e1, e2, e3, e4 = stages
+        fetched = Signal()
+        self.sync += fetched.eq(self._running)
+        self.comb += [
+            e1.raw_bits().eq(rom_port.dat_r),
+            If(~fetched, e1.valid.eq(0)),
+            coef_port.adr.eq(e1.coef),
+            state_rd.adr.eq(e1.state),
+            register_rd.adr.eq(e1.operand),
+        ]
+        self.sync += [e2.eq(e1), e3.eq(e2), e4.eq(e3)]
+
+        # E2: multiply
+        operand = Signal((data_width, True))
+        coef = Signal((coef_width, True))
+        product = Signal((data_width + coef_width, True))
+        state = Signal((acc_width, True))
+        self.comb += [
+            coef.eq(coef_port.dat_r),
+            If(
+                e2.from_input,
+                operand.eq(self.inputs[e2.operand]),
+            ).Else(operand.eq(register_rd.dat_r)),
+        ]
+        self.sync += [
+            product.eq(coef * operand),
+            state.eq(state_rd.dat_r),
+        ]
+
+        # E3: accumulate
+        self.acc = Signal((acc_width, True), reset=0)
+        self.sync += If(
+            e3.valid,
+            If(
+                e3.init_state,
+                self.acc.eq(state + product),
+            ).Elif(
+                e3.init_zero,
+                self.acc.eq(product),
+            ).Else(self.acc.eq(self.acc + product)),
+        )
+
+        # E4: write back
+        rounded = Signal((acc_width + 1, True))
+        shifted = Signal((acc_width + 1 - frac_bits, True))
+        saturated = Signal((data_width, True))
+        high = 2 ** (data_width - 1) - 1
+        self.comb += [
+            rounded.eq(self.acc + ((1 << frac_bits) >> 1)),
+            shifted.eq(rounded[frac_bits:]),
+            If(
+                shifted > high,
+                saturated.eq(high),
+            ).Elif(
+                shifted < -high - 1,
+                saturated.eq(-high - 1),
+            ).Else(saturated.eq(shifted)),
+            state_wr.adr.eq(e4.target),
+            state_wr.dat_w.eq(self.acc),
+            state_wr.we.eq(e4.valid & e4.write_state),
+            register_wr.adr.eq(e4.target),
+            register_wr.dat_w.eq(saturated),
+            register_wr.we.eq(e4.valid & e4.write_register),
+        ]
+        self.sync += If(
+            e4.valid & e4.write_output,
+            self.outputs[e4.channel].eq(saturated),
+        )
+
+    @staticmethod
+    def _pack(layout, fields):
+        word = 0
+        offset = 0
+        for name, width in layout:
+            word |= (fields.get(name, 0) & ((1 << width) - 1)) << offset
+            offset += width
+        return word
+
+    def _compile(self, channels):
+        # Coefficients are shared by all the channels, feedback ones are
+        # stored negated so that everything is a multiply-accumulate.
+        self._coef_init = []
+        section_coefs = []
+        for coefs in self.coefficients:
+            if is_fir(coefs):
+                taps = list(coefs)
+            else:
+                b0, b1, b2, a1, a2 = coefs
+                taps = [b0, b1, -a1, b2, -a2]
+            section_coefs.append(len(self._coef_init))
+            self._coef_init += taps
+
+        sections = len(self.coefficients)
+        self.registers = channels * sections
+        states = []
+        for coefs in self.coefficients:
+            states.append(len(coefs) - 1 if is_fir(coefs) else 2)
+        self.states = max(channels * sum(states), 1)
+
+        queues = []
+        for channel in range(channels):
+            groups = []
+            state_base = channel * sum(states)
+            for k, coefs in enumerate(self.coefficients):
+                c = section_coefs[k]
+                x = (
+                    dict(from_input=1, operand=channel)
+                    if k == 0
+                    else dict(operand=channel * sections + k - 1)
+                )
+                y_reg = channel * sections + k
+                y = dict(operand=y_reg)
+                s = [state_base + sum(states[:k]) + i for i in range(states[k])]
+                output = (
+                    dict(write_output=1, channel=channel)
+                    if k == sections - 1
+                    else {}
+                )
+                # y = round(coef[0] x + s[0]), s[0] is 0 for a 1 tap FIR
+                first = dict(init_state=1, state=s[0]) if s else dict(init_zero=1)
+                groups.append(
+                    _Group(
+                        channel,
+                        [dict(coef=c, **x, **first, write_register=1,
+                              target=y_reg, **output)],
+                        write_register=y_reg,
+                    )
+                )
+                if is_fir(coefs):
+                    # s[i] = tap[i + 1] x + s[i + 1]
+                    for i in range(len(s)):
+                        init = (
+                            dict(init_state=1, state=s[i + 1])
+                            if i + 1 < len(s)
+                            else dict(init_zero=1)
+                        )
+                        groups.append(
+                            _Group(
+                                channel,
+                                [dict(coef=c + i + 1, **x, **init,
+                                      write_state=1, target=s[i])],
+                            )
+                        )
+                else:
+                    # s1 = b1 x - a1 y + s2, s2 = b2 x - a2 y
+                    groups.append(
+                        _Group(
+                            channel,
+                            [
+                                dict(coef=c + 1, **x, init_state=1, state=s[1]),
+                                dict(coef=c + 2, **y, write_state=1, target=s[0]),
+                            ],
+                        )
+                    )
+                    groups.append(
+                        _Group(
+                            channel,
+                            [
+                                dict(coef=c + 3, **x, init_zero=1),
+                                dict(coef=c + 4, **y, write_state=1, target=s[1]),
+                            ],
+                        )
+                    )
+            queues.append(groups)
+
+        # Greedy list scheduling, round robin over the channels, a group is
+        # issued when every register it reads has been written back.
+        ready = {}
+        program = []
+        turn = 0
+        while any(queues):
+            for i in range(channels):
+                channel = (turn + i) % channels
+                if not queues[channel]:
+                    continue
+                group = queues[channel][0]
+                t = len(program)
+                if all(
+                    ready.get(ins["operand"], 0) <= t + n
+                    for n, ins in enumerate(group.instructions)
+                    if "operand" in ins and not ins.get("from_input")
+                ):
+                    queues[channel].pop(0)
+                    for ins in group.instructions:
+                        program.append(dict(ins, valid=1))
+                    if group.write_register is not None:
+                        ready[group.write_register] = len(program) - 1 + self.LATENCY
+                    turn = channel + 1
+                    break
+            else:
+                program.append(dict(valid=0))
+        self.program = program
+        self.nops = sum(1 for ins in program if not ins["valid"])
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    from .biquad_model import PRESETS, scale_sections
+
+    convert(DspEngine(4, scale_sections(PRESETS["lowpass_0.05"]))).write(
+        "DspEngine.v"
+    )
@@ -0,0 +1,223 @@
+import logging
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import CSRStorage
+
+from .biquad_model import (
+    Fir,
+    default_frac_bits,
+    fir_accumulator_width,
+    lowpass_fir,
+    quantize,
+)
+
+
+class FirDecimator(LiteXModule):
+    """
+    Polyphase FIR decimator, only the outputs that are kept are computed:
+    after every ``ratio`` inputs one multiplier per channel runs through the
+    taps, tap ``k`` meeting the input phase ``k % ratio``. The taps take
+    ``cycles_per_output`` clocks during which the sink is not ready, which
+    must be less than ``ratio`` times the sys clock to sample rate ratio.
+
+    The input history and the taps are in block RAM, the taps can be
+    reloaded at run time: a pulse on ``coef_address_written`` moves the write
+    pointer to ``coef_address``, every pulse on ``coef_data_written`` writes
+    ``coef_data`` and moves to the next tap. add_csr drives them from CSRs,
+    FmcRegisterFile registers can drive them with their strobes.
+    Sums are exact, outputs are rounded and saturated as in
+    ``biquad_model.fir_decimate``.
+
+    :param taps: Float taps or a number of taps for a ``biquad_model.lowpass_fir``.
+    :param ratio: Decimation ratio, any integer >= 1.
+    :param channels: Number of channels, packed in ``sink.data`` and
+        ``source.data`` with channel 0 at the LSB, as in ``Ads92x4.data``.
+    """
+    def __init__(
+        self, taps, ratio, channels=1, data_width=16, coef_width=18, frac_bits=None
+    ):
+        assert ratio >= 1
+        if isinstance(taps, int):
+            taps = lowpass_fir(taps, ratio)
+        frac_bits = default_frac_bits(coef_width) if frac_bits is None else frac_bits
+        count = len(taps)
+        acc_width = fir_accumulator_width(data_width, coef_width, count)
+        self.ratio = ratio
+        self.channels = channels
+        self.coefficients = list(quantize([Fir(taps)], coef_width, frac_bits)[0])
+        self.cycles_per_output = count + 4
+        logging.getLogger("FirDecimator").info(
+            f"{count} taps, decimation by {ratio}, {channels} channels, "
+            f"{self.cycles_per_output} clocks per output"
+        )
+
+        self.sink = sink = stream.Endpoint([("data", data_width * channels)])
+        self.source = source = stream.Endpoint([("data", data_width * channels)])
+
+        self.coef_address = Signal(max=max(count, 2))
+        self.coef_address_written = Signal()
+        self.coef_data = Signal(coef_width)
+        self.coef_data_written = Signal()
+
+        # migen memories need at least two words, the history one wraps
+        history_depth = 2 ** max((count - 1).bit_length(), 1)
+        self.history = Memory(data_width * channels, history_depth)
+        self.coef_mem = Memory(
+            coef_width, max(count, 2),
+            init=[c & (2**coef_width - 1) for c in self.coefficients],
+        )
+        history_rd = self.history.get_port()
+        history_wr = self.history.get_port(write_capable=True)
+        coef_rd = self.coef_mem.get_port()
+        coef_wr = self.coef_mem.get_port(write_capable=True)
+        self.specials += [
+            self.history, self.coef_mem, history_rd, history_wr, coef_rd, coef_wr,
+        ]
+
+        # Coefficients reload
+        self._coef_pointer = Signal(max=max(count, 2), reset=0)
+        self.sync += If(
+            self.coef_address_written,
+            self._coef_pointer.eq(self.coef_address),
+        ).Elif(
+            self.coef_data_written,
+            If(
+                self._coef_pointer == count - 1,
+                self._coef_pointer.eq(0),
+            ).Else(self._coef_pointer.eq(self._coef_pointer + 1)),
+        )
+        self.comb += [
+            coef_wr.adr.eq(self._coef_pointer),
+            coef_wr.dat_w.eq(self.coef_data),
+            coef_wr.we.eq(self.coef_data_written),
+        ]
+
+        # Inputs go to the history, every ratio inputs the taps are run on
+        # the newest one and the ones before.
+        self._busy = Signal(reset=0)
+        self._phase = Signal(max=max(ratio, 2), reset=0)
+        self._newest = Signal(max=history_depth, reset=0)
+        accept = Signal()
+        self.comb += [
+            sink.ready.eq(~self._busy & (~source.valid | source.ready)),
+            accept.eq(sink.valid & sink.ready),
+            history_wr.adr.eq(self._newest + 1),
+            history_wr.dat_w.eq(sink.data),
+            history_wr.we.eq(accept),
+        ]
+
+        self._issue = Signal(reset=0)
+        self._tap = Signal(max=max(count, 2), reset=0)
+        self.sync += [
+            If(
+                accept,
+                self._newest.eq(self._newest + 1),
+                If(
+                    self._phase == ratio - 1,
+                    self._phase.eq(0),
+                    self._busy.eq(1),
+                    self._issue.eq(1),
+                    self._tap.eq(0),
+                ).Else(self._phase.eq(self._phase + 1)),
+            ),
+            If(
+                self._issue,
+                self._tap.eq(self._tap + 1),
+                If(self._tap == count - 1, self._issue.eq(0)),
+            ),
+        ]
+        self.comb += [
+            history_rd.adr.eq(self._newest - self._tap),
+            coef_rd.adr.eq(self._tap),
+        ]
+
+        # read, multiply, accumulate, round
+        read = Signal(reset=0)
+        read_first = Signal()
+        read_last = Signal()
+        multiplied = Signal(reset=0)
+        multiplied_first = Signal()
+        multiplied_last = Signal()
+        done = Signal(reset=0)
+        self.sync += [
+            read.eq(self._issue),
+            read_first.eq(self._tap == 0),
+            read_last.eq(self._tap == count - 1),
+            multiplied.eq(read),
+            multiplied_first.eq(read_first),
+            multiplied_last.eq(read_last),
+            done.eq(multiplied & multiplied_last),
+        ]
+
+        coef = Signal((coef_width, True))
+        self.comb += coef.eq(coef_rd.dat_r)
+        self.accumulators = []
+        outputs = []
+        high = 2 ** (data_width - 1) - 1
+        for i in range(channels):
+            x = Signal((data_width, True))
+            product = Signal((data_width + coef_width, True))
+            accumulator = Signal((acc_width, True), reset=0)
+            rounded = Signal((acc_width + 1, True))
+            shifted = Signal((acc_width + 1 - frac_bits, True))
+            saturated = Signal((data_width, True))
+            self.comb += [
+                x.eq(history_rd.dat_r[data_width * i : data_width * (i + 1)]),
+                rounded.eq(accumulator + ((1 << frac_bits) >> 1)),
+                shifted.eq(rounded[frac_bits:]),
+                If(
+                    shifted > high,
+                    saturated.eq(high),
+                ).Elif(
+                    shifted < -high - 1,
+                    saturated.eq(-high - 1),
+                ).Else(saturated.eq(shifted)),
+            ]
+            self.sync += [
+                product.eq(coef * x),
+                If(
+                    multiplied,
+                    If(
+                        multiplied_first,
+                        accumulator.eq(product),
+                    ).Else(accumulator.eq(accumulator + product)),
+                ),
+            ]
+            self.accumulators.append(accumulator)
+            outputs.append(saturated)
+
+        self.sync += [
+            If(source.ready, source.valid.eq(0)),
+            If(
+                done,
+                self._busy.eq(0),
+                source.valid.eq(1),
+                source.data.eq(Cat(*outputs)),
+            ),
+        ]
+
+    def add_csr(self):
+        self._coef_address = CSRStorage(
+            len(self.coef_address), name="coef_address",
+            description="Index of the next tap written by coef_data.",
+        )
+        self._coef_data = CSRStorage(
+            len(self.coef_data), name="coef_data",
+            description="Writes a tap, signed, and moves to the next one.",
+        )
+        self.comb += [
+            self.coef_address.eq(self._coef_address.storage),
+            self.coef_address_written.eq(self._coef_address.re),
+            self.coef_data.eq(self._coef_data.storage),
+            self.coef_data_written.eq(self._coef_data.re),
+        ]
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(FirDecimator(31, ratio=4, channels=2)).write("FirDecimator.v")
@@ -0,0 +1,178 @@
+import math
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import CSRStorage
+
+from .cic import CicDecimator
+from .fir_decimator import FirDecimator
+
+
+class Nco(LiteXModule):
+    """
+    Numerically controlled oscillator, a ``phase_width`` bits phase
+    accumulator moved by ``increment`` on every ``step`` pulse, and a table
+    of ``2**table_bits`` cosines and sines of ``width`` bits with
+    ``width - 2`` fractional bits. ``cos`` and ``sin`` are the values at the
+    phase of the previous clock.
+    """
+    def __init__(self, phase_width=32, table_bits=10, width=18, increment=0):
+        self.increment = Signal(phase_width, reset=increment)
+        self.step = Signal()
+        self.phase = Signal(phase_width, reset=0)
+        self.cos = Signal((width, True))
+        self.sin = Signal((width, True))
+
+        scale = 2 ** (width - 2)
+        mask = 2**width - 1
+        self.table = Memory(
+            2 * width, 2**table_bits,
+            init=[
+                (int(round(math.cos(2 * math.pi * i / 2**table_bits) * scale)) & mask)
+                | ((int(round(math.sin(2 * math.pi * i / 2**table_bits) * scale)) & mask) << width)
+                for i in range(2**table_bits)
+            ],
+        )
+        port = self.table.get_port()
+        self.specials += self.table, port
+        self.comb += [
+            port.adr.eq(self.phase[phase_width - table_bits :]),
+            self.cos.eq(port.dat_r[:width]),
+            self.sin.eq(port.dat_r[width:]),
+        ]
+        self.sync += If(self.step, self.phase.eq(self.phase + self.increment))
+
+    @staticmethod
+    def increment_for(frequency, sampling_frequency, phase_width=32):
+        return int(round(frequency / sampling_frequency * 2**phase_width)) % 2**phase_width
+
+
+class LockIn(LiteXModule):
+    """
+    Digital lock-in, every channel is multiplied by the ``exp(-j phase)`` of
+    a shared Nco and the I and Q products are low pass filtered and decimated
+    by a CicDecimator then a FirDecimator. For ``A cos(phase + phi)`` at the
+    Nco frequency the outputs settle at ``A / 2 cos(phi)`` and
+    ``A / 2 sin(phi)``.
+
+    The Nco moves once per input sample set, ``increment`` is
+    ``Nco.increment_for(tone, sampling_frequency)``. Outputs come out every
+    ``cic_ratio * fir_ratio`` inputs.
+
+    :param channels: Number of channels, packed in ``sink.data`` with
+        channel 0 at the LSB, as in ``Ads92x4.data``. ``source.data`` holds
+        I0, Q0, I1, Q1... from the LSB.
+    :param fir_taps: Taps of the FirDecimator, a number of taps for a low
+        pass, None to only use the CIC.
+    """
+    def __init__(
+        self,
+        channels=2,
+        increment=0,
+        cic_ratio=16,
+        cic_order=3,
+        fir_taps=31,
+        fir_ratio=2,
+        data_width=16,
+        nco_width=18,
+    ):
+        self.sink = sink = stream.Endpoint([("data", data_width * channels)])
+        self.source = source = stream.Endpoint([("data", 2 * data_width * channels)])
+        self.nco = Nco(width=nco_width, increment=increment)
+        self.increment = self.nco.increment
+        self.ratio = cic_ratio * (fir_ratio if fir_taps is not None else 1)
+
+        # Mixers, one sample set at a time: read the table, multiply, push
+        self.cics = [
+            CicDecimator(
+                width=data_width, ratio=cic_ratio, order=cic_order, output_width=data_width
+            )
+            for _ in range(2 * channels)
+        ]
+        self.submodules += self.cics
+        self._stage = Signal(2, reset=0)
+        self.comb += [
+            sink.ready.eq(self._stage == 0),
+            self.nco.step.eq(sink.valid & sink.ready),
+        ]
+        samples = [Signal((data_width, True)) for _ in range(channels)]
+        high = 2 ** (data_width - 1) - 1
+        half = (1 << (nco_width - 2)) >> 1
+        for i, sample in enumerate(samples):
+            self.sync += If(
+                sink.valid & sink.ready,
+                sample.eq(sink.data[data_width * i : data_width * (i + 1)]),
+            )
+            for cic, reference in zip(self.cics[2 * i : 2 * i + 2], [self.nco.cos, -self.nco.sin]):
+                product = Signal((data_width + nco_width, True))
+                shifted = Signal((data_width + 2, True))
+                self.comb += shifted.eq((product + half) >> (nco_width - 2))
+                self.sync += [
+                    If(self._stage == 1, product.eq(sample * reference)),
+                    If(
+                        self._stage == 2,
+                        If(
+                            shifted > high,
+                            cic.sink.data.eq(high),
+                        ).Elif(
+                            shifted < -high - 1,
+                            cic.sink.data.eq(-high - 1),
+                        ).Else(cic.sink.data.eq(shifted)),
+                    ),
+                ]
+        # All the CICs see the same handshakes so they stay in step
+        self.sync += [
+            If(
+                sink.valid & sink.ready,
+                self._stage.eq(1),
+            ).Elif(
+                self._stage == 1,
+                self._stage.eq(2),
+            ).Elif(
+                self._stage == 2,
+                self._stage.eq(3),
+            ).Elif(
+                (self._stage == 3) & self.cics[0].sink.ready,
+                self._stage.eq(0),
+            ),
+        ]
+        self.comb += [cic.sink.valid.eq(self._stage == 3) for cic in self.cics]
+
+        cic_out = stream.Endpoint([("data", 2 * data_width * channels)])
+        self.comb += [
+            cic_out.valid.eq(self.cics[0].source.valid),
+            cic_out.data.eq(Cat(*[cic.source.data for cic in self.cics])),
+        ]
+        self.comb += [cic.source.ready.eq(cic_out.ready) for cic in self.cics]
+
+        if fir_taps is not None:
+            self.fir = FirDecimator(
+                fir_taps, fir_ratio, channels=2 * channels, data_width=data_width
+            )
+            self.comb += [
+                cic_out.connect(self.fir.sink),
+                self.fir.source.connect(source),
+            ]
+        else:
+            self.comb += cic_out.connect(source)
+
+    def add_csr(self):
+        self._increment = CSRStorage(
+            len(self.increment), reset=self.increment.reset.value, name="increment",
+            description="Nco phase increment per sample, frequency / fs * 2**32.",
+        )
+        self.comb += self.increment.eq(self._increment.storage)
+
+
+if __name__ == "__main__":
+    import argparse
+    from migen.fhdl.verilog import convert
+
+    parser = argparse.ArgumentParser(description="Generate Verilog for the LockIn")
+    parser.add_argument("--cic-ratio", type=int, default=8, help="CIC decimation ratio")
+    args = parser.parse_args()
+
+    convert(LockIn(channels=2, increment=2**28, cic_ratio=args.cic_ratio)).write("LockIn.v")
@@ -0,0 +1,102 @@
+"""
+Bit exact numpy model of the WelchPsd gateware.
+
+Each frame of ``fft_size`` samples is multiplied by a Hann window, rounded
+back to ``data_width`` bits, and goes through a radix 2 decimation in time
+FFT. Butterflies compute ``t = round(w * b)`` with ``w`` a twiddle of
+``twiddle_width`` bits with ``twiddle_width - 2`` fractional bits, then
+``a + t`` and ``a - t`` without scaling, the data path is wide enough for
+the FFT gain. ``|X[k]|**2`` of the ``fft_size / 2 + 1`` first bins are summed
+over ``averages`` frames.
+"""
+import numpy as np
+
+
+def fft_width(data_width, fft_size):
+    """Real and imaginary parts width, room for the gain of every stage."""
+    return data_width + (fft_size - 1).bit_length() + 1
+
+
+def power_width(data_width, fft_size, averages):
+    return 2 * fft_width(data_width, fft_size) + (averages - 1).bit_length()
+
+
+def _round_shift(value, shift):
+    return (value + (1 << (shift - 1))) >> shift
+
+
+def _bit_reverse(value, bits):
+    return int(f"{value:0{bits}b}"[::-1], 2) if bits else 0
+
+
+def hann_window(fft_size, width=18):
+    """Periodic Hann window, ``width - 2`` fractional bits."""
+    n = np.arange(fft_size)
+    window = 0.5 - 0.5 * np.cos(2 * np.pi * n / fft_size)
+    return [int(round(w * 2 ** (width - 2))) for w in window]
+
+
+def twiddles(fft_size, width=18):
+    """``exp(-2j pi k / fft_size)`` for k < fft_size / 2, as (re, im) pairs."""
+    scale = 2 ** (width - 2)
+    return [
+        (
+            int(round(np.cos(2 * np.pi * k / fft_size) * scale)),
+            int(round(-np.sin(2 * np.pi * k / fft_size) * scale)),
+        )
+        for k in range(fft_size // 2)
+    ]
+
+
+def windowed(frame, window_width=18):
+    window = hann_window(len(frame), window_width)
+    return [_round_shift(int(x) * w, window_width - 2) for x, w in zip(frame, window)]
+
+
+def fft(frame, twiddle_width=18):
+    """Integer FFT of a real frame, returns (re, im) pairs."""
+    size = len(frame)
+    bits = (size - 1).bit_length()
+    shift = twiddle_width - 2
+    w = twiddles(size, twiddle_width)
+    x = [(0, 0)] * size
+    for i, v in enumerate(frame):
+        x[_bit_reverse(i, bits)] = (int(v), 0)
+    for stage in range(bits):
+        half = 1 << stage
+        for j in range(size // 2):
+            k = j & (half - 1)
+            a = ((j >> stage) << (stage + 1)) + k
+            b = a + half
+            w_re, w_im = w[k << (bits - 1 - stage)]
+            b_re, b_im = x[b]
+            t_re = _round_shift(b_re * w_re - b_im * w_im, shift)
+            t_im = _round_shift(b_re * w_im + b_im * w_re, shift)
+            a_re, a_im = x[a]
+            x[a] = (a_re + t_re, a_im + t_im)
+            x[b] = (a_re - t_re, a_im - t_im)
+    return x
+
+
+def welch_psd(
+    samples, fft_size, averages, overlap=None, window_width=18, twiddle_width=18
+):
+    """
+    Sum of ``|X[k]|**2`` for bins 0 to fft_size / 2, one int64 array per group
+    of ``averages`` frames. Frames start every ``fft_size - overlap`` samples,
+    ``overlap`` is half a frame by default.
+    """
+    overlap = fft_size // 2 if overlap is None else overlap
+    hop = fft_size - overlap
+    spectra = []
+    total = None
+    count = 0
+    for start in range(0, len(samples) - fft_size + 1, hop):
+        x = fft(windowed(samples[start : start + fft_size], window_width), twiddle_width)
+        power = [re * re + im * im for re, im in x[: fft_size // 2 + 1]]
+        total = power if count == 0 else [t + p for t, p in zip(total, power)]
+        count += 1
+        if count == averages:
+            spectra.append(np.array(total, dtype=np.int64))
+            count = 0
+    return spectra
@@ -1,113 +1,154 @@
-
-""")
-        */
-        const double b[3][3]
-           = { { 0.0003093761776877881, 0.00027126310014594703, 0.00030937617768778814 },
-                { 1.0, -0.9780833528217364, 1.0 }, { 1.0, -1.3786886998937251, 1.0 } };
-        const double a[3][3] = { { 1.0, -1.449543617902121, 0.5298911166658338 },
-           { 1.0, -1.570227988783793, 0.6515750588208723 },
-           { 1.0, -1.7779954896683987, 0.8644540496942458 } };
-        double ctx[3][3] = { { 0. } };
 """
+Fixed point IIR filters built from direct form II transposed biquads.
 
+Coefficient presets and the bit exact model live in
+fusion_rtl.dsp.biquad_model, SimpleIIR is the "lowpass_0.05" preset.
+"""
 
 from migen import *
-from migen.genlib.resetsync import AsyncResetSynchronizer
 
 from litex.gen import *
 
-from litex.soc.cores.clock import *
-from litex.soc.interconnect.csr import bits_for
-
-
-def float_to_fixed(val, frac_bits):
-    return int(round(val * (2**frac_bits)))
-
-
-class _multiply_add(LiteXModule):
-    def __init__(self, size_1=16, size_2=16):
-        super().__init__()
-        self.a = Signal(size_1)
-        self.b = Signal(size_2)
-        self.output = Signal(size_1 + size_2)
-
-        self.comb += self.output.eq(self.a * self.b)
-        
-        
-
-class _IIR_Stage(LiteXModule):
-    def __init__(self, b, a, frac_bits=14):
-        super().__init__()
-        self.b = [float_to_fixed(c, frac_bits) for c in b]
-        self.a = [float_to_fixed(c, frac_bits) for c in a]
-        self.ctx = [Signal(16, reset=0) for _ in range(3)]
-        self.input = Signal(16)
-        self.output = Signal(16)
-        self.smp_clk = Signal()
-        
-        self.multiply_add = _multiply_add(size_1=16, size_2=16)
-        self.submodules += self.multiply_add
-        
-        self.fsm = FSM(reset_state="IDLE")
-        self.submodules += self.fsm
-        self.fsm.act("IDLE",
-            If(self.smp_clk,
-                NextState("PROCESS")
-            )
-        )
-        self.fsm.act("PROCESS",
-            self.ctx[0].eq(self.input),
-            self.ctx[0].eq(self.ctx[0] * self.b[0] + self.ctx[1] * self.b[1] + self.ctx[2] * self.b[2]),
-            self.ctx[1].eq(self.ctx[0]),
-            self.ctx[1].eq(self.ctx[1] * self.b[0] + self.ctx[1] * self.b[1] + self.ctx[2] * self.b[2]),
-            self.ctx[2].eq(self.ctx[1]),
-            self.ctx[2].eq(self.ctx[2] * self.b[0] + self.ctx[2] * self.b[1] + self.ctx[2] * self.b[2]),
-            self.output.eq(int(self.ctx[2] * self.a[0] + self.ctx[1] * self.a[1] + self.ctx[2] * self.a[2])),
-            NextState("Wait_smp_clk_low")
-        )
-        self.fsm.act("Wait_smp_clk_low",
-            If(~self.smp_clk,
-                NextState("IDLE")
-            )
-        )       
+from litex.soc.interconnect import stream
 
+from .biquad_model import (
+    PRESETS,
+    accumulator_width,
+    default_frac_bits,
+    float_to_fixed,
+    quantize,
+    scale_sections,
+)
 
-class SimpleIIR(LiteXModule):
-    def __init__(self, frac_bits=14):
-        super().__init__()
 
+class Biquad(LiteXModule):
+    """
+    One DF2T biquad section, see biquad_model for the arithmetic.
 
-        self.input = Signal(16)
-        self.output = Signal(16)
-        self.smp_clk = Signal()
-        
-        self.stages = [
-            _IIR_Stage(
-                b=[0.0003093761776877881, 0.00027126310014594703, 0.00030937617768778814],
-                a=[1.0, -1.449543617902121, 0.5298911166658338],
-                frac_bits=frac_bits
+    The recursion is spread over 5 clocks so there is at most one multiply
+    or one add between registers, the 5 products map on 18x18 DSP blocks
+    when ``data_width`` and ``coef_width`` are at most 18. A new sample is
+    accepted every ``cycles_per_sample`` clocks.
+
+    :param coefficients: Quantized ``(b0, b1, b2, a1, a2)``.
+    """
+    cycles_per_sample = 5
+
+    def __init__(self, coefficients, data_width=16, coef_width=18, frac_bits=None):
+        frac_bits = default_frac_bits(coef_width) if frac_bits is None else frac_bits
+        acc_width = accumulator_width(data_width, coef_width)
+        self.sink = sink = stream.Endpoint([("data", data_width)])
+        self.source = source = stream.Endpoint([("data", data_width)])
+
+        # Registers so that the coefficients can be changed at run time
+        self.b0, self.b1, self.b2, self.a1, self.a2 = self.coefficients = [
+            Signal((coef_width, True), reset=c) for c in coefficients
+        ]
+
+        self._pipe = Signal(self.cycles_per_sample, reset=0)
+        self.comb += sink.ready.eq(
+            (self._pipe[:-1] == 0) & (~source.valid | source.ready)
+        )
+        self.sync += self._pipe.eq(Cat(sink.valid & sink.ready, self._pipe[:-1]))
+
+        x = Signal((data_width, True))
+        p0, p1, p2, q1, q2 = [Signal((data_width + coef_width, True)) for _ in range(5)]
+        y_full = Signal((acc_width, True))
+        y = Signal((data_width, True))
+        self.s1 = Signal((acc_width, True), reset=0)
+        self.s2 = Signal((acc_width, True), reset=0)
+
+        rounded = Signal((acc_width + 1, True))
+        shifted = Signal((acc_width + 1 - frac_bits, True))
+        saturated = Signal((data_width, True))
+        high = 2 ** (data_width - 1) - 1
+        self.comb += [
+            rounded.eq(y_full + ((1 << frac_bits) >> 1)),
+            shifted.eq(rounded[frac_bits:]),
+            If(
+                shifted > high,
+                saturated.eq(high),
+            ).Elif(
+                shifted < -high - 1,
+                saturated.eq(-high - 1),
+            ).Else(saturated.eq(shifted)),
+        ]
+
+        self.sync += [
+            If(sink.valid & sink.ready, x.eq(sink.data)),
+            If(
+                self._pipe[0],
+                p0.eq(self.b0 * x),
+                p1.eq(self.b1 * x),
+                p2.eq(self.b2 * x),
             ),
-            _IIR_Stage(
-                b=[1.0, -0.9780833528217364, 1.0],
-                a=[1.0, -1.570227988783793, 0.6515750588208723],
-                frac_bits=frac_bits
+            If(self._pipe[1], y_full.eq(p0 + self.s1)),
+            If(self._pipe[2], y.eq(saturated)),
+            If(
+                self._pipe[3],
+                q1.eq(self.a1 * y),
+                q2.eq(self.a2 * y),
+            ),
+            If(
+                self._pipe[4],
+                self.s1.eq(p1 - q1 + self.s2),
+                self.s2.eq(p2 - q2),
+            ),
+            If(source.ready, source.valid.eq(0)),
+            If(
+                self._pipe[2],
+                source.valid.eq(1),
+                source.data.eq(saturated),
             ),
-            _IIR_Stage(
-                b=[1.0, -1.3786886998937251, 1.0],
-                a=[1.0, -1.7779954896683987, 0.8644540496942458],
-                frac_bits=frac_bits
-            )
         ]
-        
-        self.comb += [
-            self.stages[0].input.eq(self.input),
-            self.stages[0].smp_clk.eq(self.smp_clk),
-            self.stages[1].input.eq(self.stages[0].output),
-            self.stages[1].smp_clk.eq(self.smp_clk),
-            self.stages[2].input.eq(self.stages[1].output),
-            self.stages[2].smp_clk.eq(self.smp_clk),
-            self.output.eq(self.stages[2].output)
-        ]   
+
+
+class BiquadCascade(LiteXModule):
+    """
+    Biquad sections in series, each one works on its own sample so the
+    cascade takes a sample every ``cycles_per_sample`` clocks whatever the
+    number of sections.
+
+    :param sections: ``(b, a)`` float sections as in biquad_model.PRESETS.
+    :param scale: Apply biquad_model.scale_sections first.
+    :param data_width: Sample width, also the width between sections.
+    :param coef_width: Coefficient width.
+    :param frac_bits: Fractional bits of the coefficients, coef_width - 2 by
+        default.
+    """
+    cycles_per_sample = Biquad.cycles_per_sample
+
+    def __init__(
+        self, sections, scale=True, data_width=16, coef_width=18, frac_bits=None
+    ):
+        if scale:
+            sections = scale_sections(sections)
+        self.coefficients = quantize(sections, coef_width, frac_bits)
+        self.stages = [
+            Biquad(c, data_width=data_width, coef_width=coef_width, frac_bits=frac_bits)
+            for c in self.coefficients
+        ]
         self.submodules += self.stages
-        
-        
+        self.sink = stream.Endpoint([("data", data_width)])
+        self.source = stream.Endpoint([("data", data_width)])
+        self.comb += self.sink.connect(self.stages[0].sink)
+        for previous, stage in zip(self.stages, self.stages[1:]):
+            self.comb += previous.source.connect(stage.sink)
+        self.comb += self.stages[-1].source.connect(self.source)
+
+
+class SimpleIIR(BiquadCascade):
+    """6th order low pass at 0.05 fs."""
+    def __init__(self, data_width=16, coef_width=18, frac_bits=None):
+        super().__init__(
+            PRESETS["lowpass_0.05"],
+            data_width=data_width,
+            coef_width=coef_width,
+            frac_bits=frac_bits,
+        )
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(SimpleIIR()).write("SimpleIIR.v")
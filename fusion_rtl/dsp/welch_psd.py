@@ -0,0 +1,376 @@
+import logging
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import CSRStorage
+
+from .psd_model import fft_width, hann_window, power_width, twiddles
+
+
+class WelchPsd(LiteXModule):
+    """
+    Averaged power spectrum of a stream of samples, Welch's method: frames of
+    ``fft_size`` samples overlapping by ``overlap`` samples go through a Hann
+    window and a radix 2 FFT, ``|X[k]|**2`` is summed over ``averages``
+    frames and only the ``fft_size / 2 + 1`` sums are sent on ``source``,
+    bin 0 first with ``first`` set, the last one with ``last`` set.
+
+    Everything is in block RAM and computed in place with one butterfly
+    (4 multipliers) every 2 clocks, a frame takes about
+    ``fft_size * (log2(fft_size) + 2)`` clocks which must be less than the
+    time it takes to receive ``fft_size - overlap`` samples, otherwise the
+    sink stalls until the previous frame is done. Outputs
+    are bit exact with ``psd_model.welch_psd``, shifted right by
+    ``output_shift`` and saturated to ``output_width`` bits.
+
+    :param fft_size: Power of two.
+    :param averages: Number of frames summed, can be changed at run time in
+        ``self.averages`` up to ``max_averages``.
+    :param overlap: Samples shared by consecutive frames, half a frame by
+        default.
+    """
+    # clocks between issuing a butterfly and writing back its results
+    LATENCY = 6
+
+    def __init__(
+        self,
+        fft_size=256,
+        averages=16,
+        max_averages=None,
+        overlap=None,
+        data_width=16,
+        window_width=18,
+        twiddle_width=18,
+        output_width=32,
+        output_shift=0,
+    ):
+        assert fft_size >= 4 and fft_size & (fft_size - 1) == 0, "fft_size must be a power of two"
+        max_averages = averages if max_averages is None else max_averages
+        assert 1 <= averages <= max_averages
+        overlap = fft_size // 2 if overlap is None else overlap
+        assert 0 <= overlap < fft_size
+        bits = log2_int(fft_size)
+        bins = fft_size // 2 + 1
+        width = fft_width(data_width, fft_size)
+        acc_width = power_width(data_width, fft_size, max_averages)
+        self.fft_size = fft_size
+        self.bins = bins
+        self.cycles_per_frame = (
+            fft_size + 2 + bits * (fft_size + self.LATENCY) + bins + 3
+        )
+        logging.getLogger("WelchPsd").info(
+            f"{fft_size} points, {bins} bins, {self.cycles_per_frame} clocks per frame"
+        )
+
+        self.sink = sink = stream.Endpoint([("data", data_width)])
+        self.source = source = stream.Endpoint([("data", output_width)])
+        self.averages = Signal(max=max_averages + 1, reset=averages)
+
+        self.input_mem = Memory(data_width, fft_size)
+        self.window_rom = Memory(
+            window_width, fft_size,
+            init=[w & (2**window_width - 1) for w in hann_window(fft_size, window_width)],
+        )
+        self.twiddle_rom = Memory(
+            2 * twiddle_width, fft_size // 2,
+            init=[
+                (re & (2**twiddle_width - 1)) | ((im & (2**twiddle_width - 1)) << twiddle_width)
+                for re, im in twiddles(fft_size, twiddle_width)
+            ],
+        )
+        self.work_mem = Memory(2 * width, fft_size)
+        self.power_mem = Memory(acc_width, bins)
+        input_wr = self.input_mem.get_port(write_capable=True)
+        input_rd = self.input_mem.get_port()
+        window_rd = self.window_rom.get_port()
+        twiddle_rd = self.twiddle_rom.get_port()
+        work_rd = self.work_mem.get_port()
+        work_wr = self.work_mem.get_port(write_capable=True)
+        power_rd = self.power_mem.get_port()
+        power_wr = self.power_mem.get_port(write_capable=True)
+        self.specials += [
+            self.input_mem, self.window_rom, self.twiddle_rom, self.work_mem,
+            self.power_mem, input_wr, input_rd, window_rd, twiddle_rd, work_rd,
+            work_wr, power_rd, power_wr,
+        ]
+
+        self.fsm = fsm = FSM(reset_state="COLLECT")
+
+        # Inputs, the last fft_size samples are kept in a circular buffer.
+        # Once the samples of a frame are in the sink waits for the frame
+        # to start, so frames are always exactly hop samples apart.
+        hop = fft_size - overlap
+        self._write = Signal(bits, reset=0)
+        self._needed = Signal(max=fft_size + 1, reset=fft_size)
+        accept = Signal()
+        start = Signal()
+        self.comb += [
+            sink.ready.eq((self._needed != 0) & ~fsm.ongoing("LOAD")),
+            accept.eq(sink.valid & sink.ready),
+            input_wr.adr.eq(self._write),
+            input_wr.dat_w.eq(sink.data),
+            input_wr.we.eq(accept),
+            start.eq(fsm.ongoing("COLLECT") & (self._needed == 0)),
+        ]
+        self.sync += [
+            If(accept, self._write.eq(self._write + 1)),
+            If(
+                start,
+                self._needed.eq(hop),
+            ).Elif(
+                accept,
+                self._needed.eq(self._needed - 1),
+            ),
+        ]
+
+        self._index = Signal(max=fft_size, reset=0)
+        self._wait = Signal(max=self.LATENCY + 1, reset=0)
+        self._frame = Signal(max=max(max_averages, 2), reset=0)
+        self._stage = Signal(max=max(bits, 2), reset=0)
+        self._phase = Signal(reset=0)
+        # butterflies of stage s pair a and a + 2**s, mask is 2**s - 1
+        self._mask = Signal(bits, reset=0)
+        self._twiddle_shift = Signal(max=bits, reset=bits - 1)
+
+        fsm.act("COLLECT",
+            If(start,
+                NextValue(self._index, 0),
+                NextState("LOAD"),
+            ),
+        )
+        fsm.act("LOAD",
+            NextValue(self._index, self._index + 1),
+            If(self._index == fft_size - 1,
+                NextValue(self._wait, 2),
+                NextState("LOAD_WAIT"),
+            ),
+        )
+        fsm.act("LOAD_WAIT",
+            NextValue(self._wait, self._wait - 1),
+            If(self._wait == 0,
+                NextValue(self._index, 0),
+                NextValue(self._phase, 0),
+                NextValue(self._stage, 0),
+                NextValue(self._mask, 0),
+                NextValue(self._twiddle_shift, bits - 1),
+                NextState("FFT"),
+            ),
+        )
+        fsm.act("FFT",
+            NextValue(self._phase, ~self._phase),
+            If(self._phase,
+                NextValue(self._index, self._index + 1),
+                If(self._index == fft_size // 2 - 1,
+                    NextValue(self._index, 0),
+                    NextValue(self._wait, self.LATENCY - 1),
+                    NextState("FFT_WAIT"),
+                ),
+            ),
+        )
+        fsm.act("FFT_WAIT",
+            NextValue(self._wait, self._wait - 1),
+            If(self._wait == 0,
+                NextValue(self._stage, self._stage + 1),
+                NextValue(self._mask, Cat(1, self._mask[:-1])),
+                NextValue(self._twiddle_shift, self._twiddle_shift - 1),
+                If(self._stage == bits - 1,
+                    NextState("POWER"),
+                ).Else(NextState("FFT")),
+            ),
+        )
+        fsm.act("POWER",
+            NextValue(self._index, self._index + 1),
+            If(self._index == bins - 1,
+                NextValue(self._index, 0),
+                NextValue(self._wait, 2),
+                NextState("POWER_WAIT"),
+            ),
+        )
+        fsm.act("POWER_WAIT",
+            NextValue(self._wait, self._wait - 1),
+            If(self._wait == 0,
+                If(self._frame == self.averages - 1,
+                    NextValue(self._frame, 0),
+                    NextState("OUTPUT"),
+                ).Else(
+                    NextValue(self._frame, self._frame + 1),
+                    NextState("COLLECT"),
+                ),
+            ),
+        )
+        fsm.act("OUTPUT",
+            If(source.valid & source.ready,
+                NextValue(self._index, self._index + 1),
+                If(source.last,
+                    NextValue(self._index, 0),
+                    NextState("COLLECT"),
+                ),
+            ),
+        )
+
+        # LOAD: window, round, store at the bit reversed address
+        load_index = [Signal(bits) for _ in range(3)]
+        loading = Signal(2, reset=0)
+        sample = Signal((data_width, True))
+        window = Signal((window_width, True))
+        product = Signal((data_width + window_width, True))
+        self.comb += [
+            input_rd.adr.eq(self._write + self._index),
+            window_rd.adr.eq(self._index),
+            load_index[0].eq(self._index),
+            sample.eq(input_rd.dat_r),
+            window.eq(window_rd.dat_r),
+        ]
+        self.sync += [
+            loading.eq(Cat(fsm.ongoing("LOAD"), loading[0])),
+            load_index[1].eq(load_index[0]),
+            load_index[2].eq(load_index[1]),
+            product.eq(sample * window),
+        ]
+        windowed = Signal((width, True))
+        self.comb += windowed.eq(
+            (product + ((1 << (window_width - 2)) >> 1)) >> (window_width - 2)
+        )
+
+        # FFT: read a then b, twiddle, add and subtract, write a then b
+        issue = Signal()
+        a = Signal(bits)
+        b = Signal(bits)
+        k = Signal(bits)
+        self.comb += [
+            issue.eq(fsm.ongoing("FFT")),
+            k.eq(self._index & self._mask),
+            a.eq(k | ((self._index & ~self._mask) << 1)),
+            b.eq(a | (self._mask + 1)),
+            twiddle_rd.adr.eq(k << self._twiddle_shift),
+        ]
+        busy = [Signal(reset=0) for _ in range(7)]
+        a_pipe = [Signal(bits) for _ in range(7)]
+        b_pipe = [Signal(bits) for _ in range(7)]
+        self.comb += [
+            busy[1].eq(issue & self._phase),
+            a_pipe[1].eq(a),
+            b_pipe[1].eq(b),
+        ]
+        for i in range(2, 7):
+            self.sync += [
+                busy[i].eq(busy[i - 1]),
+                a_pipe[i].eq(a_pipe[i - 1]),
+                b_pipe[i].eq(b_pipe[i - 1]),
+            ]
+
+        x_re, x_im = [Signal((width, True)) for _ in range(2)]
+        w_re, w_im = [Signal((twiddle_width, True)) for _ in range(2)]
+        self.comb += [
+            x_re.eq(work_rd.dat_r[:width]),
+            x_im.eq(work_rd.dat_r[width:]),
+            w_re.eq(twiddle_rd.dat_r[:twiddle_width]),
+            w_im.eq(twiddle_rd.dat_r[twiddle_width:]),
+        ]
+        a_re, a_im = [[Signal((width, True)) for _ in range(3)] for _ in range(2)]
+        p_rr, p_ii, p_ri, p_ir = [
+            Signal((width + twiddle_width, True)) for _ in range(4)
+        ]
+        t_re, t_im = [Signal((width, True)) for _ in range(2)]
+        out_a_re, out_a_im, out_b_re, out_b_im = [Signal((width, True)) for _ in range(4)]
+        half = (1 << (twiddle_width - 2)) >> 1
+        self.sync += [
+            # 1: a is read
+            If(busy[1], a_re[0].eq(x_re), a_im[0].eq(x_im)),
+            a_re[1].eq(a_re[0]), a_im[1].eq(a_im[0]),
+            a_re[2].eq(a_re[1]), a_im[2].eq(a_im[1]),
+            # 2: b and the twiddle are read
+            p_rr.eq(x_re * w_re),
+            p_ii.eq(x_im * w_im),
+            p_ri.eq(x_re * w_im),
+            p_ir.eq(x_im * w_re),
+            # 3
+            t_re.eq((p_rr - p_ii + half) >> (twiddle_width - 2)),
+            t_im.eq((p_ri + p_ir + half) >> (twiddle_width - 2)),
+            # 4, kept for the two write backs
+            If(
+                busy[4],
+                out_a_re.eq(a_re[2] + t_re),
+                out_a_im.eq(a_im[2] + t_im),
+                out_b_re.eq(a_re[2] - t_re),
+                out_b_im.eq(a_im[2] - t_im),
+            ),
+        ]
+        self.comb += [
+            work_rd.adr.eq(Mux(self._phase, b, a)),
+            # 5 and 6: write back
+            If(
+                loading[1],
+                work_wr.adr.eq(Cat(*reversed([load_index[2][i] for i in range(bits)]))),
+                work_wr.dat_w.eq(Cat(windowed, Replicate(0, width))),
+                work_wr.we.eq(1),
+            ).Elif(
+                busy[5],
+                work_wr.adr.eq(a_pipe[5]),
+                work_wr.dat_w.eq(Cat(out_a_re, out_a_im)),
+                work_wr.we.eq(1),
+            ).Elif(
+                busy[6],
+                work_wr.adr.eq(b_pipe[6]),
+                work_wr.dat_w.eq(Cat(out_b_re, out_b_im)),
+                work_wr.we.eq(1),
+            ),
+        ]
+
+        # POWER: |X[k]|**2 added to the sums, the first frame overwrites them
+        powering = Signal(2, reset=0)
+        power_index = [Signal(bits) for _ in range(2)]
+        square_re = Signal(2 * width)
+        square_im = Signal(2 * width)
+        previous = Signal(acc_width)
+        first = Signal()
+        self.sync += [
+            powering.eq(Cat(fsm.ongoing("POWER"), powering[0])),
+            power_index[0].eq(self._index),
+            power_index[1].eq(power_index[0]),
+            square_re.eq(x_re * x_re),
+            square_im.eq(x_im * x_im),
+            previous.eq(power_rd.dat_r),
+            first.eq(self._frame == 0),
+        ]
+        self.comb += [
+            If(fsm.ongoing("POWER"), work_rd.adr.eq(self._index)),
+            power_wr.adr.eq(power_index[1]),
+            power_wr.dat_w.eq(Mux(first, 0, previous) + square_re + square_im),
+            power_wr.we.eq(powering[1]),
+        ]
+
+        # OUTPUT: the read address runs one bin ahead when a bin is taken
+        primed = Signal(reset=0)
+        shifted = Signal(acc_width)
+        self.sync += primed.eq(fsm.ongoing("OUTPUT") & ~(source.valid & source.ready & source.last))
+        self.comb += [
+            If(
+                fsm.ongoing("OUTPUT") & source.valid & source.ready,
+                power_rd.adr.eq(self._index + 1),
+            ).Else(power_rd.adr.eq(self._index)),
+            source.valid.eq(fsm.ongoing("OUTPUT") & primed),
+            source.first.eq(self._index == 0),
+            source.last.eq(self._index == bins - 1),
+            shifted.eq(power_rd.dat_r >> output_shift),
+            If(
+                shifted >= 2**output_width,
+                source.data.eq(2**output_width - 1),
+            ).Else(source.data.eq(shifted)),
+        ]
+
+    def add_csr(self):
+        self._averages = CSRStorage(
+            len(self.averages), reset=self.averages.reset.value, name="averages",
+            description="Frames summed in each spectrum.",
+        )
+        self.comb += self.averages.eq(self._averages.storage)
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(WelchPsd(fft_size=64, averages=4)).write("WelchPsd.v")
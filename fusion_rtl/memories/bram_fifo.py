@@ -0,0 +1,99 @@
+import logging
+import math
+
+from litex.gen import *
+from litex.soc.cores.clock.common import *
+from migen.genlib.fifo import SyncFIFOBuffered
+
+
+# ECP5 DP16KD aspect ratios (depth, width), 512x36 is the pseudo dual port mode.
+DP16KD_CONFIGS = [
+    (16384, 1),
+    (8192, 2),
+    (4096, 4),
+    (2048, 9),
+    (1024, 18),
+    (512, 36),
+]
+
+
+def dp16kd_geometry(width, depth=None, bram_count=None):
+    """
+    Find the DP16KD arrangement for a ``width`` bits memory, wider words are
+    split over ``blocks_wide`` blocks side by side.
+
+    With ``depth``, returns the arrangement using the fewest blocks that is at
+    least ``depth`` deep, with ``bram_count`` the deepest one fitting in that
+    many blocks. Ties are broken by the deepest arrangement.
+
+    :return: (block_depth, block_width, blocks_wide, blocks_deep)
+    """
+    assert (depth is None) != (bram_count is None), "Give either depth or bram_count"
+    best = None
+    for block_depth, block_width in DP16KD_CONFIGS:
+        blocks_wide = math.ceil(width / block_width)
+        if depth is not None:
+            blocks_deep = math.ceil(depth / block_depth)
+        else:
+            blocks_deep = bram_count // blocks_wide
+            if blocks_deep == 0:
+                continue
+        blocks, capacity = blocks_wide * blocks_deep, blocks_deep * block_depth
+        key = (blocks, -capacity) if depth is not None else (-capacity, blocks)
+        if best is None or key < best[0]:
+            best = (key, (block_depth, block_width, blocks_wide, blocks_deep))
+    if best is None:
+        raise ValueError(f"{bram_count} DP16KD are not enough for {width} bits words")
+    return best[1]
+
+
+class BramFifo(LiteXModule):
+    """
+    SyncFIFO compatible (fwft) FIFO sized to fill whole ECP5 DP16KD blocks.
+
+    The depth is rounded up to the capacity of the blocks it needs anyway, so
+    narrow FIFOs get all the words the block RAM can hold. The memory has a
+    synchronous read port so that it can be inferred as block RAM, it is a
+    single ``width`` x ``depth`` memory, neither the aspect ratio nor the
+    split of the words over blocks is imposed, packing it into DP16KD is
+    left to the synthesis tool. ``bram_count`` and ``efficiency`` are
+    therefore estimates, the figures of the ``dp16kd_geometry`` arrangement
+    used to size the depth, logged at elaboration time, the tool may use
+    more blocks. The output register holds one more word, up to ``depth`` +
+    1 words are stored.
+
+    :param width: Word width in bits.
+    :param depth: Minimum depth, or
+    :param bram_count: number of DP16KD to fill.
+    """
+    def __init__(self, width, depth=None, bram_count=None):
+        self.logger = logging.getLogger("BramFifo")
+        block_depth, block_width, blocks_wide, blocks_deep = dp16kd_geometry(
+            width, depth=depth, bram_count=bram_count
+        )
+        self.width = width
+        self.depth = block_depth * blocks_deep
+        self.bram_count = blocks_wide * blocks_deep
+        self.efficiency = (width * self.depth) / (self.bram_count * 18 * 1024)
+        self.logger.info(
+            f"{width}x{self.depth} FIFO sized for {self.bram_count} DP16KD "
+            f"({blocks_wide}x{blocks_deep} of {block_depth}x{block_width}), "
+            f"{100 * self.efficiency:.0f}% of their bits, estimated, packing "
+            f"is left to synthesis"
+        )
+
+        self.submodules.fifo = fifo = SyncFIFOBuffered(width=width, depth=self.depth)
+        self.din = fifo.din
+        self.we = fifo.we
+        self.writable = fifo.writable
+        self.dout = fifo.dout
+        self.re = fifo.re
+        self.readable = fifo.readable
+        self.level = fifo.level
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    logging.basicConfig(level=logging.INFO)
+    convert(BramFifo(width=8, depth=2**14)).write("BramFifo.v")
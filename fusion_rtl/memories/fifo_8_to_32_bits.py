@@ -46,7 +46,79 @@ class Fifo8to32Bits(LiteXModule):
         self.comb += self.re.eq(~self.fsm.ongoing("IDLE"))
 
 
+class Fifo8toNBits(LiteXModule):
+    """
+    Streaming byte to word converter sitting between two FIFOs.
+
+    Input side follows the first word fall through FIFO convention: ``din``
+    is valid when ``readable`` is set and is consumed when ``re`` is set.
+    Output side pushes ``dout`` with ``we`` when ``writable`` is set. Bytes
+    are accepted every clock, the first one ends up in ``dout[:8]``.
+
+    The word being assembled doubles as a skid buffer: a complete word waits
+    there while the output register is stalled, so ``re`` only depends on
+    registers and one word per ``out_width // 8`` clocks gets through
+    without idle cycles.
+
+    :param out_width: Output word width, 16, 32 or 64 bits.
+    """
+    def __init__(self, out_width=32):
+        assert out_width in (16, 32, 64), "Output width must be 16, 32 or 64 bits"
+        ratio = out_width // 8
+        self.din = Signal(8)
+        self.readable = Signal()
+        self.re = Signal()
+        self.dout = Signal(out_width)
+        self.we = Signal()
+        self.writable = Signal()
+
+        self._word = Signal(out_width)
+        self._word_full = Signal(reset=0)
+        self._byte_cnt = Signal(max=ratio, reset=0)
+        self._dout_valid = Signal(reset=0)
+
+        _next_word = Cat(self._word[8:], self.din)
+        _drain = Signal()
+        _output_free = Signal()
+
+        self.comb += [
+            self.re.eq(self.readable & ~self._word_full),
+            self.we.eq(self._dout_valid & self.writable),
+            _drain.eq(self.we),
+            _output_free.eq(~self._dout_valid | _drain),
+        ]
+
+        self.sync += [
+            If(_drain, self._dout_valid.eq(0)),
+            If(
+                self._word_full & _output_free,
+                self.dout.eq(self._word),
+                self._dout_valid.eq(1),
+                self._word_full.eq(0),
+            ),
+            If(
+                self.re,
+                self._word.eq(_next_word),
+                If(
+                    self._byte_cnt == ratio - 1,
+                    self._byte_cnt.eq(0),
+                    If(
+                        _output_free,
+                        self.dout.eq(_next_word),
+                        self._dout_valid.eq(1),
+                    ).Else(self._word_full.eq(1)),
+                ).Else(self._byte_cnt.eq(self._byte_cnt + 1)),
+            ),
+        ]
+
+
 if __name__ == "__main__":
+    import argparse
     from migen.fhdl.verilog import convert
 
+    parser = argparse.ArgumentParser(description="Generate Verilog for the byte to word converters")
+    parser.add_argument("--out-width", type=int, default=32, help="Fifo8toNBits output width")
+    args = parser.parse_args()
+
     convert(Fifo8to32Bits()).write("Fifo8to32Bits.v")
+    convert(Fifo8toNBits(args.out_width)).write("Fifo8toNBits.v")
@@ -1,6 +1,6 @@
 from litex.gen import *
 from litex.soc.cores.clock.common import *
-from migen.genlib.fifo import SyncFIFO
+from migen.genlib.fifo import SyncFIFO, SyncFIFOBuffered
 
 
 class FifoChainElement(LiteXModule):
@@ -109,7 +109,112 @@ class SerializeFifo(LiteXModule):
         
 
 
+class PipelinedFifoChainElement(LiteXModule):
+    """
+    Continuously forwarding variant of FifoChainElement.
+
+    A word is read from the local FIFO whenever the next one is guaranteed
+    to have room for it, counting the words still in flight, so the chain
+    moves one word per clock. The local FIFO uses a synchronous read port
+    so it maps to block RAM, its output goes through ``pipeline_stages``
+    extra registers before reaching the next FIFO: more stages improve
+    Fmax, each one adds a clock of latency per element.
+    """
+    def __init__(self, width=32, fifo_depth=32, pipeline_stages=0):
+        self._in_flight = 1 + pipeline_stages
+        assert fifo_depth > self._in_flight
+        self.we = Signal()
+        self.next_fifo_we = Signal()
+        self.next_fifo_level = Signal(max=fifo_depth + 1)
+        self.writable = Signal()
+        self.din = Signal(width, reset_less=True)
+        self.dout = Signal(width, reset_less=True)
+
+        self._fifo = SyncFIFO(width=width, depth=fifo_depth, fwft=False)
+        self.level = Signal(self._fifo.level.nbits)
+        self.submodules.fifo = self._fifo
+
+        self._re = Signal()
+        self.comb += self._re.eq(
+            self._fifo.readable
+            & (self.next_fifo_level < fifo_depth - self._in_flight)
+        )
+
+        self.comb += self._fifo.we.eq(self.we)
+        self.comb += self._fifo.re.eq(self._re)
+        self.comb += self._fifo.din.eq(self.din)
+        self.comb += self.writable.eq(self._fifo.writable)
+        self.comb += self.level.eq(self._fifo.level)
+
+        valid = Signal(reset=0)
+        self.sync += valid.eq(self._re)
+        data = self._fifo.dout
+        for i in range(pipeline_stages):
+            _valid = Signal(reset=0)
+            _data = Signal(width, reset_less=True)
+            self.sync += [_valid.eq(valid), _data.eq(data)]
+            valid, data = _valid, _data
+
+        self.comb += self.next_fifo_we.eq(valid)
+        self.comb += self.dout.eq(data)
+
+
+class PipelinedSerializeFifo(LiteXModule):
+    """
+    Same interface as SerializeFifo, built from PipelinedFifoChainElement
+    so data flows at one word per clock through the whole chain.
+
+    :param pipeline_stages: Extra registers between two elements, they
+        trade Fmax against latency, roughly fifo_count * (2 + pipeline_stages)
+        clocks through an empty chain.
+    """
+    def __init__(self, width=32, fifo_depth=32, fifo_count=4, pipeline_stages=0):
+        assert fifo_count >= 2
+
+        self.head = PipelinedFifoChainElement(
+            width=width, fifo_depth=fifo_depth, pipeline_stages=pipeline_stages
+        )
+        self.tail = SyncFIFOBuffered(width=width, depth=fifo_depth)
+
+        precedent = self.head
+        for i in range(fifo_count - 2):
+            element = PipelinedFifoChainElement(
+                width=width, fifo_depth=fifo_depth, pipeline_stages=pipeline_stages
+            )
+            setattr(self.submodules, f"element_{i}", element)
+            setattr(self, f"element_{i}", element)
+            self.comb += element.we.eq(precedent.next_fifo_we)
+            self.comb += precedent.next_fifo_level.eq(element.level)
+            self.comb += element.din.eq(precedent.dout)
+            precedent = element
+
+        self.comb += self.tail.we.eq(precedent.next_fifo_we)
+        self.comb += self.tail.din.eq(precedent.dout)
+        self.comb += precedent.next_fifo_level.eq(self.tail.level)
+
+        self.dout = Signal(width)
+        self.re = Signal()
+        self.readable = Signal()
+        self.level = Signal(self.tail.level.nbits)
+        self.head_level = Signal(self.head.level.nbits)
+
+        self.din = Signal(width)
+        self.we = Signal()
+        self.writable = Signal()
+
+        self.comb += self.head.din.eq(self.din)
+        self.comb += self.head.we.eq(self.we)
+        self.comb += self.writable.eq(self.head.writable)
+
+        self.comb += self.dout.eq(self.tail.dout)
+        self.comb += self.tail.re.eq(self.re)
+        self.comb += self.readable.eq(self.tail.readable)
+        self.comb += self.level.eq(self.tail.level)
+        self.comb += self.head_level.eq(self.head.level)
+
+
 if __name__ == "__main__":
     from migen.fhdl.verilog import convert
 
     convert(SerializeFifo()).write("SerializeFifo.v")
+    convert(PipelinedSerializeFifo(pipeline_stages=1)).write("PipelinedSerializeFifo.v")
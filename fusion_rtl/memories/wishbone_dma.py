@@ -0,0 +1,155 @@
+import logging
+
+from migen import *
+
+from litex.gen import *
+from litex.gen.common import reverse_bytes
+
+from litex.soc.interconnect.csr import CSRStatus, CSRStorage
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+
+class WishboneBurstDMAWriter(LiteXModule):
+    """
+    Stream to memory DMA writing incrementing Wishbone bursts.
+
+    Words are gathered in a FIFO and written ``burst_length`` at a time in
+    one cycle with ``cti`` set to incrementing address, one word per clock
+    when the slave acks every clock, instead of one cycle per word. Bursts do
+    not cross the end of the buffer, the last one of a buffer can be shorter.
+
+    The controls are the ones of LiteX WishboneDMAWriter.add_ctrl: ``length``
+    bytes are written from ``base``, over and over when ``loop`` is set,
+    clearing ``enable`` stops and drops the words not written yet.
+    ``offset`` is the number of words written since the start of the buffer,
+    ``written`` pulses for every word acknowledged and ``last`` with it on the
+    last word of the buffer. Words are dropped while not enabled.
+
+    :param bus: Word addressed wishbone.Interface, the DMA master.
+    :param burst_length: Words per burst.
+    :param fifo_depth: Words the FIFO holds, twice ``burst_length`` by
+        default so that a burst can be gathered while another one is written.
+    """
+    def __init__(self, bus, burst_length=16, fifo_depth=None, endianness="little", with_csr=False):
+        assert isinstance(bus, wishbone.Interface)
+        assert burst_length >= 1
+        fifo_depth = 2 * burst_length if fifo_depth is None else fifo_depth
+        assert fifo_depth >= burst_length
+        self.bus = bus
+        self.burst_length = burst_length
+        logging.getLogger("WishboneBurstDMAWriter").info(
+            f"{burst_length} words bursts, {fifo_depth} words FIFO"
+        )
+
+        self.sink = sink = stream.Endpoint([("data", bus.data_width)])
+
+        self.base = Signal(64, reset=0)
+        self.length = Signal(32, reset=0)
+        self.enable = Signal(reset=0)
+        self.done = Signal()
+        self.loop = Signal(reset=0)
+        self.offset = Signal(32)
+        self.written = Signal()
+        self.last = Signal()
+
+        shift = log2_int(bus.data_width // 8)
+        base_adr = Signal(bus.adr_width)
+        words = Signal(bus.adr_width)
+        self.comb += [
+            base_adr.eq(self.base[shift:]),
+            words.eq(self.length[shift:]),
+        ]
+
+        self.fifo = fifo = ResetInserter()(
+            stream.SyncFIFO([("data", bus.data_width)], fifo_depth)
+        )
+        self.comb += [
+            fifo.reset.eq(~self.enable),
+            fifo.sink.valid.eq(sink.valid & self.enable),
+            fifo.sink.data.eq(sink.data),
+            sink.ready.eq(fifo.sink.ready | ~self.enable),
+        ]
+
+        position = Signal(bus.adr_width, reset=0)
+        address = Signal(bus.adr_width, reset=0)
+        beats = Signal(max=burst_length + 1, reset=0)
+        remaining = Signal(bus.adr_width)
+        size = Signal(max=burst_length + 1)
+        self.comb += [
+            self.offset.eq(position),
+            remaining.eq(words - position),
+            If(
+                remaining < burst_length,
+                size.eq(remaining),
+            ).Else(size.eq(burst_length)),
+        ]
+
+        self.fsm = fsm = ResetInserter()(FSM(reset_state="IDLE"))
+        self.comb += fsm.reset.eq(~self.enable)
+        fsm.act("IDLE",
+            NextValue(position, 0),
+            NextState("GATHER"),
+        )
+        fsm.act("GATHER",
+            If((size != 0) & (fifo.level >= size),
+                NextValue(address, base_adr + position),
+                NextValue(beats, size),
+                NextState("BURST"),
+            )
+        )
+        fsm.act("BURST",
+            bus.cyc.eq(1),
+            bus.stb.eq(1),
+            bus.we.eq(1),
+            bus.sel.eq(2**(bus.data_width // 8) - 1),
+            bus.adr.eq(address),
+            bus.dat_w.eq(
+                {"big": fifo.source.data, "little": reverse_bytes(fifo.source.data)}[endianness]
+            ),
+            bus.bte.eq(0b00),
+            If(beats == 1,
+                bus.cti.eq(0b111),
+            ).Else(bus.cti.eq(0b010)),
+            fifo.source.ready.eq(bus.ack),
+            self.written.eq(bus.ack),
+            self.last.eq(bus.ack & (position + 1 == words)),
+            If(bus.ack,
+                NextValue(address, address + 1),
+                NextValue(beats, beats - 1),
+                NextValue(position, position + 1),
+                If(beats == 1, NextState("GATHER")),
+                If(self.last,
+                    If(self.loop,
+                        NextValue(position, 0),
+                    ).Else(NextState("DONE")),
+                ),
+            )
+        )
+        fsm.act("DONE", self.done.eq(1))
+
+        if with_csr:
+            self.add_csr()
+
+    def add_csr(self):
+        self._base = CSRStorage(64, name="base", description="Buffer address, in bytes.")
+        self._length = CSRStorage(32, name="length", description="Buffer length, in bytes.")
+        self._enable = CSRStorage(name="enable", description="Starts the DMA, 0 stops it.")
+        self._done = CSRStatus(name="done", description="Buffer written, when not looping.")
+        self._loop = CSRStorage(name="loop", description="Restart from base at the end of the buffer.")
+        self._offset = CSRStatus(32, name="offset", description="Words written since base.")
+        self.comb += [
+            self.base.eq(self._base.storage),
+            self.length.eq(self._length.storage),
+            self.enable.eq(self._enable.storage),
+            self.loop.eq(self._loop.storage),
+            self._done.status.eq(self.done),
+            self._offset.status.eq(self.offset),
+        ]
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    bus = wishbone.Interface(data_width=32, address_width=30, addressing="word")
+    convert(WishboneBurstDMAWriter(bus, burst_length=8)).write("WishboneBurstDMAWriter.v")
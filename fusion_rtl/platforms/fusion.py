@@ -218,23 +218,25 @@ class AnalogTwoPlatform(FusionPlatform):
         self.io3 = self.request("IO3")
         self.io2 = self.request("IO2")
 
-    def connect_adc1(self, adc1):
-        adc1.comb += adc1.pads.ready_strobe.eq(self.adc1_pads.ready_strobe)
+    def connect_adc1(self, adc1, lane=0):
+        if lane == 0:
+            adc1.comb += adc1.pads.ready_strobe.eq(self.adc1_pads.ready_strobe)
         adc1.comb += self.adc1_pads.conv_st.eq(adc1.pads.conv_st)
         adc1.comb += self.adc1_pads.cs.eq(adc1.pads.cs)
         adc1.comb += self.adc1_pads.sclk.eq(adc1.pads.sclk)
         adc1.comb += self.adc1_pads.mosi.eq(adc1.pads.mosi)
-        adc1.comb += adc1.pads.miso_a.eq(self.adc1_pads.miso_a)
-        adc1.comb += adc1.pads.miso_b.eq(self.adc1_pads.miso_b)
+        adc1.comb += adc1.pads.miso_a[lane].eq(self.adc1_pads.miso_a)
+        adc1.comb += adc1.pads.miso_b[lane].eq(self.adc1_pads.miso_b)
 
-    def connect_adc2(self, adc2):
-        adc2.comb += adc2.pads.ready_strobe.eq(self.adc2_pads.ready_strobe)
+    def connect_adc2(self, adc2, lane=0):
+        if lane == 0:
+            adc2.comb += adc2.pads.ready_strobe.eq(self.adc2_pads.ready_strobe)
         adc2.comb += self.adc2_pads.conv_st.eq(adc2.pads.conv_st)
         adc2.comb += self.adc2_pads.cs.eq(adc2.pads.cs)
         adc2.comb += self.adc2_pads.sclk.eq(adc2.pads.sclk)
         adc2.comb += self.adc2_pads.mosi.eq(adc2.pads.mosi)
-        adc2.comb += adc2.pads.miso_a.eq(self.adc2_pads.miso_a)
-        adc2.comb += adc2.pads.miso_b.eq(self.adc2_pads.miso_b)
+        adc2.comb += adc2.pads.miso_a[lane].eq(self.adc2_pads.miso_a)
+        adc2.comb += adc2.pads.miso_b[lane].eq(self.adc2_pads.miso_b)
 
 
 # Design -------------------------------------------------------------------------------------------
@@ -0,0 +1,257 @@
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import CSRStorage, CSRStatus, CSRField, CSR
+from litex.soc.interconnect import stream
+
+
+# Data response token errors, ``error`` values
+SD_ERROR_NONE = 0
+SD_ERROR_REJECTED = 1
+SD_ERROR_NO_RESPONSE = 2
+SD_ERROR_BUSY_TIMEOUT = 3
+
+
+def crc16(data, crc=0):
+    """SD data CRC, CRC16-CCITT with a zero initial value, of ``data`` bytes."""
+    for byte in data:
+        for i in range(7, -1, -1):
+            feedback = ((crc >> 15) ^ (byte >> i)) & 1
+            crc = ((crc << 1) & 0xFFFF) ^ (0x1021 if feedback else 0)
+    return crc
+
+
+def crc16_update(crc, data):
+    """
+    Expressions of the 16 CRC bits after shifting in ``data``, MSB first, as
+    ``crc16`` does bit by bit.
+    """
+    bits = [crc[i] for i in range(16)]
+    for i in reversed(range(len(data))):
+        feedback = bits[15] ^ data[i]
+        bits = [feedback] + [
+            bits[k - 1] ^ feedback if (0x1021 >> k) & 1 else bits[k - 1]
+            for k in range(1, 16)
+        ]
+    return Cat(*bits)
+
+
+class SDBlockWriter(LiteXModule):
+    """
+    Writes SD card data blocks in SPI mode without the CPU: for each of the
+    ``blocks`` blocks, the start ``token`` (0xFE for CMD24, 0xFC for CMD25),
+    ``length`` bytes from the sink, their CRC16, then waits for the data
+    response and the end of the card busy time. The command itself and the
+    stop token are left to the firmware. Stops on the first error, ``error``
+    tells which one and ``response`` holds the last data response. ``stop``
+    ends the write before the next block, ``written`` tells how many were.
+    ``length`` is rounded up to whole words, nothing is written when it is 0.
+
+    Transfers go through the byte, half word and word transfers of the SPI
+    master, data words are sent MSB first, as the WishboneDMAReader gives the
+    bytes in memory order. ``cs`` is low from ``start`` to the end of the
+    last block. Words reaching the sink while idle are dropped, what is left
+    of the data after an error does not end up in the next blocks.
+
+    :param max_response_bytes: Bytes read while waiting for the data response.
+    """
+    def __init__(self, max_response_bytes=8, busy_timeout=2**20):
+        self.sink = sink = stream.Endpoint([("data", 32)])
+
+        self.start = Signal()
+        self.stop = Signal()
+        self.length = Signal(16, reset=512)
+        self.blocks = Signal(32, reset=1)
+        self.token = Signal(8, reset=0xFC)
+        self.busy_timeout = Signal(32, reset=busy_timeout)
+        self.active = Signal()
+        self.done = Signal(reset=0)
+        self.error = Signal(2, reset=0)
+        self.response = Signal(8, reset=0)
+        self.written = Signal(32, reset=0)
+        self.crc = Signal(16, reset=0)
+
+        # SPI master side, as the _SPIMaster signals
+        self.start8bits = Signal()
+        self.start16bits = Signal()
+        self.start32bits = Signal()
+        self.data_wr_8 = Signal(8)
+        self.data_wr_16 = Signal(16)
+        self.data_wr_32 = Signal(32)
+        self.ready = Signal()
+        self.data_rd = Signal(32)
+
+        words = Signal(15)
+        self.comb += words.eq(self.length[2:] + (self.length[:2] != 0))
+        remaining = Signal(15, reset=0)
+        stopping = Signal(reset=0)
+        blocks_left = Signal(32, reset=0)
+        polls = Signal(32, reset=0)
+        received = Signal(8)
+        self.comb += received.eq(self.data_rd[:8])
+
+        # Every transfer is started from a state when the master is ready and
+        # waited for in the next one, ready is low on entering it.
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            sink.ready.eq(1),
+            If(self.start,
+                NextValue(self.done, 0),
+                NextValue(self.error, SD_ERROR_NONE),
+                NextValue(self.written, 0),
+                NextValue(blocks_left, self.blocks),
+                If((self.blocks != 0) & (self.length != 0),
+                    NextState("TOKEN")
+                ).Else(
+                    NextValue(self.done, 1)
+                )
+            )
+        )
+        fsm.act("TOKEN",
+            self.data_wr_8.eq(self.token),
+            If(self.stop | stopping,
+                NextState("DONE")
+            ).Elif(self.ready,
+                self.start8bits.eq(1),
+                NextValue(self.crc, 0),
+                NextValue(remaining, words),
+                NextState("TOKEN_WAIT")
+            )
+        )
+        fsm.act("TOKEN_WAIT",
+            If(self.ready, NextState("DATA"))
+        )
+        fsm.act("DATA",
+            self.data_wr_32.eq(sink.data),
+            If(self.ready & sink.valid,
+                self.start32bits.eq(1),
+                sink.ready.eq(1),
+                NextValue(self.crc, crc16_update(self.crc, sink.data)),
+                NextValue(remaining, remaining - 1),
+                NextState("DATA_WAIT")
+            )
+        )
+        fsm.act("DATA_WAIT",
+            If(self.ready,
+                If(remaining == 0,
+                    NextState("CRC")
+                ).Else(
+                    NextState("DATA")
+                )
+            )
+        )
+        fsm.act("CRC",
+            self.data_wr_16.eq(self.crc),
+            If(self.ready,
+                self.start16bits.eq(1),
+                NextValue(polls, max_response_bytes),
+                NextState("CRC_WAIT")
+            )
+        )
+        fsm.act("CRC_WAIT",
+            If(self.ready, NextState("RESPONSE"))
+        )
+        fsm.act("RESPONSE",
+            self.data_wr_8.eq(0xFF),
+            If(self.ready,
+                self.start8bits.eq(1),
+                NextValue(polls, polls - 1),
+                NextState("RESPONSE_WAIT")
+            )
+        )
+        fsm.act("RESPONSE_WAIT",
+            If(self.ready,
+                If(received != 0xFF,
+                    NextValue(self.response, received),
+                    If(received[:5] == 0b00101,
+                        NextValue(polls, self.busy_timeout),
+                        NextState("BUSY")
+                    ).Else(
+                        NextValue(self.error, SD_ERROR_REJECTED),
+                        NextState("DONE")
+                    )
+                ).Elif(polls == 0,
+                    NextValue(self.error, SD_ERROR_NO_RESPONSE),
+                    NextState("DONE")
+                ).Else(
+                    NextState("RESPONSE")
+                )
+            )
+        )
+        # the card holds MISO low while it programs the block
+        fsm.act("BUSY",
+            self.data_wr_8.eq(0xFF),
+            If(self.ready,
+                self.start8bits.eq(1),
+                NextValue(polls, polls - 1),
+                NextState("BUSY_WAIT")
+            )
+        )
+        fsm.act("BUSY_WAIT",
+            If(self.ready,
+                If(received == 0xFF,
+                    NextValue(self.written, self.written + 1),
+                    NextValue(blocks_left, blocks_left - 1),
+                    If(blocks_left == 1,
+                        NextState("DONE")
+                    ).Else(
+                        NextState("TOKEN")
+                    )
+                ).Elif(polls == 0,
+                    NextValue(self.error, SD_ERROR_BUSY_TIMEOUT),
+                    NextState("DONE")
+                ).Else(
+                    NextState("BUSY")
+                )
+            )
+        )
+        fsm.act("DONE",
+            NextValue(self.done, 1),
+            NextState("IDLE")
+        )
+        self.comb += self.active.eq(~fsm.ongoing("IDLE"))
+        # a stop coming during a block is kept until its end
+        self.sync += If(~self.active,
+            stopping.eq(0)
+        ).Elif(self.stop,
+            stopping.eq(1)
+        )
+
+    def add_csr(self):
+        self._control = CSRStorage(fields=[
+            CSRField("start", size=1, pulse=True, description="Starts writing ``blocks`` blocks."),
+            CSRField("stop", size=1, pulse=True, description="Ends the write before the next block."),
+        ], name="control")
+        self._length = CSRStorage(16, reset=512, name="length",
+            description="Bytes per block, rounded up to a multiple of 4.")
+        self._blocks = CSRStorage(32, reset=1, name="count",
+            description="Blocks written by a start.")
+        self._token = CSRStorage(8, reset=0xFC, name="token",
+            description="Start block token, 0xFE for CMD24, 0xFC for CMD25.")
+        self._status = CSRStatus(fields=[
+            CSRField("active", size=1, description="Blocks are being written."),
+            CSRField("done", size=1, description="Last start finished."),
+            CSRField("error", size=2, description="0: none, 1: data rejected, 2: no data response, 3: busy timeout."),
+            CSRField("response", size=8, offset=8, description="Last data response token."),
+        ], name="status")
+        self._written = CSRStatus(32, name="written",
+            description="Blocks written since the last start.")
+        self.comb += [
+            self.start.eq(self._control.fields.start),
+            self.stop.eq(self._control.fields.stop),
+            self.length.eq(self._length.storage),
+            self.blocks.eq(self._blocks.storage),
+            self.token.eq(self._token.storage),
+            self._status.fields.active.eq(self.active),
+            self._status.fields.done.eq(self.done),
+            self._status.fields.error.eq(self.error),
+            self._status.fields.response.eq(self.response),
+            self._written.status.eq(self.written),
+        ]
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(SDBlockWriter(busy_timeout=64)).write("SDBlockWriter.v")
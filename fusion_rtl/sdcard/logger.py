@@ -0,0 +1,307 @@
+from migen import *
+
+from litex.gen import *
+from litex.gen.common import reverse_bytes
+
+from litex.soc.interconnect.csr import CSRStorage, CSRStatus, CSRField
+from litex.soc.interconnect import stream
+
+from ..memories.bram_fifo import BramFifo
+from .block_writer import SDBlockWriter
+
+
+# ``error`` values
+SD_LOGGER_ERROR_NONE = 0
+SD_LOGGER_ERROR_NOT_READY = 1
+SD_LOGGER_ERROR_COMMAND = 2
+SD_LOGGER_ERROR_WRITE = 3
+
+CMD25 = 25
+STOP_TRAN_TOKEN = 0xFD
+
+
+class SDLogger(LiteXModule):
+    """
+    Logs a stream of words to an SD card in SPI mode without the CPU, with a
+    multiple block write: waits for the card, sends CMD25 with ``address``,
+    then an SDBlockWriter writes 512 bytes blocks from the FIFO, checking the
+    data responses and the busy times, at most ``blocks`` of them, and the
+    stop token ends the write.
+
+    ``start`` empties the FIFO and starts capturing the sink, ``stop`` ends
+    the capture, the FIFO is written out, the last block completed with
+    zeros. The sink is never stalled, words are dropped when not capturing or
+    when the FIFO is full, while the card is busy, and counted in
+    ``dropped``. Stops on the first error, ``error`` tells where it occurred,
+    ``r1`` holds the CMD25 response, the writer status the block one; after a
+    block error the card is left in the write, it needs a CMD12.
+
+    :param fifo_depth: Minimum FIFO depth in words, it has to hold the data
+        coming while the card is busy.
+    :param endianness: Byte order of the words in the blocks, "little" lays
+        them out as a little endian CPU stores them.
+    :param max_response_bytes: Bytes read while waiting for a response.
+    :param busy_timeout: Bytes read while waiting for the card.
+    """
+    def __init__(self, fifo_depth=4096, endianness="little", max_response_bytes=8, busy_timeout=2**20):
+        self.sink = sink = stream.Endpoint([("data", 32)])
+
+        self.start = Signal()
+        self.stop = Signal()
+        self.address = Signal(32, reset=0)
+        self.blocks = Signal(32, reset=2**32 - 1)
+        self.active = Signal()
+        self.done = Signal(reset=0)
+        self.error = Signal(2, reset=0)
+        self.r1 = Signal(8, reset=0)
+        self.written = Signal(32)
+        self.dropped = Signal(32, reset=0)
+        self.level = Signal(32, name="level")
+
+        # SPI master side, as the _SPIMaster signals
+        self.start8bits = Signal()
+        self.start16bits = Signal()
+        self.start32bits = Signal()
+        self.data_wr_8 = Signal(8)
+        self.data_wr_16 = Signal(16)
+        self.data_wr_32 = Signal(32)
+        self.ready = Signal()
+        self.data_rd = Signal(32)
+
+        self.writer = writer = SDBlockWriter(max_response_bytes=max_response_bytes, busy_timeout=busy_timeout)
+        self.fifo = fifo = ResetInserter()(BramFifo(width=32, depth=fifo_depth))
+
+        capturing = Signal(reset=0)
+        stopping = Signal(reset=0)
+        polls = Signal(32, reset=0)
+        received = Signal(8)
+        self.comb += [
+            received.eq(self.data_rd[:8]),
+            self.written.eq(writer.written),
+            self.level.eq(fifo.level),
+        ]
+
+        # Capture
+        self.comb += [
+            sink.ready.eq(1),
+            fifo.reset.eq(~self.active),
+            fifo.din.eq(sink.data),
+            fifo.we.eq(sink.valid & capturing),
+        ]
+        self.sync += [
+            If(self.start & ~self.active,
+                self.dropped.eq(0)
+            ).Elif(sink.valid & capturing & ~fifo.writable & (self.dropped != 2**32 - 1),
+                self.dropped.eq(self.dropped + 1)
+            ),
+        ]
+
+        # Blocks, zeros complete the last one once stopping
+        words = fifo.dout if endianness == "big" else reverse_bytes(fifo.dout)
+        self.comb += [
+            writer.ready.eq(self.ready),
+            writer.data_rd.eq(self.data_rd),
+            writer.length.eq(512),
+            writer.token.eq(0xFC),
+            writer.blocks.eq(self.blocks),
+            writer.stop.eq(stopping & ~fifo.readable),
+            writer.sink.valid.eq(writer.active & (fifo.readable | stopping)),
+            If(fifo.readable, writer.sink.data.eq(words)),
+            fifo.re.eq(writer.sink.valid & writer.sink.ready & fifo.readable),
+        ]
+
+        # Command and stop token, the writer drives the master in between
+        master = {name: Signal.like(getattr(self, name)) for name in
+            ["start8bits", "start16bits", "start32bits", "data_wr_8", "data_wr_16", "data_wr_32"]}
+        for name, signal in master.items():
+            self.comb += If(writer.active,
+                getattr(self, name).eq(getattr(writer, name))
+            ).Else(
+                getattr(self, name).eq(signal)
+            )
+
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            If(self.start,
+                NextValue(self.done, 0),
+                NextValue(self.error, SD_LOGGER_ERROR_NONE),
+                NextValue(self.r1, 0xFF),
+                NextValue(polls, writer.busy_timeout),
+                NextState("READY")
+            )
+        )
+        fsm.act("READY",
+            master["data_wr_8"].eq(0xFF),
+            If(self.ready,
+                master["start8bits"].eq(1),
+                NextValue(polls, polls - 1),
+                NextState("READY_WAIT")
+            )
+        )
+        fsm.act("READY_WAIT",
+            If(self.ready,
+                If(received == 0xFF,
+                    NextState("COMMAND")
+                ).Elif(polls == 0,
+                    NextValue(self.error, SD_LOGGER_ERROR_NOT_READY),
+                    NextState("DONE")
+                ).Else(
+                    NextState("READY")
+                )
+            )
+        )
+        # 0x40 | CMD25, the address MSB first, a dummy CRC and the end bit
+        fsm.act("COMMAND",
+            master["data_wr_32"].eq(Cat(self.address[8:], C(0x40 | CMD25, 8))),
+            If(self.ready,
+                master["start32bits"].eq(1),
+                NextState("COMMAND_WAIT")
+            )
+        )
+        fsm.act("COMMAND_WAIT",
+            If(self.ready, NextState("ARGUMENT"))
+        )
+        fsm.act("ARGUMENT",
+            master["data_wr_16"].eq(Cat(C(0x01, 8), self.address[:8])),
+            If(self.ready,
+                master["start16bits"].eq(1),
+                NextValue(polls, max_response_bytes),
+                NextState("ARGUMENT_WAIT")
+            )
+        )
+        fsm.act("ARGUMENT_WAIT",
+            If(self.ready, NextState("R1"))
+        )
+        fsm.act("R1",
+            master["data_wr_8"].eq(0xFF),
+            If(self.ready,
+                master["start8bits"].eq(1),
+                NextValue(polls, polls - 1),
+                NextState("R1_WAIT")
+            )
+        )
+        fsm.act("R1_WAIT",
+            If(self.ready,
+                If(received[7] == 0,
+                    NextValue(self.r1, received),
+                    If(received == 0,
+                        NextState("WRITE")
+                    ).Else(
+                        NextValue(self.error, SD_LOGGER_ERROR_COMMAND),
+                        NextState("DONE")
+                    )
+                ).Elif(polls == 0,
+                    NextValue(self.error, SD_LOGGER_ERROR_COMMAND),
+                    NextState("DONE")
+                ).Else(
+                    NextState("R1")
+                )
+            )
+        )
+        fsm.act("WRITE",
+            writer.start.eq(1),
+            NextState("WRITING")
+        )
+        fsm.act("WRITING",
+            If(~writer.active,
+                If(writer.error != 0,
+                    NextValue(self.error, SD_LOGGER_ERROR_WRITE),
+                    NextState("DONE")
+                ).Else(
+                    NextState("STOP")
+                )
+            )
+        )
+        # the stop token then a stuff byte before the card is busy
+        fsm.act("STOP",
+            master["data_wr_16"].eq((STOP_TRAN_TOKEN << 8) | 0xFF),
+            If(self.ready,
+                master["start16bits"].eq(1),
+                NextValue(polls, writer.busy_timeout),
+                NextState("STOP_WAIT")
+            )
+        )
+        fsm.act("STOP_WAIT",
+            If(self.ready, NextState("BUSY"))
+        )
+        fsm.act("BUSY",
+            master["data_wr_8"].eq(0xFF),
+            If(self.ready,
+                master["start8bits"].eq(1),
+                NextValue(polls, polls - 1),
+                NextState("BUSY_WAIT")
+            )
+        )
+        fsm.act("BUSY_WAIT",
+            If(self.ready,
+                If(received == 0xFF,
+                    NextState("DONE")
+                ).Elif(polls == 0,
+                    NextValue(self.error, SD_LOGGER_ERROR_NOT_READY),
+                    NextState("DONE")
+                ).Else(
+                    NextState("BUSY")
+                )
+            )
+        )
+        fsm.act("DONE",
+            NextValue(self.done, 1),
+            NextState("IDLE")
+        )
+        self.comb += self.active.eq(~fsm.ongoing("IDLE"))
+        self.sync += [
+            If(self.start & ~self.active,
+                capturing.eq(1),
+                stopping.eq(0)
+            ).Elif(self.stop & self.active,
+                capturing.eq(0),
+                stopping.eq(1)
+            ).Elif(~self.active | fsm.ongoing("STOP"),
+                capturing.eq(0)
+            ),
+        ]
+
+    def add_csr(self):
+        self._control = CSRStorage(fields=[
+            CSRField("start", size=1, pulse=True, description="Starts capturing and writing blocks from ``address``."),
+            CSRField("stop", size=1, pulse=True, description="Stops capturing, the captured words are still written."),
+        ], name="control")
+        self._address = CSRStorage(32, name="address",
+            description="CMD25 argument, first block for SDHC/SDXC cards, byte address for SDSC ones.")
+        self._blocks = CSRStorage(32, reset=2**32 - 1, name="count",
+            description="Blocks written at most.")
+        self._status = CSRStatus(fields=[
+            CSRField("active", size=1, description="Logging."),
+            CSRField("done", size=1, description="Last start finished."),
+            CSRField("error", size=2, description="0: none, 1: card busy, 2: CMD25 failed, 3: block write failed."),
+            CSRField("write_error", size=2, description="Block write error, as the SDBlockWriter one."),
+            CSRField("r1", size=8, offset=8, description="CMD25 response."),
+            CSRField("response", size=8, offset=16, description="Last data response token."),
+        ], name="status")
+        self._written = CSRStatus(32, name="written",
+            description="Blocks written since the last start.")
+        self._dropped = CSRStatus(32, name="dropped",
+            description="Words lost since the last start, the FIFO was full, saturates.")
+        self._level = CSRStatus(32, name="level",
+            description="Words waiting in the FIFO.")
+        self.comb += [
+            self.start.eq(self._control.fields.start),
+            self.stop.eq(self._control.fields.stop),
+            self.address.eq(self._address.storage),
+            self.blocks.eq(self._blocks.storage),
+            self._status.fields.active.eq(self.active),
+            self._status.fields.done.eq(self.done),
+            self._status.fields.error.eq(self.error),
+            self._status.fields.write_error.eq(self.writer.error),
+            self._status.fields.r1.eq(self.r1),
+            self._status.fields.response.eq(self.writer.response),
+            self._written.status.eq(self.written),
+            self._dropped.status.eq(self.dropped),
+            self._level.status.eq(self.level),
+        ]
+
+
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    convert(SDLogger(fifo_depth=512, busy_timeout=64)).write("SDLogger.v")
@@ -5,13 +5,16 @@ from migen.genlib.resetsync import AsyncResetSynchronizer
 from litex.gen import *
 
 
-from litex.soc.cores.dma import WishboneDMAWriter
+from litex.soc.cores.dma import WishboneDMAReader, WishboneDMAWriter
 from litex.soc.cores.clock import *
 from litex.soc.interconnect.csr import CSRStorage, CSRStatus, CSRField, CSR, AutoCSR
 from litex.soc.interconnect.csr import bits_for
 from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
 
 from fusion_rtl.clk import Counter
+from fusion_rtl.sdcard.block_writer import SDBlockWriter
+from fusion_rtl.sdcard.logger import SDLogger
 
 class _SERDES_WITH_CLK_DIV(LiteXModule):
     def __init__(self):
@@ -284,7 +287,50 @@ class SPI(LiteXModule):
                 self.cs.eq(self._spi.cs),
             ).Else(self.cs.eq(self.control_csr.fields.cs_value)),
         ]
-        
+
+    def add_block_writer(self, soc=None, fifo_depth=16):
+        """
+        Adds an SDBlockWriter, it takes over the SPI master and holds CS low
+        while it writes blocks. With a ``soc`` it is fed by a
+        WishboneDMAReader reading the blocks from memory, else by
+        ``block_writer.sink``.
+        """
+        self.block_writer = block_writer = SDBlockWriter()
+        block_writer.add_csr()
+        self._take_over_master(block_writer)
+        if soc is not None:
+            bus = wishbone.Interface(data_width=soc.bus.data_width, address_width=soc.bus.address_width, addressing='word')
+            self.block_dma = WishboneDMAReader(bus=bus, endianness=soc.cpu.endianness, fifo_depth=fifo_depth, with_csr=True)
+            dma_bus = getattr(soc, "dma_bus", soc.bus)
+            dma_bus.add_master(master=bus)
+            self.comb += self.block_dma.source.connect(block_writer.sink)
+
+    def add_sd_logger(self, fifo_depth=4096, endianness="little"):
+        """
+        Adds an SDLogger writing ``sd_logger.sink`` to the card, it takes
+        over the SPI master and holds CS low while it logs.
+        """
+        self.sd_logger = sd_logger = SDLogger(fifo_depth=fifo_depth, endianness=endianness)
+        sd_logger.add_csr()
+        self._take_over_master(sd_logger)
+
+    def _take_over_master(self, engine):
+        # later assignments win, the engine drives the master while active
+        self.comb += [
+            engine.ready.eq(self._spi.ready),
+            engine.data_rd.eq(self._spi.data_rd),
+            If(engine.active,
+                self._spi.start8bits.eq(engine.start8bits),
+                self._spi.data_wr_8.eq(engine.data_wr_8),
+                self._spi.start16bits.eq(engine.start16bits),
+                self._spi.data_wr_16.eq(engine.data_wr_16),
+                self._spi.start32bits.eq(engine.start32bits),
+                self._spi.data_wr_32.eq(engine.data_wr_32),
+                self.cs.eq(0),
+            ),
+        ]
+
+
         
 if __name__ == "__main__":
     import argparse
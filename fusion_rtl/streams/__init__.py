@@ -1,11 +1,13 @@
-from migen import Signal, If
+from migen import Signal, If, bits_for
 from migen.fhdl.structure import Cat
 from migen.genlib.fsm import FSM, NextState, NextValue
 from litex.gen import LiteXModule
 
 from litex.soc.cores.clock import *
-from litex.soc.interconnect.csr import CSRStatus, AutoCSR, CSR
+from litex.soc.interconnect.csr import CSRStatus, CSRStorage, AutoCSR, CSR
+from litex.soc.interconnect.csr_eventmanager import EventManager, EventSourceLevel
 from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
 
 
 
@@ -60,6 +62,66 @@ class Stream2CSR(LiteXModule, AutoCSR):
 
 
 
+class Stream2Wishbone(LiteXModule, AutoCSR):
+    """
+    FIFO read through a Wishbone window, every read anywhere in the window
+    pops one word, so the CPU can memcpy ``level`` words at once. Reads of an
+    empty FIFO return 0. A word is popped when it is acked, a burst the
+    master ends early does not lose one. Incrementing bursts are acked one word per clock,
+    classic cycles every other clock.
+
+    The ``watermark`` event stays pending while the FIFO holds at least
+    ``watermark`` words.
+
+    :param stream_in: Stream to read, its payload is packed from the LSB of
+        the data bus.
+    :param with_irq: Add the EventManager, a parent module can use
+        ``above_watermark`` in its own instead.
+    """
+    def __init__(self, stream_in, fifo_depth=512, data_width=32, watermark=None, with_irq=True):
+        payload_layout = stream_in.description.payload_layout
+        payload_width = sum(width for _, width in payload_layout)
+        assert payload_width <= data_width, f"Data width must be <= {data_width} bits"
+        watermark = fifo_depth // 2 if watermark is None else watermark
+
+        self.bus = bus = wishbone.Interface(data_width=data_width, address_width=32, addressing="word")
+        self.above_watermark = Signal()
+
+        self._level = CSRStatus(bits_for(fifo_depth), description="Words in the FIFO.")
+        self._watermark = CSRStorage(bits_for(fifo_depth), reset=watermark,
+            description="FIFO level raising the watermark event.")
+
+        self.submodules.fifo = fifo = stream.SyncFIFO(payload_layout, fifo_depth, buffered=True)
+        self.comb += [
+            stream_in.connect(fifo.sink),
+            self._level.status.eq(fifo.level),
+            self.above_watermark.eq(fifo.level >= self._watermark.storage),
+        ]
+
+        # registered feedback, the next beat of an incrementing burst is
+        # acked right after the current one. The word is only popped with
+        # the ack the master takes, a burst ended while acked as incrementing
+        # loses nothing, the unclaimed ack pops nothing.
+        read = Signal()
+        self.comb += [
+            read.eq(bus.cyc & bus.stb & (~bus.ack | (bus.cti == 0b010))),
+            fifo.source.ready.eq(bus.cyc & bus.stb & bus.ack & ~bus.we),
+            If(fifo.source.valid,
+                bus.dat_r.eq(Cat(*[getattr(fifo.source, name) for name, _ in payload_layout]))
+            ).Else(
+                bus.dat_r.eq(0)
+            )
+        ]
+        self.sync += bus.ack.eq(read)
+
+        if with_irq:
+            self.ev = EventManager()
+            self.ev.watermark = EventSourceLevel(description="FIFO level at or above the watermark.")
+            self.ev.finalize()
+            self.comb += self.ev.watermark.trigger.eq(self.above_watermark)
+
+
+
 class TestStreamCounter(LiteXModule, AutoCSR):
     def __init__(self):
         self.source = stream.Endpoint([("data", 32)])
@@ -81,3 +143,8 @@ class TestStreamCounter(LiteXModule, AutoCSR):
         
 
 
+if __name__ == "__main__":
+    from migen.fhdl.verilog import convert
+
+    source = stream.Endpoint([("data", 32)])
+    convert(Stream2Wishbone(source, fifo_depth=16)).write("Stream2Wishbone.v")
@@ -0,0 +1,96 @@
+from random import random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+# as generated by python -m fusion_rtl.adc.ADC
+BASE = 0x1000
+WORDS = 24
+
+
+def swap_bytes(word):
+    return int.from_bytes(word.to_bytes(4, "little"), "big")
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.pads_miso_a.value = 0
+    dut.pads_miso_b.value = 0
+    dut.pads_ready_strobe.value = 0
+    dut.bus_ack.value = 0
+    dut.csrfield_enable.value = 0
+    dut.dma_test_storage.value = 0
+    dut.dma_base_storage.value = BASE
+    dut.dma_length_storage.value = 4 * WORDS
+    dut.dma_loop_storage.value = 1
+    dut.dma_enable_storage.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await FallingEdge(dut.sys_clk)
+    dut.dma_enable_storage.value = 1
+    await FallingEdge(dut.sys_clk)
+
+
+@cocotb.test()
+async def test_ring_events(dut):
+    # the counter of dma_test, half and full fire with the last word of each half
+    seed(5)
+    await reset(dut)
+    dut.dma_test_storage.value = 1
+    beats = []
+    for _ in range(600):
+        await FallingEdge(dut.sys_clk)
+        dut.bus_ack.value = int(random() < 0.6)
+        await ReadOnly()
+        if dut.bus_stb.value == 1 and dut.bus_ack.value == 1:
+            beats.append(
+                (
+                    int(dut.bus_adr.value),
+                    swap_bytes(int(dut.bus_dat_w.value)),
+                    int(dut.half_trigger.value),
+                    int(dut.full_trigger.value),
+                )
+            )
+        else:
+            assert dut.half_trigger.value == 0
+            assert dut.full_trigger.value == 0
+    assert len(beats) > 10 * WORDS
+    for index, (address, data, half, full) in enumerate(beats):
+        assert data == index
+        assert address == BASE // 4 + index % WORDS
+        assert half == (index % WORDS == WORDS // 2 - 1)
+        assert full == (index % WORDS == WORDS - 1)
+
+
+@cocotb.test()
+async def test_overflows(dut):
+    # nothing is acked, once the FIFOs are full every conversion is lost
+    await reset(dut)
+    dut.csrfield_enable.value = 1
+    for _ in range(1500):
+        await FallingEdge(dut.sys_clk)
+    start = int(dut.overflows_status.value)
+    assert start > 0
+    conversions = 0
+    conv_st = 0
+    for _ in range(1000):
+        await FallingEdge(dut.sys_clk)
+        if dut.pads_conv_st.value == 1 and conv_st == 0:
+            conversions += 1
+        conv_st = int(dut.pads_conv_st.value)
+    assert conversions > 0
+    assert abs(int(dut.overflows_status.value) - start - conversions) <= 1
+
+    # cleared when enabled again, no more losses once the DMA writes
+    dut.csrfield_enable.value = 0
+    for _ in range(5):
+        await FallingEdge(dut.sys_clk)
+    dut.csrfield_enable.value = 1
+    dut.bus_ack.value = 1
+    for _ in range(2):
+        await FallingEdge(dut.sys_clk)
+    assert dut.overflows_status.value == 0
+    for _ in range(2000):
+        await FallingEdge(dut.sys_clk)
+    assert dut.overflows_status.value == 0
@@ -0,0 +1,121 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.acquisition_pipeline import AcquisitionPipeline
+
+# as generated by python -m fusion_rtl.acquisition_pipeline
+FIR_TAPS = 7
+SMP_CLK_DIV = 64
+ACCESS_CLOCKS = 4
+# last address of the 4 address bits
+LEVEL_ADDRESS = 15
+WATERMARK = 32
+
+
+async def reset(dut):
+    dut.nor_if_ne.value = 1
+    dut.nor_if_noe.value = 1
+    dut.nor_if_nwe.value = 1
+    dut.nor_if_nadv.value = 1
+    dut.sys_rst.value = 1
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await FallingEdge(dut.sys_clk)
+
+
+async def write_FMC(dut, address, value):
+    """Asynchronous FMC write, the register is written when NE rises."""
+    await FallingEdge(dut.sys_clk)
+    dut.nor_if_address.value = address
+    dut.nor_if_data_r.value = value
+    dut.nor_if_ne.value = 0
+    dut.nor_if_nwe.value = 0
+    for _ in range(ACCESS_CLOCKS):
+        await FallingEdge(dut.sys_clk)
+    dut.nor_if_ne.value = 1
+    dut.nor_if_nwe.value = 1
+    for _ in range(2):
+        await FallingEdge(dut.sys_clk)
+
+
+async def read_FMC(dut, address):
+    await FallingEdge(dut.sys_clk)
+    dut.nor_if_address.value = address
+    dut.nor_if_ne.value = 0
+    dut.nor_if_noe.value = 0
+    for _ in range(ACCESS_CLOCKS):
+        await FallingEdge(dut.sys_clk)
+    await ReadOnly()
+    value = int(dut.nor_if_data_w.value)
+    await FallingEdge(dut.sys_clk)
+    dut.nor_if_ne.value = 1
+    dut.nor_if_noe.value = 1
+    await FallingEdge(dut.sys_clk)
+    return value
+
+
+@cocotb.test()
+async def test_default_address_width(dut):
+    # 3 address bits leave no room for the tap registers, they are left out
+    pipeline = AcquisitionPipeline(
+        adc_count=1,
+        use_chained_fifo=False,
+        with_registers=True,
+        smp_clk_div=SMP_CLK_DIV,
+        fir_taps=FIR_TAPS,
+        fir_ratio=2,
+    )
+    assert AcquisitionPipeline.FIR_COEF_ADDRESS_ADDRESS not in pipeline.registers.registers
+    assert AcquisitionPipeline.FIR_COEF_DATA_ADDRESS not in pipeline.registers.registers
+
+
+@cocotb.test()
+async def test_registers(dut):
+    await reset(dut)
+    assert await read_FMC(dut, AcquisitionPipeline.SMP_CLK_DIV_ADDRESS) == SMP_CLK_DIV
+    await write_FMC(dut, AcquisitionPipeline.SMP_CLK_DIV_ADDRESS, 100)
+    assert dut.max_value.value == 100
+    assert await read_FMC(dut, AcquisitionPipeline.SMP_CLK_DIV_ADDRESS) == 100
+    await write_FMC(dut, AcquisitionPipeline.CHANNEL_MASK_ADDRESS, 1)
+    assert dut.channel_mask.value == 1
+    assert await read_FMC(dut, AcquisitionPipeline.CHANNEL_MASK_ADDRESS) == 1
+
+
+@cocotb.test()
+async def test_fir_taps(dut):
+    await reset(dut)
+    initial = [int(dut.coef_mem[i].value) for i in range(FIR_TAPS)]
+    taps = [0x111, 0x3FFFF, 0x222]
+    await write_FMC(dut, AcquisitionPipeline.FIR_COEF_ADDRESS_ADDRESS, 2)
+    for tap in taps:
+        await write_FMC(dut, AcquisitionPipeline.FIR_COEF_DATA_ADDRESS, tap)
+    await FallingEdge(dut.sys_clk)
+    assert [int(dut.coef_mem[i].value) for i in range(FIR_TAPS)] == (
+        initial[:2] + taps + initial[5:]
+    )
+    assert await read_FMC(dut, AcquisitionPipeline.FIR_COEF_ADDRESS_ADDRESS) == 2
+    assert await read_FMC(dut, AcquisitionPipeline.FIR_COEF_DATA_ADDRESS) == taps[-1]
+
+
+@cocotb.test()
+async def test_frames_and_status(dut):
+    await reset(dut)
+    assert await read_FMC(dut, AcquisitionPipeline.STATUS_ADDRESS) == 0
+    while await read_FMC(dut, LEVEL_ADDRESS) < 4:
+        pass
+    # two frames of a header word, 0x0FF0 and the frame counter, then the
+    # channel word
+    words = [await read_FMC(dut, 0) for _ in range(4)]
+    assert [word & 0xFFFF for word in words[::2]] == [0x0FF0, 0x0FF0]
+    assert [word >> 16 for word in words[::2]] == [0, 1]
+    while await read_FMC(dut, LEVEL_ADDRESS) < WATERMARK:
+        pass
+    # have_data
+    assert await read_FMC(dut, AcquisitionPipeline.STATUS_ADDRESS) & 1 == 1
+    # nothing is read any more, the encoder waits for room for a whole
+    # frame instead of losing samples
+    await Timer(700, units="us")
+    assert await read_FMC(dut, LEVEL_ADDRESS) == 64
+    assert await read_FMC(dut, AcquisitionPipeline.OVERFLOW_COUNT_ADDRESS) == 0
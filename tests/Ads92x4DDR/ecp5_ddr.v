@@ -0,0 +1,42 @@
+`timescale 1ns/1ps
+
+// Behavioural models of the ECP5 IO primitives used by Ads92x4DDR, enough
+// to simulate the readout: ECLK at twice SCLK and phase aligned with it,
+// slot 0 is the first one on the wire (ODDRX2F) or off it (IDDRX2F).
+
+module ODDRX2F(input D0, input D1, input D2, input D3, input ECLK,
+               input SCLK, input RST, output Q);
+    reg [3:0] hold = 4'b0;
+    always @(posedge SCLK)
+        hold <= {D3, D2, D1, D0};
+    assign Q = SCLK ? (ECLK ? hold[0] : hold[1]) : (ECLK ? hold[2] : hold[3]);
+endmodule
+
+module IDDRX2F(input D, input ECLK, input SCLK, input RST, input ALIGNWD,
+               output reg Q0, output reg Q1, output reg Q2, output reg Q3);
+    reg [3:0] shift = 4'b0;
+    always @(posedge ECLK or negedge ECLK)
+        shift <= {D, shift[3:1]};
+    always @(posedge SCLK)
+        {Q3, Q2, Q1, Q0} <= shift;
+endmodule
+
+// 25 ps per tap, as the datasheet typical value
+module DELAYF(input A, input LOADN, input MOVE, input DIRECTION,
+              output reg Z, output CFLAG);
+    parameter DEL_MODE = "USER_DEFINED";
+    parameter DEL_VALUE = 0;
+    integer tap = DEL_VALUE;
+    always @(negedge LOADN)
+        tap = DEL_VALUE;
+    always @(posedge MOVE)
+        if (LOADN) begin
+            if (DIRECTION == 0 && tap < 127)
+                tap = tap + 1;
+            else if (DIRECTION == 1 && tap > 0)
+                tap = tap - 1;
+        end
+    assign CFLAG = DIRECTION ? (tap == 0) : (tap == 127);
+    always @(A)
+        Z <= #(tap * 0.025) A;
+endmodule
@@ -0,0 +1,88 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import Edge, FallingEdge, ReadOnly, RisingEdge, Timer
+
+SYS_CLK_PERIOD = 16
+SMP_CLK_PERIOD = 400
+# SCLK to SDO, device and board
+T_DO = 3
+# as generated by the Makefile
+ADC_COUNT = 2
+
+
+def lane_values(device, index):
+    """Channel A and B words of a device, with plenty of transitions."""
+    seed = index * 0x9E37 + device * 0x7F4A
+    return (
+        (seed ^ 0xA5C3) & 0xFFFF,
+        ((seed >> 3) ^ 0x5A3C) & 0xFFFF,
+    )
+
+
+def drive(dut, values, bit):
+    miso_a, miso_b = 0, 0
+    for device, (value_cha, value_chb) in enumerate(values):
+        miso_a |= ((value_cha >> (15 - bit)) & 1) << device
+        miso_b |= ((value_chb >> (15 - bit)) & 1) << device
+    dut.pads_miso_a.value = miso_a
+    dut.pads_miso_b.value = miso_b
+
+
+async def emulate_adcs(dut):
+    """
+    Zone 2 readout of all the devices, the MSB comes out of CS and each
+    SCLK rising edge shifts the next bit T_DO later, readout N returns the
+    values of index N.
+    """
+    index = 0
+    while True:
+        await FallingEdge(dut.pads_cs)
+        values = [lane_values(device, index) for device in range(ADC_COUNT)]
+        await Timer(T_DO, units="ns")
+        drive(dut, values, 0)
+        bit = 1
+        while bit < 16:
+            await Edge(dut.pads_sclk)
+            await ReadOnly()
+            if dut.pads_sclk.value.integer:
+                await Timer(T_DO, units="ns")
+                drive(dut, values, bit)
+                bit += 1
+        index += 1
+
+
+async def collect(dut, values):
+    """Data of each readout and whether the lanes were aligned."""
+    while True:
+        await RisingEdge(dut.smp_clk_out)
+        await ReadOnly()
+        values.append((dut.data.value.integer, dut.calibrated.value.integer))
+
+
+@cocotb.test()
+async def test_ddr_readout(dut):
+    dut.pads_miso_a.value = 0
+    dut.pads_miso_b.value = 0
+    dut.smp_clk.value = 0
+    cocotb.start_soon(emulate_adcs(dut))
+    cocotb.start_soon(Clock(dut.sys_clk, SYS_CLK_PERIOD, units="ns").start())
+    cocotb.start_soon(Clock(dut.sys2x_clk, SYS_CLK_PERIOD / 2, units="ns").start())
+    dut.sys_rst.value = 1
+    dut.sys2x_rst.value = 1
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    dut.sys2x_rst.value = 0
+    values = []
+    cocotb.start_soon(collect(dut, values))
+    cocotb.start_soon(Clock(dut.smp_clk, SMP_CLK_PERIOD, units="ns").start())
+    await Timer(SMP_CLK_PERIOD * 1000, units="ns")
+
+    calibrated = [index for index, (_, locked) in enumerate(values) if locked]
+    assert len(calibrated) >= 100
+    for index in calibrated:
+        data = values[index][0]
+        for device in range(ADC_COUNT):
+            value_cha, value_chb = lane_values(device, index)
+            word = (data >> (32 * device)) & 0xFFFFFFFF
+            assert word == (value_chb << 16) | value_cha, (index, device)
+    assert dut.missed_count.value == 0
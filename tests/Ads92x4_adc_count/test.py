@@ -0,0 +1,74 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
+
+SYS_CLK_PERIOD = 16.7
+# as generated by the Makefile
+ADC_COUNT = 2
+
+
+def lane_values(device, index):
+    """Channel A and B words of a device, different on every lane."""
+    return (
+        (0x1000 * (2 * device + 1) + index) & 0xFFFF,
+        (0x1000 * (2 * device + 2) + index) & 0xFFFF,
+    )
+
+
+async def emulate_adcs(dut):
+    """
+    Zone 2 readout of all the devices, they share CS and SCLK, readout N
+    returns the values of index N.
+    """
+    index = 0
+    while True:
+        await FallingEdge(dut.pads_cs)
+        await Timer(12, units="ns")
+        values = [lane_values(device, index) for device in range(ADC_COUNT)]
+        for i in range(16):
+            miso_a, miso_b = 0, 0
+            for device, (value_cha, value_chb) in enumerate(values):
+                miso_a |= ((value_cha >> (15 - i)) & 1) << device
+                miso_b |= ((value_chb >> (15 - i)) & 1) << device
+            dut.pads_miso_a.value = miso_a
+            dut.pads_miso_b.value = miso_b
+            await RisingEdge(dut.pads_sclk)
+            await Timer(15.8, units="ns")
+        index += 1
+
+
+async def collect(dut, values):
+    """Data of each readout, the first one is the reset value."""
+    while True:
+        await RisingEdge(dut.smp_clk_out)
+        await ReadOnly()
+        values.append(dut.data.value.integer)
+
+
+@cocotb.test()
+async def test_adc_count(dut):
+    dut.pads_ready_strobe.value = 0
+    dut.smp_clk.value = 0
+    cocotb.start_soon(emulate_adcs(dut))
+    cocotb.start_soon(Clock(dut.sys_clk, SYS_CLK_PERIOD, units="ns").start())
+    dut.sys_rst.value = 1
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    values = []
+    cocotb.start_soon(collect(dut, values))
+    smp_clk_gen = cocotb.start_soon(Clock(dut.smp_clk, 666, units="ns").start())
+    await Timer(666 * 100, units="ns")
+    smp_clk_gen.kill()
+    dut.smp_clk.value = 0
+    await Timer(30 * SYS_CLK_PERIOD, units="ns")
+
+    readouts = values[1:]
+    assert len(readouts) >= 99
+    for index, data in enumerate(readouts):
+        for device in range(ADC_COUNT):
+            value_cha, value_chb = lane_values(device, index)
+            word = (data >> (32 * device)) & 0xFFFFFFFF
+            assert word == (value_chb << 16) | value_cha, (index, device)
+    # the first device is also on data_cha and data_chb
+    assert dut.data_cha.value == lane_values(0, len(readouts) - 1)[0]
+    assert dut.data_chb.value == lane_values(0, len(readouts) - 1)[1]
@@ -0,0 +1,101 @@
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
+
+from fusion_rtl.adc.ads92x4 import Ads92x4
+
+SYS_CLK_PERIOD = 16.7
+
+
+def cha_value(index):
+    return int(np.cos(2 * np.pi * index / 16) * 32765)
+
+
+def chb_value(index):
+    return index & 0xFFFF
+
+
+async def emulate_adc(dut):
+    """
+    Zone 2 readout, the result of a conversion is shifted out when CS falls
+    during the next one, readout N returns the values of index N.
+    """
+    index = 0
+    while True:
+        await FallingEdge(dut.pads_cs)
+        await Timer(12, units="ns")
+        value_cha = cha_value(index)
+        value_chb = chb_value(index)
+        for i in range(16):
+            dut.pads_miso_a.value = (value_cha >> (15 - i)) & 1
+            dut.pads_miso_b.value = (value_chb >> (15 - i)) & 1
+            await RisingEdge(dut.pads_sclk)
+            await Timer(15.8, units="ns")
+        index += 1
+
+
+async def count_edges(signal, edges):
+    while True:
+        await RisingEdge(signal)
+        edges[0] += 1
+
+
+async def collect(dut, values):
+    """Data of each readout, the first one is the reset value."""
+    while True:
+        await RisingEdge(dut.smp_clk_out)
+        await ReadOnly()
+        values.append(
+            (dut.data_cha.value.signed_integer, dut.data_chb.value.signed_integer)
+        )
+
+
+async def run(dut, smp_clk_period, count):
+    dut.pads_ready_strobe.value = 0
+    dut.smp_clk.value = 0
+    cocotb.start_soon(emulate_adc(dut))
+    cocotb.start_soon(Clock(dut.sys_clk, SYS_CLK_PERIOD, units="ns").start())
+    dut.sys_rst.value = 1
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    values = []
+    edges = [0]
+    cocotb.start_soon(collect(dut, values))
+    cocotb.start_soon(count_edges(dut.smp_clk, edges))
+    smp_clk_gen = cocotb.start_soon(
+        Clock(dut.smp_clk, smp_clk_period, units="ns").start()
+    )
+    await Timer(smp_clk_period * count, units="ns")
+    smp_clk_gen.kill()
+    dut.smp_clk.value = 0
+    # let the last readout end
+    await Timer(20 * SYS_CLK_PERIOD, units="ns")
+    return values, edges[0]
+
+
+def check_values(values):
+    readouts = values[1:]
+    assert readouts == [(cha_value(i), chb_value(i)) for i in range(len(readouts))]
+
+
+@cocotb.test()
+async def test_pipelined_readout(dut):
+    # 18 clocks per sample, 3 MSPS with a 60 MHz sys clock
+    assert Ads92x4(pipelined=True, sys_clk_freq=1e9 / SYS_CLK_PERIOD).max_throughput == 3e6
+    assert Ads92x4(pipelined=True, sys_clk_freq=50e6).max_throughput == 50e6 / 18
+    assert Ads92x4(pipelined=False, sys_clk_freq=50e6).max_throughput == 50e6 / 20
+    values, edges = await run(dut, 333, 500)
+    assert len(values) - 1 == edges
+    check_values(values)
+    assert dut.missed_count.value == 0
+
+
+@cocotb.test()
+async def test_missed_conversions(dut):
+    # smp_clk faster than a readout, the edges coming during READ are dropped
+    values, edges = await run(dut, 12 * SYS_CLK_PERIOD, 500)
+    readouts = len(values) - 1
+    assert 0 < readouts < edges
+    assert dut.missed_count.value == edges - readouts
+    check_values(values)
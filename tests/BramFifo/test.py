@@ -0,0 +1,111 @@
+from random import random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.memories.bram_fifo import BramFifo, dp16kd_geometry
+
+# as generated by bram_fifo.py
+WIDTH = 8
+DEPTH = 2**14
+
+
+async def reset(dut):
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    dut.sys_rst.value = 1
+    dut.syncfifo_we.value = 0
+    dut.re.value = 0
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+@cocotb.test()
+async def test_geometry(dut):
+    fifo = BramFifo(width=WIDTH, depth=DEPTH)
+    assert fifo.depth == DEPTH
+    assert fifo.bram_count == 8
+    # depth rounded up to what the blocks hold anyway
+    assert BramFifo(width=36, depth=100).depth == 512
+    assert BramFifo(width=8, depth=3000).depth == 4096
+    assert BramFifo(width=32, bram_count=4).depth == 2048
+
+
+@cocotb.test()
+async def test_dp16kd_geometry(dut):
+    # (block_depth, block_width, blocks_wide, blocks_deep)
+    assert dp16kd_geometry(9, depth=2048) == (2048, 9, 1, 1)
+    assert dp16kd_geometry(9, depth=4096) == (2048, 9, 1, 2)
+    assert dp16kd_geometry(18, depth=100) == (1024, 18, 1, 1)
+    # two blocks either way, the deepest arrangement wins
+    assert dp16kd_geometry(18, depth=2048) == (2048, 9, 2, 1)
+    assert dp16kd_geometry(36, depth=512) == (512, 36, 1, 1)
+    assert dp16kd_geometry(36, depth=1000) == (1024, 18, 2, 1)
+    assert dp16kd_geometry(36, bram_count=4) == (2048, 9, 4, 1)
+    assert dp16kd_geometry(18, bram_count=3) == (1024, 18, 1, 3)
+    try:
+        dp16kd_geometry(36, bram_count=0)
+    except ValueError:
+        pass
+    else:
+        assert False, "no DP16KD is not enough"
+
+
+@cocotb.test()
+async def test_full_empty(dut):
+    await reset(dut)
+    # the output register holds one word more than the memory
+    capacity = DEPTH + 1
+    written = 0
+    for _ in range(capacity + 100):
+        await FallingEdge(dut.sys_clk)
+        dut.syncfifo_we.value = 1
+        dut.syncfifo_din.value = written & 0xFF
+        await ReadOnly()
+        if dut.syncfifo_writable.value == 1:
+            written += 1
+    await FallingEdge(dut.sys_clk)
+    dut.syncfifo_we.value = 0
+    await ReadOnly()
+    assert written == capacity
+    assert dut.level0.value == capacity
+    assert dut.syncfifo_writable.value == 0
+    assert dut.readable.value == 1
+
+    read = 0
+    for _ in range(capacity + 100):
+        await FallingEdge(dut.sys_clk)
+        dut.re.value = 1
+        await ReadOnly()
+        if dut.readable.value == 1:
+            assert dut.syncfifo_dout.value == read & 0xFF
+            read += 1
+    assert read == capacity
+    assert dut.level0.value == 0
+    assert dut.readable.value == 0
+    assert dut.syncfifo_writable.value == 1
+
+
+@cocotb.test()
+async def test_level(dut):
+    seed(3)
+    await reset(dut)
+    count = 0
+    written = 0
+    read = 0
+    for _ in range(20000):
+        await FallingEdge(dut.sys_clk)
+        we = random() < 0.5
+        re = random() < 0.5
+        dut.syncfifo_we.value = int(we)
+        dut.syncfifo_din.value = written & 0xFF
+        dut.re.value = int(re)
+        await ReadOnly()
+        assert dut.level0.value == count
+        if we and dut.syncfifo_writable.value == 1:
+            count += 1
+            written += 1
+        if re and dut.readable.value == 1:
+            assert dut.syncfifo_dout.value == read & 0xFF
+            count -= 1
+            read += 1
+    assert read > 5000
@@ -0,0 +1,101 @@
+import math
+from random import randint, random, seed
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.dsp.cic import CicDecimator
+
+WIDTH = 16
+RATIO = 5
+ORDER = 3
+OUTPUT_WIDTH = 24
+FULL_WIDTH = WIDTH + ORDER * math.ceil(math.log2(RATIO))
+# the ratio is not a power of two, the inputs are scaled up by one more register
+COMPENSATION = CicDecimator(WIDTH, RATIO, ORDER, output_width=OUTPUT_WIDTH).compensation
+INTEGRATOR_WIDTH = FULL_WIDTH + WIDTH
+ROUNDING = 2 ** (INTEGRATOR_WIDTH - OUTPUT_WIDTH - 1) // RATIO**ORDER
+
+
+def cic_reference(samples):
+    """Register accurate model, every integrator and comb delays by one."""
+    samples = [0] + [sample * COMPENSATION + ROUNDING for sample in samples[:-1]]
+    mask = 2**INTEGRATOR_WIDTH - 1
+    integrators = [0] * ORDER
+    combs = [0] * ORDER
+    delays = [0] * ORDER
+    outputs = []
+    for index, sample in enumerate(samples):
+        if index % RATIO == RATIO - 1:
+            inputs = [integrators[-1]] + combs[:-1]
+            combs = [(x - d) & mask for x, d in zip(inputs, delays)]
+            delays = inputs
+            value = combs[-1] >> (INTEGRATOR_WIDTH - OUTPUT_WIDTH)
+            outputs.append(value - (value >> (OUTPUT_WIDTH - 1) << OUTPUT_WIDTH))
+        integrators = [
+            (integrators[i] + (sample if i == 0 else integrators[i - 1])) & mask
+            for i in range(ORDER)
+        ]
+    return outputs
+
+
+def to_signed(value, width):
+    return value - (value >> (width - 1) << width)
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.sink_valid.value = 0
+    dut.source_ready.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+async def run(dut, samples, ready_probability=1.0):
+    outputs = []
+    index = 0
+    while index < len(samples):
+        await FallingEdge(dut.sys_clk)
+        dut.sink_valid.value = 1
+        dut.sink_payload_data.value = samples[index] & 0xFFFF
+        dut.source_ready.value = int(random() < ready_probability)
+        await ReadOnly()
+        if dut.sink_ready.value == 1:
+            index += 1
+        if dut.source_valid.value == 1 and dut.source_ready.value == 1:
+            outputs.append(to_signed(int(dut.source_payload_data.value), OUTPUT_WIDTH))
+    await FallingEdge(dut.sys_clk)
+    dut.sink_valid.value = 0
+    return outputs
+
+
+@cocotb.test()
+async def test_one_sample_per_clock(dut):
+    seed(42)
+    await reset(dut)
+    samples = [randint(-(2**15), 2**15 - 1) for _ in range(50 * RATIO)]
+    outputs = await run(dut, samples)
+    assert outputs == cic_reference(samples)[: len(outputs)]
+    assert len(outputs) >= 50 - 1
+
+
+@cocotb.test()
+async def test_backpressure(dut):
+    seed(1)
+    await reset(dut)
+    samples = [int(30000 * math.sin(index * 0.01)) for index in range(50 * RATIO)]
+    outputs = await run(dut, samples, ready_probability=0.3)
+    assert outputs == cic_reference(samples)[: len(outputs)]
+
+
+@cocotb.test()
+async def test_dc_gain(dut):
+    # compensated, as with a power of two ratio, the mean scaled by the extra bits
+    assert COMPENSATION is not None
+    await reset(dut)
+    samples = [1000] * (20 * RATIO)
+    outputs = await run(dut, samples)
+    gain = 2 ** (OUTPUT_WIDTH - WIDTH)
+    assert np.all(np.array(outputs[ORDER + 2 :]) == 1000 * gain)
@@ -0,0 +1,90 @@
+import math
+from random import randint, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.dsp.cic import CicDecimator
+
+WIDTH = 16
+RATIO = 3
+ORDER = 1
+OUTPUT_WIDTH = WIDTH
+FULL_WIDTH = WIDTH + ORDER * math.ceil(math.log2(RATIO))
+COMPENSATION = CicDecimator(WIDTH, RATIO, ORDER, output_width=OUTPUT_WIDTH).compensation
+INTEGRATOR_WIDTH = FULL_WIDTH + WIDTH
+ROUNDING = 2 ** (INTEGRATOR_WIDTH - OUTPUT_WIDTH - 1) // RATIO**ORDER
+
+
+def to_signed(value, width):
+    return value - (value >> (width - 1) << width)
+
+
+def block_means(samples):
+    """
+    Order 1 model, the mean of each block, rounded, the compensation register
+    delays the blocks by one sample.
+    """
+    samples = [0] + [sample * COMPENSATION + ROUNDING for sample in samples[:-1]]
+    # the integrator adds one more delay
+    samples = [0] + samples[:-1]
+    outputs = []
+    for end in range(RATIO, len(samples) + 1, RATIO):
+        total = sum(samples[end - RATIO : end])
+        value = (total >> (INTEGRATOR_WIDTH - OUTPUT_WIDTH)) & (2**OUTPUT_WIDTH - 1)
+        outputs.append(to_signed(value, OUTPUT_WIDTH))
+    return outputs
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.sink_valid.value = 0
+    dut.source_ready.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+async def run(dut, samples):
+    outputs = []
+    index = 0
+    while index < len(samples):
+        await FallingEdge(dut.sys_clk)
+        dut.sink_valid.value = 1
+        dut.sink_payload_data.value = samples[index] & 0xFFFF
+        dut.source_ready.value = 1
+        await ReadOnly()
+        if dut.sink_ready.value == 1:
+            index += 1
+        if dut.source_valid.value == 1:
+            outputs.append(to_signed(int(dut.source_payload_data.value), OUTPUT_WIDTH))
+    await FallingEdge(dut.sys_clk)
+    dut.sink_valid.value = 0
+    return outputs
+
+
+@cocotb.test()
+async def test_dc_mean(dut):
+    # a ratio of 3 has a gain of 3/4 without compensation
+    assert COMPENSATION is not None
+    await reset(dut)
+    for value in (1000, -1234, 2**15 - 1, -(2**15)):
+        dut.sys_rst.value = 1
+        await Timer(100, units="ns")
+        dut.sys_rst.value = 0
+        outputs = await run(dut, [value] * (10 * RATIO))
+        assert outputs[1:] == [value] * len(outputs[1:])
+
+
+@cocotb.test()
+async def test_block_means(dut):
+    seed(3)
+    await reset(dut)
+    samples = [randint(-(2**15), 2**15 - 1) for _ in range(50 * RATIO)]
+    outputs = await run(dut, samples)
+    expected = block_means(samples)
+    assert len(outputs) >= 50 - 1
+    assert outputs == expected[: len(outputs)]
+    for block in range(1, len(outputs)):
+        mean = sum(samples[block * RATIO - 2 : block * RATIO + 1]) / RATIO
+        assert abs(outputs[block] - mean) <= 1
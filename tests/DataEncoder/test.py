@@ -1,24 +1,65 @@
-import math
-import os
-from random import getrandbits, randint
-import numpy as np
 import cocotb
-from cocotb.binary import BinaryValue
 from cocotb.clock import Clock
-from cocotb.regression import TestFactory
-from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
-from cocotb.types import LogicArray
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
 
+from fusion_rtl.com.data_encoder import DataEncoder
 
-@cocotb.test()
-async def test_DataEncoder(dut):
-    clk = Clock(dut.sys_clk, 10, units="ns")
-    clk_gen = cocotb.fork(clk.start())
-    smp_clk = Clock(dut.dataencoder_smp_clk, 100, units="ns")
-    smp_clk_gen = cocotb.fork(smp_clk.start())
+SAMPLES_PER_FRAME = 3
+SMP_CLK_PERIOD = 40
+
+
+async def reset(dut):
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
     dut.sys_rst.value = 1
+    dut.smp_clk0.value = 0
+    dut.fifo_has_enough_space.value = 1
     await Timer(100, units="ns")
     dut.sys_rst.value = 0
-    dut.dataencoder_data_cha.value = 0x1234
-    dut.dataencoder_data_chb.value = 0x5678
+
+
+@cocotb.test()
+async def test_DataEncoder(dut):
+    await reset(dut)
+    smp_clk = Clock(dut.smp_clk0, 100, units="ns")
+    smp_clk_gen = cocotb.start_soon(smp_clk.start())
+    dut.acd_data0.value = 0x1234
+    dut.acd_data1.value = 0x5678
     await Timer(100, units="us")
+    smp_clk_gen.kill()
+
+
+@cocotb.test()
+async def test_samples_per_frame(dut):
+    await reset(dut)
+    frames = 4
+    out = []
+    sample = 0
+    for clock in range(SMP_CLK_PERIOD * SAMPLES_PER_FRAME * frames + SMP_CLK_PERIOD):
+        await FallingEdge(dut.sys_clk)
+        phase = clock % SMP_CLK_PERIOD
+        # the samples change while smp_clk is low, before its rising edge
+        if phase == 3 * SMP_CLK_PERIOD // 4:
+            dut.acd_data0.value = 0x1100 + sample
+            dut.acd_data1.value = 0x2200 + sample
+            sample += 1
+        dut.smp_clk0.value = int(phase < SMP_CLK_PERIOD // 2 and clock >= SMP_CLK_PERIOD)
+        await ReadOnly()
+        if dut.fifo_we.value == 1:
+            out.append(int(dut.fifo_din.value))
+
+    frame_size = DataEncoder(samples_per_frame=SAMPLES_PER_FRAME).frame_size
+    assert frame_size == 4 + 4 * SAMPLES_PER_FRAME
+    assert len(out) >= frames * frame_size
+    for n in range(frames):
+        frame = out[n * frame_size:(n + 1) * frame_size]
+        counter = frame[2] | frame[3] << 8
+        assert frame[:2] == [0xF0, 0x0F]
+        # the counter counts sample sets, it steps by samples_per_frame
+        if n:
+            assert counter == previous + SAMPLES_PER_FRAME
+            assert frame[4] == first + SAMPLES_PER_FRAME
+        previous, first = counter, frame[4]
+        for k in range(SAMPLES_PER_FRAME):
+            index = frame[4 + 4 * k]
+            assert frame[4 + 4 * k:8 + 4 * k] == [index, 0x11, index, 0x22]
+            assert index == frame[4] + k
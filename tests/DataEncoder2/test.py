@@ -0,0 +1,68 @@
+from random import getrandbits, random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.com.data_encoder import DataEncoder2
+
+INPUTS = 4
+SAMPLES_PER_FRAME = 3
+
+
+def reference(sample_sets, frames):
+    """Bytes of ``frames`` frames, the header counter counts the sample sets."""
+    out = []
+    for n in range(frames):
+        counter = n * SAMPLES_PER_FRAME
+        out += [0xF0, 0x0F, counter & 0xFF, counter >> 8]
+        for sample_set in sample_sets[n * SAMPLES_PER_FRAME:(n + 1) * SAMPLES_PER_FRAME]:
+            for sample in sample_set:
+                out += [sample & 0xFF, sample >> 8]
+    return out
+
+
+async def run(dut, sample_sets, cycles, arrival_probability):
+    """Plays a first word fall through FIFO filled at random, returns the bytes pushed."""
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    dut.sys_rst.value = 1
+    dut.adc_data_readable.value = 0
+    dut.fifo_has_enough_space.value = 1
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    pending = list(sample_sets)
+    fifo = []
+    out = []
+    for _ in range(cycles):
+        await FallingEdge(dut.sys_clk)
+        if pending and random() < arrival_probability:
+            fifo.append(pending.pop(0))
+        dut.adc_data_readable.value = int(bool(fifo))
+        for i in range(INPUTS):
+            getattr(dut, f"acd_data{i}").value = fifo[0][i] if fifo else 0
+        await ReadOnly()
+        if dut.fifo_we.value == 1:
+            out.append(int(dut.fifo_din.value))
+        if dut.adc_data_re.value == 1:
+            assert fifo, "read from an empty FIFO"
+            fifo.pop(0)
+    return out
+
+
+@cocotb.test()
+async def test_samples_per_frame(dut):
+    seed(5)
+    sample_sets = [[getrandbits(16) for _ in range(INPUTS)] for _ in range(8 * SAMPLES_PER_FRAME)]
+    out = await run(dut, sample_sets, 2000, 1.0)
+    frame_size = DataEncoder2(INPUTS, samples_per_frame=SAMPLES_PER_FRAME).frame_size
+    assert frame_size == 4 + 2 * INPUTS * SAMPLES_PER_FRAME
+    assert len(out) == 8 * frame_size
+    assert out == reference(sample_sets, 8)
+
+
+@cocotb.test()
+async def test_samples_per_frame_sparse(dut):
+    # sample sets trickle in, the encoder waits for them between the frame bytes
+    seed(6)
+    sample_sets = [[getrandbits(16) for _ in range(INPUTS)] for _ in range(6 * SAMPLES_PER_FRAME)]
+    out = await run(dut, sample_sets, 4000, 0.05)
+    assert out == reference(sample_sets, 6)
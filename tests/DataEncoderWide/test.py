@@ -0,0 +1,119 @@
+import os
+from random import getrandbits, random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.com.data_encoder import DataEncoderWide
+
+INPUTS = 4
+SAMPLES_PER_FRAME = 3
+# set by the Makefile, the width the encoder was generated with
+DATA_WIDTH = int(os.environ.get("DATA_WIDTH", 32))
+
+
+def reference(sample_sets, frames):
+    """The DataEncoder2 byte stream of ``frames`` frames."""
+    out = []
+    for n in range(frames):
+        counter = n * SAMPLES_PER_FRAME
+        frame = [0xF0, 0x0F, counter & 0xFF, counter >> 8]
+        for sample_set in sample_sets[n * SAMPLES_PER_FRAME:(n + 1) * SAMPLES_PER_FRAME]:
+            for sample in sample_set:
+                frame += [sample & 0xFF, sample >> 8]
+        out.append(frame)
+    return out
+
+
+async def run(dut, sample_sets, cycles, arrival_probability):
+    """Plays a first word fall through FIFO filled at random, returns the words pushed."""
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    dut.sys_rst.value = 1
+    dut.adc_data_readable.value = 0
+    dut.fifo_has_enough_space.value = 1
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    pending = list(sample_sets)
+    fifo = []
+    words = []
+    for _ in range(cycles):
+        await FallingEdge(dut.sys_clk)
+        if pending and random() < arrival_probability:
+            fifo.append(pending.pop(0))
+        dut.adc_data_readable.value = int(bool(fifo))
+        for i in range(INPUTS):
+            getattr(dut, f"acd_data{i}").value = fifo[0][i] if fifo else 0
+        await ReadOnly()
+        if dut.fifo_we.value == 1:
+            words.append(int(dut.fifo_din.value))
+        if dut.adc_data_re.value == 1:
+            assert fifo, "read from an empty FIFO"
+            fifo.pop(0)
+    return words
+
+
+def check(dut, sample_sets, words, frames):
+    width = len(dut.fifo_din)
+    assert width == DATA_WIDTH
+    bytes_per_word = width // 8
+    encoder = DataEncoderWide(INPUTS, data_width=width, samples_per_frame=SAMPLES_PER_FRAME)
+    frame_words = encoder.frame_size
+    frame_bytes = 4 + 2 * INPUTS * SAMPLES_PER_FRAME
+    assert frame_words == -(-frame_bytes // bytes_per_word)
+    # the header of the next frame is pushed without waiting for its samples
+    assert len(words) >= frames * frame_words
+    for n, expected in enumerate(reference(sample_sets, frames)):
+        # first byte in the LSBs, the frame padded with zeros to whole words
+        data = b"".join(
+            word.to_bytes(bytes_per_word, "little")
+            for word in words[n * frame_words:(n + 1) * frame_words]
+        )
+        assert list(data[:frame_bytes]) == expected
+        assert not any(data[frame_bytes:])
+
+
+@cocotb.test()
+async def test_samples_per_frame(dut):
+    seed(5)
+    sample_sets = [[getrandbits(16) for _ in range(INPUTS)] for _ in range(8 * SAMPLES_PER_FRAME)]
+    words = await run(dut, sample_sets, 1000, 1.0)
+    check(dut, sample_sets, words, 8)
+
+
+@cocotb.test()
+async def test_samples_per_frame_sparse(dut):
+    seed(6)
+    sample_sets = [[getrandbits(16) for _ in range(INPUTS)] for _ in range(6 * SAMPLES_PER_FRAME)]
+    words = await run(dut, sample_sets, 4000, 0.05)
+    check(dut, sample_sets, words, 6)
+
+
+@cocotb.test()
+async def test_one_word_per_clock(dut):
+    # with the sample sets waiting, frames follow each other without idle clock
+    seed(7)
+    sample_sets = [[getrandbits(16) for _ in range(INPUTS)] for _ in range(4 * SAMPLES_PER_FRAME)]
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    dut.sys_rst.value = 1
+    dut.fifo_has_enough_space.value = 1
+    dut.adc_data_readable.value = 0
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    fifo = list(sample_sets)
+    pushes = []
+    for clock in range(200):
+        await FallingEdge(dut.sys_clk)
+        dut.adc_data_readable.value = int(bool(fifo))
+        for i in range(INPUTS):
+            getattr(dut, f"acd_data{i}").value = fifo[0][i] if fifo else 0
+        await ReadOnly()
+        if dut.fifo_we.value == 1:
+            pushes.append(clock)
+        if dut.adc_data_re.value == 1:
+            fifo.pop(0)
+    width = len(dut.fifo_din)
+    frame_words = DataEncoderWide(INPUTS, data_width=width, samples_per_frame=SAMPLES_PER_FRAME).frame_size
+    # the header of the next frame does not wait for its samples
+    pushes = pushes[:4 * frame_words]
+    assert len(pushes) == 4 * frame_words
+    assert pushes[-1] - pushes[0] + 1 == len(pushes)
@@ -0,0 +1,94 @@
+import math
+from random import randint, random, seed
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.dsp import biquad_model
+
+CHANNELS = 4
+COEFFICIENTS = biquad_model.quantize(
+    biquad_model.scale_sections(biquad_model.PRESETS["lowpass_0.05"])
+)
+
+
+def to_signed(value, width=16):
+    return value - (value >> (width - 1) << width)
+
+
+def pack(channels):
+    word = 0
+    for index, value in enumerate(channels):
+        word |= (int(value) & 0xFFFF) << (16 * index)
+    return word
+
+
+def unpack(word):
+    return [to_signed((word >> (16 * index)) & 0xFFFF) for index in range(CHANNELS)]
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.sink_valid.value = 0
+    dut.source_ready.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+async def run(dut, samples, ready_probability=1.0):
+    """``samples`` is a list of per channel sample lists."""
+    length = len(samples[0])
+    outputs = []
+    index = 0
+    while len(outputs) < length:
+        await FallingEdge(dut.sys_clk)
+        dut.sink_valid.value = int(index < length)
+        dut.sink_payload_data.value = pack(
+            channel[min(index, length - 1)] for channel in samples
+        )
+        dut.source_ready.value = int(random() < ready_probability)
+        await ReadOnly()
+        if dut.sink_valid.value == 1 and dut.sink_ready.value == 1:
+            index += 1
+        if dut.source_valid.value == 1 and dut.source_ready.value == 1:
+            outputs.append(unpack(int(dut.source_payload_data.value)))
+    await FallingEdge(dut.sys_clk)
+    dut.sink_valid.value = 0
+    return np.array(outputs).T
+
+
+@cocotb.test()
+async def test_bit_exact(dut):
+    seed(42)
+    await reset(dut)
+    samples = [
+        [
+            int(25000 * math.sin(index * 0.01 * (channel + 1) * 2 * math.pi))
+            + randint(-5000, 5000)
+            for index in range(200)
+        ]
+        for channel in range(CHANNELS)
+    ]
+    outputs = await run(dut, samples)
+    for channel in range(CHANNELS):
+        assert np.array_equal(
+            outputs[channel],
+            biquad_model.biquad_cascade(samples[channel], COEFFICIENTS),
+        )
+
+
+@cocotb.test()
+async def test_backpressure(dut):
+    seed(1)
+    await reset(dut)
+    samples = [
+        [randint(-(2**15), 2**15 - 1) for _ in range(100)] for _ in range(CHANNELS)
+    ]
+    outputs = await run(dut, samples, ready_probability=0.3)
+    for channel in range(CHANNELS):
+        assert np.array_equal(
+            outputs[channel],
+            biquad_model.biquad_cascade(samples[channel], COEFFICIENTS),
+        )
@@ -0,0 +1,71 @@
+import random
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
+
+
+async def write_FIFO(dut, count):
+    value = 0
+    while count:
+        await FallingEdge(dut.sys_clk)
+        if dut.fifo_writable.value == 0:
+            dut.fifo_we.value = 0
+            continue
+        dut.fifo_din.value = value & 0xFF
+        dut.fifo_we.value = 1
+        value += 1
+        count -= 1
+    await FallingEdge(dut.sys_clk)
+    dut.fifo_we.value = 0
+
+
+async def ftdi_sync_fifo(dut, count, txe_busy=0.0):
+    """
+    FT2232H sync FIFO model, a byte is taken on each CLKOUT rising edge where
+    TXE# and WR# are low, TXE# changes right after the rising edge.
+    """
+    values = []
+    clocks = 0
+    dut.txf.value = 0
+    while len(values) < count:
+        await RisingEdge(dut.ftdi_clk)
+        await ReadOnly()
+        clocks += 1
+        if dut.wr.value == 0 and dut.txf.value == 0:
+            values.append(int(dut.data_w.value))
+        await Timer(1, units="ns")
+        dut.txf.value = int(random.random() < txe_busy)
+    await RisingEdge(dut.ftdi_clk)
+    dut.txf.value = 1
+    return values, clocks
+
+
+async def reset(dut):
+    dut.txf.value = 1
+    dut.fifo_we.value = 0
+    dut.sys_rst.value = 1
+    dut.ftdi_rst.value = 1
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    cocotb.start_soon(Clock(dut.ftdi_clk, 16, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    dut.ftdi_rst.value = 0
+
+
+@cocotb.test()
+async def test_one_byte_per_clock(dut):
+    await reset(dut)
+    await write_FIFO(dut, 1024)
+    values, clocks = await ftdi_sync_fifo(dut, 1024)
+    assert np.all(np.array(values) == np.arange(1024) % 256)
+    # a few clocks to prime the output register, then one byte per clock
+    assert clocks <= 1024 + 8
+
+
+@cocotb.test()
+async def test_txe_backpressure(dut):
+    await reset(dut)
+    cocotb.start_soon(write_FIFO(dut, 2048))
+    values, clocks = await ftdi_sync_fifo(dut, 2048, txe_busy=0.3)
+    assert np.all(np.array(values) == np.arange(2048) % 256)
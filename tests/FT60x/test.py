@@ -0,0 +1,108 @@
+import random
+import numpy as np
+import cocotb
+from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
+from cocotb.clock import Clock
+
+DATA_WIDTH = 32
+SYS_CLK_PERIOD = 16
+FT60X_CLK_PERIOD = 10
+BE_ALL = 2 ** (DATA_WIDTH // 8) - 1
+
+
+async def write_FIFO(dut, count, last_be=BE_ALL):
+    value = 0
+    while count:
+        await FallingEdge(dut.sys_clk)
+        if dut.fifo_writable.value == 0:
+            dut.fifo_we.value = 0
+            continue
+        dut.fifo_din.value = value
+        dut.fifo_be.value = last_be if count == 1 else BE_ALL
+        dut.fifo_we.value = 1
+        value += 1
+        count -= 1
+    await FallingEdge(dut.sys_clk)
+    dut.fifo_we.value = 0
+    dut.fifo_be.value = BE_ALL
+
+
+class FT60xModel:
+    """
+    FT60x 245 synchronous FIFO mode, host to device direction unused. A word
+    is taken on each CLK rising edge where TXE_N and WR_N are low, only the
+    bytes with BE set are kept. TXE_N changes right after the rising edge,
+    ``txe_busy`` is the probability of the FT60x being full on a clock.
+    """
+    def __init__(self, dut, txe_busy=0.0):
+        self.dut = dut
+        self.txe_busy = txe_busy
+        self.words = []
+        self.bytes = bytearray()
+        self.clocks = 0
+
+    async def run(self, count):
+        dut = self.dut
+        dut.txf.value = 0
+        while len(self.words) < count:
+            await RisingEdge(dut.ft60x_clk)
+            await ReadOnly()
+            self.clocks += 1
+            if dut.wr.value == 0 and dut.txf.value == 0:
+                assert dut.oe.value == 1, "bus contention, OE_N is low"
+                data, be = int(dut.data_w.value), int(dut.be_w.value)
+                self.words.append((data, be))
+                for i in range(DATA_WIDTH // 8):
+                    if be & (1 << i):
+                        self.bytes.append((data >> (8 * i)) & 0xFF)
+            await Timer(1, units="ns")
+            dut.txf.value = int(random.random() < self.txe_busy)
+        await RisingEdge(dut.ft60x_clk)
+        dut.txf.value = 1
+
+
+async def reset(dut, sys_clk_period=SYS_CLK_PERIOD):
+    dut.txf.value = 1
+    dut.fifo_we.value = 0
+    dut.fifo_be.value = BE_ALL
+    dut.sys_rst.value = 1
+    dut.ft60x_rst.value = 1
+    cocotb.start_soon(Clock(dut.sys_clk, sys_clk_period, units="ns").start())
+    cocotb.start_soon(Clock(dut.ft60x_clk, FT60X_CLK_PERIOD, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    dut.ft60x_rst.value = 0
+
+
+@cocotb.test()
+async def test_sustained_throughput(dut):
+    await reset(dut)
+    await write_FIFO(dut, 1000)
+    ft60x = FT60xModel(dut)
+    await ft60x.run(1000)
+    assert [w for w, _ in ft60x.words] == list(range(1000))
+    # the buffer feeds the FT60x side one word per 62.5 MHz sys clock
+    assert ft60x.clocks <= 1000 * SYS_CLK_PERIOD // FT60X_CLK_PERIOD + 8
+
+
+@cocotb.test()
+async def test_one_word_per_clock_with_faster_sys_clock(dut):
+    await reset(dut, sys_clk_period=8)
+    await write_FIFO(dut, 1000)
+    ft60x = FT60xModel(dut)
+    await ft60x.run(1000)
+    assert [w for w, _ in ft60x.words] == list(range(1000))
+    # one word per 100 MHz clock once the output register is primed
+    assert ft60x.clocks <= 1000 + 8
+
+
+@cocotb.test()
+async def test_txe_backpressure_and_byte_enables(dut):
+    await reset(dut)
+    writer = cocotb.start_soon(write_FIFO(dut, 2000, last_be=0b0001))
+    ft60x = FT60xModel(dut, txe_busy=0.3)
+    await ft60x.run(2000)
+    assert [w for w, _ in ft60x.words] == list(range(2000))
+    assert all(be == BE_ALL for _, be in ft60x.words[:-1])
+    assert ft60x.words[-1][1] == 0b0001
+    assert len(ft60x.bytes) == 1999 * DATA_WIDTH // 8 + 1
@@ -0,0 +1,74 @@
+import os
+from random import random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Timer
+
+# set by the Makefile, the width the converter was generated with
+OUT_WIDTH = int(os.environ.get("OUT_WIDTH", 32))
+BYTES_PER_WORD = OUT_WIDTH // 8
+
+
+async def feed_bytes(dut, count, rate=1.0):
+    value = 0
+    presented = False
+    dut.readable.value = 0
+    await FallingEdge(dut.sys_rst)
+    while value < count:
+        await FallingEdge(dut.sys_clk)
+        if presented and dut.re.value == 1:
+            value += 1
+            presented = False
+        if not presented and value < count and random() < rate:
+            dut.din.value = value & 0xFF
+            presented = True
+        dut.readable.value = int(presented)
+
+
+async def read_words(dut, count, rate=1.0):
+    words = []
+    cycles = 0
+    while len(words) < count:
+        await FallingEdge(dut.sys_clk)
+        if dut.we.value == 1:
+            words.append(int(dut.dout.value))
+        dut.writable.value = int(random() < rate)
+        cycles += 1
+    return words, cycles
+
+
+def expected_words(count):
+    return [
+        sum(((index * BYTES_PER_WORD + i) & 0xFF) << (8 * i) for i in range(BYTES_PER_WORD))
+        for index in range(count)
+    ]
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.writable.value = 0
+    await Timer(100, units="ns")
+    await FallingEdge(dut.sys_clk)
+    dut.sys_rst.value = 0
+
+
+@cocotb.test()
+async def test_full_throughput(dut):
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    assert len(dut.dout) == OUT_WIDTH
+    await reset(dut)
+    cocotb.start_soon(feed_bytes(dut, BYTES_PER_WORD * 256))
+    words, cycles = await read_words(dut, 256)
+    assert words == expected_words(256)
+    # one word every BYTES_PER_WORD clocks, no bubble
+    assert cycles <= BYTES_PER_WORD * 256 + BYTES_PER_WORD
+
+
+@cocotb.test()
+async def test_backpressure(dut):
+    seed(1)
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await reset(dut)
+    cocotb.start_soon(feed_bytes(dut, BYTES_PER_WORD * 256, rate=0.7))
+    words, _ = await read_words(dut, 256, rate=0.3)
+    assert words == expected_words(256)
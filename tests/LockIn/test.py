@@ -0,0 +1,83 @@
+import math
+from random import randint, random, seed
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+# LockIn(channels=2, increment=2**28, cic_ratio=8), the tone is at fs / 16
+PERIOD = 16
+RATIO = 16
+CHANNELS = 2
+
+
+def to_signed(value, width=16):
+    return value - (value >> (width - 1) << width)
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.sink_valid.value = 0
+    dut.source_ready.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+async def run(dut, samples, valid_probability=0.3, ready_probability=0.5):
+    """``samples`` is a list of per channel sample lists, returns the I/Q
+    pairs of each channel."""
+    length = len(samples[0])
+    outputs = []
+    index = 0
+    while len(outputs) < length // RATIO:
+        await FallingEdge(dut.sys_clk)
+        dut.sink_valid.value = int(index < length and random() < valid_probability)
+        word = 0
+        for channel, values in enumerate(samples):
+            word |= (values[min(index, length - 1)] & 0xFFFF) << (16 * channel)
+        dut.sink_payload_data.value = word
+        dut.source_ready.value = int(random() < ready_probability)
+        await ReadOnly()
+        if dut.sink_valid.value == 1 and dut.sink_ready.value == 1:
+            index += 1
+        if dut.source_valid.value == 1 and dut.source_ready.value == 1:
+            word = int(dut.source_payload_data.value)
+            outputs.append([to_signed((word >> (16 * i)) & 0xFFFF) for i in range(2 * CHANNELS)])
+    await FallingEdge(dut.sys_clk)
+    dut.sink_valid.value = 0
+    outputs = np.array(outputs)
+    return [(outputs[:, 2 * i], outputs[:, 2 * i + 1]) for i in range(CHANNELS)]
+
+
+@cocotb.test()
+async def test_amplitude_and_phase(dut):
+    seed(0)
+    await reset(dut)
+    amplitudes = [20000, 7000]
+    phases = [0.3, -2.0]
+    samples = [
+        [
+            int(amplitude * math.cos(2 * math.pi * index / PERIOD + phase)) + randint(-50, 50)
+            for index in range(200 * RATIO)
+        ]
+        for amplitude, phase in zip(amplitudes, phases)
+    ]
+    outputs = await run(dut, samples)
+    for (i, q), amplitude, phase in zip(outputs, amplitudes, phases):
+        # skip the filters settling
+        assert abs(i[20:].mean() - amplitude / 2 * math.cos(phase)) < 4
+        assert abs(q[20:].mean() - amplitude / 2 * math.sin(phase)) < 4
+
+
+@cocotb.test()
+async def test_rejects_other_frequencies(dut):
+    seed(1)
+    await reset(dut)
+    samples = [
+        [int(20000 * math.cos(2 * math.pi * index * 0.3)) for index in range(100 * RATIO)]
+    ] * CHANNELS
+    outputs = await run(dut, samples)
+    for i, q in outputs:
+        assert np.abs(i[20:]).max() < 8
+        assert np.abs(q[20:]).max() < 8
@@ -0,0 +1,67 @@
+import math
+from random import randint, random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Timer
+
+from fusion_rtl.com import rice_codec
+
+CHANNELS = 4
+BLOCK_SIZE = 64
+
+
+def sample_sets(count):
+    return [
+        [
+            (int(3000 * math.sin(index * 0.01 + channel)) + randint(-8, 8)) & 0xFFFF
+            for channel in range(CHANNELS)
+        ]
+        for index in range(count)
+    ]
+
+
+async def emulate_adc_fifos(dut, sets):
+    sets = list(sets)
+    dut.adc_data_readable.value = 0
+    await FallingEdge(dut.sys_rst)
+    while True:
+        await FallingEdge(dut.sys_clk)
+        if dut.adc_data_readable.value == 1 and dut.adc_data_re.value == 1:
+            sets.pop(0)
+        if sets:
+            for channel, value in enumerate(sets[0]):
+                getattr(dut, f"acd_data{channel}").value = value
+            dut.adc_data_readable.value = 1
+        else:
+            dut.adc_data_readable.value = 0
+
+
+async def consume(dut, count):
+    values = []
+    while len(values) < count:
+        await FallingEdge(dut.sys_clk)
+        dut.fifo_has_enough_space.value = int(random() > 0.2)
+        if dut.fifo_we.value == 1:
+            values.append(int(dut.fifo_din.value))
+    return bytes(values)
+
+
+@cocotb.test()
+async def test_RiceEncoder(dut):
+    seed(42)
+    dut.sys_rst.value = 1
+    dut.fifo_has_enough_space.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    sets = sample_sets(BLOCK_SIZE * 8)
+    cocotb.start_soon(emulate_adc_fifos(dut, sets))
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+    expected = rice_codec.encode(sets, CHANNELS, BLOCK_SIZE)
+    assert len(expected) < len(sets) * CHANNELS * 2
+    received = await consume(dut, len(expected))
+    assert received == expected
+
+    blocks = rice_codec.decode(received, CHANNELS, BLOCK_SIZE)
+    assert [counter for counter, _ in blocks] == list(range(8))
+    assert [s for _, block in blocks for s in block] == sets
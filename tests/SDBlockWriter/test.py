@@ -0,0 +1,162 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.sdcard.block_writer import crc16
+
+TRANSFER_CLOCKS = 4
+DATA_ACCEPTED = 0xE5
+DATA_CRC_ERROR = 0x0B
+
+
+async def reset(dut, length, blocks):
+    dut.sys_rst.value = 1
+    dut.start.value = 0
+    dut.length.value = length
+    dut.blocks.value = blocks
+    dut.token.value = 0xFC
+    dut.sink_valid.value = 0
+    dut.ready.value = 1
+    dut.data_rd.value = 0xFFFFFFFF
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await FallingEdge(dut.sys_clk)
+
+
+async def run(dut, words, response, cycles):
+    """
+    Plays the SPI master and the card, returns the transfers as (bits, value).
+    The card answers ``response`` after a CRC then stays busy for two bytes.
+    """
+    transfers = []
+    card = []
+    busy = 0
+    index = 0
+    dut.start.value = 1
+    await FallingEdge(dut.sys_clk)
+    dut.start.value = 0
+    received = None
+    for _ in range(cycles):
+        await FallingEdge(dut.sys_clk)
+        # the master drops ready the clock after a start
+        if received is not None:
+            dut.ready.value = 0
+            dut.data_rd.value = received
+            busy = TRANSFER_CLOCKS
+            received = None
+        elif busy:
+            busy -= 1
+            if busy == 0:
+                dut.ready.value = 1
+        dut.sink_valid.value = int(index < len(words))
+        dut.sink_payload_data.value = words[index] if index < len(words) else 0
+        await ReadOnly()
+        if dut.sink_valid.value == 1 and dut.sink_ready.value == 1 and dut.active.value == 1:
+            index += 1
+        for bits in (8, 16, 32):
+            if getattr(dut, f"start{bits}bits").value == 1:
+                value = int(getattr(dut, f"data_wr_{bits}").value)
+                transfers.append((bits, value))
+                if bits == 16:
+                    card = [0xFF, response, 0x00, 0x00]
+                received = card.pop(0) if card and bits == 8 else 0xFF
+    return transfers
+
+
+def blocks_sent(transfers):
+    """Splits the transfers into (data bytes, crc) per block."""
+    blocks = []
+    for bits, value in transfers:
+        if bits == 8 and value == 0xFC:
+            blocks.append([b"", None])
+        elif bits == 32:
+            blocks[-1][0] += value.to_bytes(4, "big")
+        elif bits == 16:
+            blocks[-1][1] = value
+    return blocks
+
+
+@cocotb.test()
+async def test_write_blocks(dut):
+    length, count = 64, 3
+    words = [(0x01020304 * i) & 0xFFFFFFFF for i in range(length // 4 * count)]
+    await reset(dut, length, count)
+    transfers = await run(dut, words, DATA_ACCEPTED, 3000)
+    await ReadOnly()
+    assert dut.active.value == 0
+    assert dut.done.value == 1
+    assert dut.error.value == 0
+    assert dut.written.value == count
+    assert dut.response.value == DATA_ACCEPTED
+    blocks = blocks_sent(transfers)
+    assert len(blocks) == count
+    data = b"".join(w.to_bytes(4, "big") for w in words)
+    for index, (sent, crc) in enumerate(blocks):
+        assert sent == data[index * length:(index + 1) * length]
+        assert crc == crc16(sent)
+
+
+@cocotb.test()
+async def test_rejected_block(dut):
+    length = 16
+    await reset(dut, length, 4)
+    transfers = await run(dut, list(range(4 * length)), DATA_CRC_ERROR, 1000)
+    await ReadOnly()
+    assert dut.active.value == 0
+    assert dut.error.value == 1
+    assert dut.written.value == 0
+    assert dut.response.value == DATA_CRC_ERROR
+    assert len(blocks_sent(transfers)) == 1
+
+
+@cocotb.test()
+async def test_length_rounded_up(dut):
+    length, count = 6, 2
+    words = [0x11223344, 0x55667788, 0x99AABBCC, 0xDDEEFF00]
+    await reset(dut, length, count)
+    transfers = await run(dut, words, DATA_ACCEPTED, 1000)
+    await ReadOnly()
+    assert dut.active.value == 0
+    assert dut.error.value == 0
+    assert dut.written.value == count
+    # whole words, 8 bytes per block
+    blocks = blocks_sent(transfers)
+    data = b"".join(w.to_bytes(4, "big") for w in words)
+    assert [sent for sent, _ in blocks] == [data[:8], data[8:]]
+    assert [crc for _, crc in blocks] == [crc16(data[:8]), crc16(data[8:])]
+
+
+@cocotb.test()
+async def test_zero_length(dut):
+    await reset(dut, 0, 3)
+    transfers = await run(dut, list(range(16)), DATA_ACCEPTED, 100)
+    await ReadOnly()
+    assert transfers == []
+    assert dut.active.value == 0
+    assert dut.done.value == 1
+    assert dut.written.value == 0
+
+
+async def pulse_stop(dut, clocks):
+    for _ in range(clocks):
+        await FallingEdge(dut.sys_clk)
+    dut.stop.value = 1
+    await FallingEdge(dut.sys_clk)
+    dut.stop.value = 0
+
+
+@cocotb.test()
+async def test_stop(dut):
+    length, count = 64, 3
+    await reset(dut, length, count)
+    dut.stop.value = 0
+    # a single clock pulse in the middle of the first block
+    cocotb.start_soon(pulse_stop(dut, 20))
+    transfers = await run(dut, list(range(length // 4 * count)), DATA_ACCEPTED, 3000)
+    await ReadOnly()
+    assert dut.active.value == 0
+    assert dut.done.value == 1
+    assert dut.error.value == 0
+    assert dut.written.value == 1
+    assert len(blocks_sent(transfers)) == 1
@@ -0,0 +1,146 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.sdcard.block_writer import crc16
+
+TRANSFER_CLOCKS = 4
+ADDRESS = 0x12345678
+DATA_ACCEPTED = 0xE5
+
+
+async def reset(dut, blocks):
+    dut.sys_rst.value = 1
+    dut.start.value = 0
+    dut.stop.value = 0
+    dut.address.value = ADDRESS
+    dut.blocks.value = blocks
+    dut.sink_sink_valid.value = 0
+    dut.ready.value = 1
+    dut.data_rd.value = 0xFFFFFFFF
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await FallingEdge(dut.sys_clk)
+
+
+class Card:
+    """Answers the SPI transfers as a card in a multiple block write."""
+    def __init__(self, r1=0x00):
+        self.r1 = r1
+        self.state = "command"
+        self.command = b""
+        self.blocks = []
+        self.crcs = []
+        self.stopped = False
+        self.out = []
+
+    def transfer(self, bits, value):
+        data = value.to_bytes(bits // 8, "big")
+        if self.state == "command":
+            self.command += data if data != b"\xff" else b""
+            if len(self.command) == 6:
+                self.out = [0xFF, self.r1]
+                self.state = "token"
+        elif self.state == "token" and data == b"\xfc":
+            self.blocks.append(b"")
+            self.state = "data"
+        elif self.state == "token" and data == b"\xfd\xff":
+            self.stopped = True
+            self.out = [0x00, 0x00]
+        elif self.state == "data" and bits == 32:
+            self.blocks[-1] += data
+        elif self.state == "data" and bits == 16:
+            self.crcs.append(value)
+            self.out = [0xFF, DATA_ACCEPTED, 0x00, 0x00]
+            self.state = "token"
+        return self.out.pop(0) if self.out and bits == 8 else 0xFF
+
+
+async def run(dut, card, count, cycles, stop_after=None, period=8):
+    """
+    Starts the logger, feeds a counter, one word every ``period`` clocks,
+    plays the SPI master, returns the words fed while logging.
+    """
+    fed = []
+    busy = 0
+    received = None
+    dut.start.value = 1
+    await FallingEdge(dut.sys_clk)
+    dut.start.value = 0
+    for clock in range(cycles):
+        await FallingEdge(dut.sys_clk)
+        dut.stop.value = int(stop_after is not None and len(fed) == stop_after)
+        # the master drops ready the clock after a start
+        if received is not None:
+            dut.ready.value = 0
+            dut.data_rd.value = received
+            busy = TRANSFER_CLOCKS
+            received = None
+        elif busy:
+            busy -= 1
+            if busy == 0:
+                dut.ready.value = 1
+        feeding = len(fed) < count and clock % period == 0
+        dut.sink_sink_valid.value = int(feeding)
+        dut.sink_sink_payload_data.value = len(fed)
+        await ReadOnly()
+        if feeding and dut.active.value == 1:
+            fed.append(len(fed))
+        for bits in (8, 16, 32):
+            if getattr(dut, f"start{bits}bits").value == 1:
+                received = card.transfer(bits, int(getattr(dut, f"data_wr_{bits}").value))
+        if dut.done.value == 1:
+            break
+    return fed
+
+
+def logged_words(card):
+    data = b"".join(card.blocks)
+    return [int.from_bytes(data[i:i + 4], "little") for i in range(0, len(data), 4)]
+
+
+@cocotb.test()
+async def test_log_blocks(dut):
+    await reset(dut, blocks=2)
+    card = Card()
+    fed = await run(dut, card, 1000, 20000)
+    await ReadOnly()
+    assert dut.done.value == 1
+    assert dut.error.value == 0
+    assert dut.written.value == 2
+    assert card.command == bytes([0x40 | 25]) + ADDRESS.to_bytes(4, "big") + b"\x01"
+    assert card.stopped
+    assert len(card.blocks) == 2
+    assert all(len(block) == 512 for block in card.blocks)
+    assert card.crcs == [crc16(block) for block in card.blocks]
+    assert logged_words(card) == fed[:256]
+
+
+@cocotb.test()
+async def test_stop_pads_last_block(dut):
+    await reset(dut, blocks=100)
+    card = Card()
+    fed = await run(dut, card, 200, 20000, stop_after=200)
+    await ReadOnly()
+    assert dut.done.value == 1
+    assert dut.error.value == 0
+    assert dut.written.value == 2
+    assert card.stopped
+    words = logged_words(card)
+    assert words[:len(fed)] == fed
+    assert words[len(fed):] == [0] * (256 - len(fed))
+    assert dut.dropped.value == 0
+
+
+@cocotb.test()
+async def test_command_rejected(dut):
+    await reset(dut, blocks=2)
+    card = Card(r1=0x04)
+    await run(dut, card, 1000, 2000)
+    await ReadOnly()
+    assert dut.done.value == 1
+    assert dut.error.value == 2
+    assert dut.r1.value == 0x04
+    assert dut.written.value == 0
+    assert card.blocks == []
@@ -0,0 +1,77 @@
+import math
+from random import randint, random, seed
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.dsp import biquad_model
+
+CYCLES_PER_SAMPLE = 5
+COEFFICIENTS = biquad_model.quantize(
+    biquad_model.scale_sections(biquad_model.PRESETS["lowpass_0.05"])
+)
+
+
+def to_signed(value, width=16):
+    return value - (value >> (width - 1) << width)
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.sink_valid.value = 0
+    dut.source_ready.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+async def run(dut, samples, ready_probability=1.0):
+    outputs = []
+    index = 0
+    clocks = 0
+    while len(outputs) < len(samples):
+        await FallingEdge(dut.sys_clk)
+        clocks += 1
+        dut.sink_valid.value = int(index < len(samples))
+        dut.sink_payload_data.value = int(samples[min(index, len(samples) - 1)]) & 0xFFFF
+        dut.source_ready.value = int(random() < ready_probability)
+        await ReadOnly()
+        if dut.sink_valid.value == 1 and dut.sink_ready.value == 1:
+            index += 1
+        if dut.source_valid.value == 1 and dut.source_ready.value == 1:
+            outputs.append(to_signed(int(dut.source_payload_data.value)))
+    await FallingEdge(dut.sys_clk)
+    dut.sink_valid.value = 0
+    return np.array(outputs), clocks
+
+
+@cocotb.test()
+async def test_bit_exact(dut):
+    seed(42)
+    await reset(dut)
+    samples = [
+        int(25000 * math.sin(index * 0.02 * 2 * math.pi)) + randint(-5000, 5000)
+        for index in range(300)
+    ]
+    outputs, clocks = await run(dut, samples)
+    assert np.array_equal(outputs, biquad_model.biquad_cascade(samples, COEFFICIENTS))
+    assert clocks <= CYCLES_PER_SAMPLE * len(samples) + 32
+
+
+@cocotb.test()
+async def test_backpressure(dut):
+    seed(1)
+    await reset(dut)
+    samples = [randint(-(2**15), 2**15 - 1) for _ in range(200)]
+    outputs, _ = await run(dut, samples, ready_probability=0.3)
+    assert np.array_equal(outputs, biquad_model.biquad_cascade(samples, COEFFICIENTS))
+
+
+@cocotb.test()
+async def test_stop_band(dut):
+    await reset(dut)
+    samples = [int(30000 * math.sin(index * 0.2 * 2 * math.pi)) for index in range(300)]
+    outputs, _ = await run(dut, samples)
+    # 80 dB below a full scale input, a few LSB of rounding noise left
+    assert np.abs(outputs[100:]).max() < 16
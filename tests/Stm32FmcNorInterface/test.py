@@ -0,0 +1,188 @@
+import numpy as np
+import cocotb
+import cocotb.utils
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
+
+DATA_LATENCY = 2
+FLUSH_TIMEOUT = 256
+LEVEL_ADDRESS = 7
+# registers of the generated module
+REG1_ADDRESS = 1
+REG1_RESET = 0x1234
+REG2_ADDRESS = 2
+
+
+async def write_FIFO(dut, count, value=0, period=1):
+    while count:
+        await FallingEdge(dut.sys_clk)
+        if dut.fifo_writable.value == 0:
+            dut.fifo_we.value = 0
+            continue
+        dut.fifo_din.value = value
+        dut.fifo_we.value = 1
+        value += 1
+        count -= 1
+        for _ in range(period - 1):
+            await FallingEdge(dut.sys_clk)
+            dut.fifo_we.value = 0
+    await FallingEdge(dut.sys_clk)
+    dut.fifo_we.value = 0
+
+
+async def burst_read_FMC(dut, count, address=0, next_address=None):
+    """
+    STM32 FMC synchronous burst read, signals are driven on falling edges and
+    outputs are sampled on the next rising edge, NWAIT inserts wait states.
+    With ``next_address`` the address pins change once NADV is released.
+    """
+    values = []
+    await FallingEdge(dut.sys_clk)
+    dut.address.value = address
+    dut.ne.value = 0
+    dut.nadv.value = 0
+    dut.noe.value = 1
+    clocks = 0
+    while len(values) < count:
+        await FallingEdge(dut.sys_clk)
+        dut.nadv.value = 1
+        if next_address is not None:
+            dut.address.value = next_address
+        dut.noe.value = 0
+        clocks += 1
+        await ReadOnly()
+        if clocks >= DATA_LATENCY and dut.nwait.value == 1:
+            values.append(int(dut.data_w.value))
+    await FallingEdge(dut.sys_clk)
+    dut.ne.value = 1
+    dut.noe.value = 1
+    return values, clocks
+
+
+async def write_FMC(dut, address, value):
+    """
+    STM32 FMC synchronous write, the word is taken from the data bus while
+    NWE is low and written to the register when NE rises.
+    """
+    await FallingEdge(dut.sys_clk)
+    dut.address.value = address
+    dut.data_r.value = value
+    dut.ne.value = 0
+    dut.nadv.value = 0
+    dut.nwe.value = 0
+    for _ in range(DATA_LATENCY):
+        await FallingEdge(dut.sys_clk)
+        dut.nadv.value = 1
+    await FallingEdge(dut.sys_clk)
+    dut.ne.value = 1
+    dut.nwe.value = 1
+
+
+async def count_strobes(dut, strobes):
+    while True:
+        await RisingEdge(dut.sys_clk)
+        await ReadOnly()
+        strobes[0] += int(dut.reg1_written.value)
+
+
+async def reset(dut):
+    dut.ne.value = 1
+    dut.noe.value = 1
+    dut.nwe.value = 1
+    dut.nadv.value = 1
+    dut.fifo_we.value = 0
+    dut.sys_rst.value = 1
+    clk = Clock(dut.sys_clk, 10, units="ns")
+    cocotb.start_soon(clk.start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await RisingEdge(dut.sys_clk)
+
+
+@cocotb.test()
+async def test_burst_one_word_per_clock(dut):
+    await reset(dut)
+    await write_FIFO(dut, 64)
+    values, clocks = await burst_read_FMC(dut, 32)
+    assert np.all(np.array(values) == np.arange(32))
+    assert clocks == 32 + DATA_LATENCY - 1
+    values, clocks = await burst_read_FMC(dut, 32)
+    assert np.all(np.array(values) == np.arange(32, 64))
+    assert clocks == 32 + DATA_LATENCY - 1
+
+
+@cocotb.test()
+async def test_burst_wait_states(dut):
+    await reset(dut)
+    await write_FIFO(dut, 4)
+    cocotb.start_soon(write_FIFO(dut, 60, value=4, period=3))
+    values, clocks = await burst_read_FMC(dut, 64)
+    assert np.all(np.array(values) == np.arange(64))
+    assert clocks > 64 + DATA_LATENCY - 1
+
+
+@cocotb.test()
+async def test_flush_timeout(dut):
+    await reset(dut)
+    dut.address.value = 0
+    await write_FIFO(dut, 5)
+    start = cocotb.utils.get_sim_time(units="ns")
+    await RisingEdge(dut.have_data)
+    elapsed = cocotb.utils.get_sim_time(units="ns") - start
+    # the oldest word was written 5 clocks before start
+    assert (FLUSH_TIMEOUT - 8) * 10 <= elapsed <= (FLUSH_TIMEOUT + 8) * 10
+    (level,), _ = await burst_read_FMC(dut, 1, address=LEVEL_ADDRESS)
+    assert level == 5
+    await FallingEdge(dut.sys_clk)
+    await FallingEdge(dut.sys_clk)
+    assert dut.have_data.value == 0
+    values, _ = await burst_read_FMC(dut, level)
+    assert values == list(range(5))
+
+
+@cocotb.test()
+async def test_registers(dut):
+    await reset(dut)
+    strobes = [0]
+    cocotb.start_soon(count_strobes(dut, strobes))
+    (value,), _ = await burst_read_FMC(dut, 1, address=REG1_ADDRESS)
+    assert value == REG1_RESET
+    assert strobes[0] == 0
+
+    await write_FMC(dut, REG1_ADDRESS, 0xCAFE)
+    for _ in range(3):
+        await FallingEdge(dut.sys_clk)
+    assert strobes[0] == 1
+    assert dut.reg1.value == 0xCAFE
+    (value,), _ = await burst_read_FMC(dut, 1, address=REG1_ADDRESS)
+    assert value == 0xCAFE
+
+    # read only, writes are ignored
+    dut.reg2.value = 0x5678
+    await write_FMC(dut, REG2_ADDRESS, 0)
+    (value,), _ = await burst_read_FMC(dut, 1, address=REG2_ADDRESS)
+    assert value == 0x5678
+
+    # the data and level addresses and the free ones leave the registers alone
+    for address in (0, 3, LEVEL_ADDRESS):
+        await write_FMC(dut, address, 0xDEAD)
+    (value,), _ = await burst_read_FMC(dut, 1, address=REG1_ADDRESS)
+    assert value == 0xCAFE
+    (value,), _ = await burst_read_FMC(dut, 1, address=3)
+    assert value == 0
+    assert strobes[0] == 1
+
+
+@cocotb.test()
+async def test_address_latched(dut):
+    # the pins moving after NADV change neither the data nor the pops
+    await reset(dut)
+    await write_FIFO(dut, 8)
+    values, _ = await burst_read_FMC(dut, 4, address=0, next_address=REG1_ADDRESS)
+    assert values == list(range(4))
+    values, _ = await burst_read_FMC(dut, 4, address=REG1_ADDRESS, next_address=0)
+    assert values == [REG1_RESET] * 4
+    (level,), _ = await burst_read_FMC(dut, 1, address=LEVEL_ADDRESS, next_address=0)
+    assert level == 4
+    values, _ = await burst_read_FMC(dut, 4)
+    assert values == list(range(4, 8))
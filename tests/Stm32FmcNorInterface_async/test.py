@@ -0,0 +1,62 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer, FallingEdge
+
+LEVEL_ADDRESS = 7
+ACCESS_CLOCKS = 4
+
+
+async def write_FIFO(dut, count, value=0):
+    for _ in range(count):
+        await FallingEdge(dut.sys_clk)
+        dut.fifo_din.value = value
+        dut.fifo_we.value = 1
+        value += 1
+    await FallingEdge(dut.sys_clk)
+    dut.fifo_we.value = 0
+
+
+async def read_FMC(dut, address):
+    """STM32 FMC asynchronous read, the FIFO is popped when NE rises."""
+    await FallingEdge(dut.sys_clk)
+    dut.address.value = address
+    dut.ne.value = 0
+    dut.noe.value = 0
+    for _ in range(ACCESS_CLOCKS):
+        await FallingEdge(dut.sys_clk)
+    await ReadOnly()
+    value = int(dut.data_w.value)
+    await FallingEdge(dut.sys_clk)
+    dut.ne.value = 1
+    dut.noe.value = 1
+    for _ in range(2):
+        await FallingEdge(dut.sys_clk)
+    return value
+
+
+async def reset(dut):
+    dut.ne.value = 1
+    dut.noe.value = 1
+    dut.nwe.value = 1
+    dut.fifo_we.value = 0
+    dut.sys_rst.value = 1
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await RisingEdge(dut.sys_clk)
+
+
+@cocotb.test()
+async def test_pops_at_data_address_only(dut):
+    await reset(dut)
+    await write_FIFO(dut, 4)
+    assert await read_FMC(dut, LEVEL_ADDRESS) == 4
+    assert await read_FMC(dut, 0) == 0
+    assert await read_FMC(dut, LEVEL_ADDRESS) == 3
+    # the register addresses, nothing is mapped there
+    for address in range(1, LEVEL_ADDRESS):
+        assert await read_FMC(dut, address) == 0
+    assert await read_FMC(dut, LEVEL_ADDRESS) == 3
+    assert await read_FMC(dut, 0) == 1
+    assert await read_FMC(dut, 0) == 2
+    assert await read_FMC(dut, LEVEL_ADDRESS) == 1
@@ -0,0 +1,119 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+# as generated by python fusion_rtl/streams/__init__.py
+WATERMARK = 8
+CTI_CLASSIC = 0b000
+CTI_INCREMENTING = 0b010
+CTI_END_OF_BURST = 0b111
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.source_valid.value = 0
+    dut.bus_cyc.value = 0
+    dut.bus_stb.value = 0
+    dut.bus_we.value = 0
+    dut.bus_cti.value = CTI_CLASSIC
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await FallingEdge(dut.sys_clk)
+
+
+async def fill(dut, words):
+    index = 0
+    while index < len(words):
+        await FallingEdge(dut.sys_clk)
+        dut.source_valid.value = 1
+        dut.source_payload_data.value = words[index]
+        await ReadOnly()
+        if dut.source_ready.value == 1:
+            index += 1
+    await FallingEdge(dut.sys_clk)
+    dut.source_valid.value = 0
+    await FallingEdge(dut.sys_clk)
+
+
+async def read(dut, ctis):
+    """One bus cycle, a beat per cti, returns the words read and the clocks it took."""
+    words = []
+    clocks = 0
+    while len(words) < len(ctis):
+        await FallingEdge(dut.sys_clk)
+        dut.bus_cyc.value = 1
+        dut.bus_stb.value = 1
+        dut.bus_cti.value = ctis[len(words)]
+        await ReadOnly()
+        clocks += 1
+        if dut.bus_ack.value == 1:
+            words.append(int(dut.bus_dat_r.value))
+    await FallingEdge(dut.sys_clk)
+    dut.bus_cyc.value = 0
+    dut.bus_stb.value = 0
+    dut.bus_cti.value = CTI_CLASSIC
+    return words, clocks
+
+
+def burst(length):
+    return [CTI_INCREMENTING] * (length - 1) + [CTI_END_OF_BURST]
+
+
+@cocotb.test()
+async def test_classic_cycles(dut):
+    await reset(dut)
+    await fill(dut, [1, 2, 3])
+    for word in [1, 2, 3]:
+        assert await read(dut, [CTI_CLASSIC]) == ([word], 2)
+    assert dut.level_status.value == 0
+
+
+@cocotb.test()
+async def test_bursts(dut):
+    # one word per clock after the first one
+    await reset(dut)
+    await fill(dut, list(range(1, 13)))
+    assert await read(dut, burst(4)) == ([1, 2, 3, 4], 5)
+    assert await read(dut, burst(8)) == (list(range(5, 13)), 9)
+    assert dut.level_status.value == 0
+
+
+@cocotb.test()
+async def test_aborted_burst(dut):
+    # ended while acked as incrementing, the next word is still there
+    await reset(dut)
+    await fill(dut, [1, 2, 3, 4])
+    words, _ = await read(dut, [CTI_INCREMENTING] * 2)
+    assert words == [1, 2]
+    assert dut.level_status.value == 2
+    assert await read(dut, burst(2)) == ([3, 4], 3)
+
+
+@cocotb.test()
+async def test_empty_reads(dut):
+    await reset(dut)
+    await fill(dut, [42])
+    words, _ = await read(dut, [CTI_CLASSIC] * 2)
+    assert words == [42, 0]
+    words, _ = await read(dut, burst(4))
+    assert words == [0] * 4
+    await fill(dut, [43])
+    words, _ = await read(dut, [CTI_CLASSIC])
+    assert words == [43]
+
+
+@cocotb.test()
+async def test_watermark(dut):
+    await reset(dut)
+    assert dut.above_watermark.value == 0
+    await fill(dut, list(range(WATERMARK - 1)))
+    assert dut.above_watermark.value == 0
+    await fill(dut, [WATERMARK - 1])
+    assert dut.level_status.value == WATERMARK
+    assert dut.above_watermark.value == 1
+    await read(dut, [CTI_CLASSIC])
+    assert dut.above_watermark.value == 0
+    dut.watermark_storage.value = WATERMARK // 2
+    await FallingEdge(dut.sys_clk)
+    assert dut.above_watermark.value == 1
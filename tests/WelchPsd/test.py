@@ -0,0 +1,78 @@
+import math
+from random import randint, random, seed
+import numpy as np
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+from fusion_rtl.dsp import psd_model
+
+FFT_SIZE = 64
+AVERAGES = 4
+BINS = FFT_SIZE // 2 + 1
+
+
+def to_signed(value, width=16):
+    return value - (value >> (width - 1) << width)
+
+
+async def reset(dut):
+    dut.sys_rst.value = 1
+    dut.sink_valid.value = 0
+    dut.source_ready.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+
+
+async def run(dut, samples, spectra, valid_probability=0.1, ready_probability=1.0):
+    """Feed ``samples`` until ``spectra`` spectra are out, returns them and
+    the samples actually taken."""
+    outputs = []
+    spectrum = []
+    index = 0
+    while len(outputs) < spectra:
+        await FallingEdge(dut.sys_clk)
+        dut.sink_valid.value = int(index < len(samples) and random() < valid_probability)
+        dut.sink_payload_data.value = samples[min(index, len(samples) - 1)] & 0xFFFF
+        dut.source_ready.value = int(random() < ready_probability)
+        await ReadOnly()
+        if dut.sink_valid.value == 1 and dut.sink_ready.value == 1:
+            index += 1
+        if dut.source_valid.value == 1 and dut.source_ready.value == 1:
+            if dut.source_first.value == 1:
+                spectrum = []
+            spectrum.append(int(dut.source_payload_data.value))
+            if dut.source_last.value == 1:
+                outputs.append(spectrum)
+    await FallingEdge(dut.sys_clk)
+    dut.sink_valid.value = 0
+    return outputs, samples[:index]
+
+
+@cocotb.test()
+async def test_bit_exact(dut):
+    seed(42)
+    await reset(dut)
+    # small enough not to saturate the 32 bits outputs
+    samples = [randint(-2000, 2000) for _ in range(2 * FFT_SIZE * AVERAGES)]
+    outputs, taken = await run(dut, samples, 2, ready_probability=0.5)
+    expected = psd_model.welch_psd(taken, FFT_SIZE, AVERAGES)
+    for spectrum, reference in zip(outputs, expected):
+        assert len(spectrum) == BINS
+        assert spectrum == [int(v) for v in reference]
+
+
+@cocotb.test()
+async def test_tone(dut):
+    seed(1)
+    await reset(dut)
+    samples = [
+        int(1000 * math.sin(index * 10 / FFT_SIZE * 2 * math.pi)) + randint(-8, 8)
+        for index in range(FFT_SIZE * AVERAGES)
+    ]
+    outputs, _ = await run(dut, samples, 1)
+    spectrum = np.array(outputs[0])
+    assert spectrum.argmax() == 10
+    # Hann leakage stops after the neighbour bins
+    assert spectrum[14:].max() < spectrum[10] / 1e4
@@ -0,0 +1,97 @@
+from random import random, seed
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+
+BURST_LENGTH = 8
+BASE = 0x1000
+CTI_INCREMENTING = 0b010
+CTI_END_OF_BURST = 0b111
+
+
+def swap_bytes(word):
+    return int.from_bytes(word.to_bytes(4, "little"), "big")
+
+
+async def reset(dut, words, loop):
+    dut.sys_rst.value = 1
+    dut.sink_sink_valid.value = 0
+    dut.bus_ack.value = 0
+    dut.base.value = BASE
+    dut.length.value = 4 * words
+    dut.loop.value = loop
+    dut.enable.value = 0
+    cocotb.start_soon(Clock(dut.sys_clk, 10, units="ns").start())
+    await Timer(100, units="ns")
+    dut.sys_rst.value = 0
+    await FallingEdge(dut.sys_clk)
+    dut.enable.value = 1
+
+
+async def run(dut, count, cycles, valid_probability=1.0, ack_probability=1.0):
+    """Feeds a counter, returns the (address, data, cti, clock) of the acked beats."""
+    beats = []
+    index = 0
+    for clock in range(cycles):
+        await FallingEdge(dut.sys_clk)
+        dut.sink_sink_valid.value = int(index < count and random() < valid_probability)
+        dut.sink_sink_payload_data.value = index
+        dut.bus_ack.value = int(dut.bus_stb.value == 1 and random() < ack_probability)
+        await ReadOnly()
+        if dut.sink_sink_valid.value == 1 and dut.sink_sink_ready.value == 1:
+            index += 1
+        if dut.bus_ack.value == 1:
+            beats.append(
+                (
+                    int(dut.bus_adr.value),
+                    swap_bytes(int(dut.bus_dat_w.value)),
+                    int(dut.bus_cti.value),
+                    clock,
+                )
+            )
+    return beats
+
+
+def check_bursts(beats):
+    # incrementing addresses within a burst, closed by an end of burst beat
+    length = 0
+    for (address, _, cti, _), previous in zip(beats, [None] + beats[:-1]):
+        if length:
+            assert address == previous[0] + 1
+        assert cti in (CTI_INCREMENTING, CTI_END_OF_BURST)
+        length = 0 if cti == CTI_END_OF_BURST else length + 1
+        assert length < BURST_LENGTH
+
+
+@cocotb.test()
+async def test_one_shot(dut):
+    await reset(dut, words=40, loop=0)
+    beats = await run(dut, 100, 300)
+    assert [b[0] for b in beats] == [BASE // 4 + i for i in range(40)]
+    assert [b[1] for b in beats] == list(range(40))
+    check_bursts(beats)
+    assert dut.done.value == 1
+
+
+@cocotb.test()
+async def test_ring_with_wait_states(dut):
+    seed(7)
+    words = 24
+    await reset(dut, words=words, loop=1)
+    beats = await run(dut, 10000, 3000, valid_probability=0.7, ack_probability=0.6)
+    assert len(beats) > 4 * words
+    for index, (address, data, _, _) in enumerate(beats):
+        assert data == index
+        assert address == BASE // 4 + index % words
+    check_bursts(beats)
+
+
+@cocotb.test()
+async def test_throughput(dut):
+    await reset(dut, words=1024, loop=0)
+    beats = await run(dut, 1024, 1200)
+    assert len(beats) == 1024
+    # filling the first burst then one idle clock between bursts
+    clocks = beats[-1][3] - beats[0][3] + 1
+    assert clocks <= 1024 + 1024 // BURST_LENGTH
+    dut._log.info(f"{4 * 1024 / clocks:.2f} bytes per clock")
@@ -24,18 +24,12 @@ from fusion_rtl.acquisition_pipeline import AcquisitionPipeline
 
 class TopModule(LiteXModule):
     def __init__(
-        self, platform, smp_clk_div=7, external_smp_clk=False, over_sampling=1, zone=2
+        self, platform, smp_clk_div=7, external_smp_clk=False, over_sampling=1, zone=2, sys_clk_freq=100e6
     ):
-        self.smp_clk_cntr = Signal(16, reset=0)
-        self.sync += self.smp_clk_cntr.eq(self.smp_clk_cntr + 1)
-
         self.smp_clk = Signal()
 
-        if external_smp_clk:
-            self.comb += self.smp_clk.eq(platform.io3)
-        else:
-            self.comb += self.smp_clk.eq(self.smp_clk_cntr[smp_clk_div])
-
+        # smp_clk period is 2**(smp_clk_div + 1) clocks, the pipeline divider
+        # can be retuned over FMC
         self.acquisition_pipeline = AcquisitionPipeline(
             adc_count=2,
             fmc_data_width=platform.fmc_pads.data.nbits,
@@ -43,15 +37,19 @@ class TopModule(LiteXModule):
             fifo_depth=2048,
             fifo_count=48,
             use_chained_fifo=True,
+            fifo_pipeline_stages=1,
+            with_registers=True,
+            smp_clk_div=None if external_smp_clk else 2 ** (smp_clk_div + 1),
             smp_clk_is_synchronous=not external_smp_clk,
             oversampling=over_sampling,
             zone=zone,
+            sys_clk_freq=sys_clk_freq,
         )
 
         self.submodules += self.acquisition_pipeline
 
-        platform.connect_adc1(self.acquisition_pipeline.adcs[0])
-        platform.connect_adc2(self.acquisition_pipeline.adcs[1])
+        platform.connect_adc1(self.acquisition_pipeline.adc, lane=0)
+        platform.connect_adc2(self.acquisition_pipeline.adc, lane=1)
 
         self.acquisition_pipeline.nor_if.connect_data_pads(platform.fmc_pads.data)
         self.comb += self.acquisition_pipeline.nor_if.address.eq(
@@ -60,7 +58,11 @@ class TopModule(LiteXModule):
         self.comb += self.acquisition_pipeline.nor_if.ne.eq(platform.fmc_pads.ne)
         self.comb += self.acquisition_pipeline.nor_if.noe.eq(platform.fmc_pads.noe)
         self.comb += self.acquisition_pipeline.nor_if.nwe.eq(platform.fmc_pads.nwe)
-        self.comb += self.acquisition_pipeline.smp_clk.eq(self.smp_clk)
+        if external_smp_clk:
+            self.comb += self.smp_clk.eq(platform.io3)
+            self.comb += self.acquisition_pipeline.smp_clk.eq(self.smp_clk)
+        else:
+            self.comb += self.smp_clk.eq(self.acquisition_pipeline.smp_clk)
         self.comb += platform.have_data.eq(self.acquisition_pipeline.have_data)
 
 
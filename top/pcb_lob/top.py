@@ -9,10 +9,13 @@ import argparse
 
 parser = argparse.ArgumentParser(description="Analog Two Top Module")
 parser.add_argument("--sim", action="store_true", help="Produce simulation verilog")
-parser.add_argument("--smp_clk", help="Target ADC sampling frequency",type=float, default=3e6)
+parser.add_argument("--smp_clk", help="Target ADC sampling frequency, 3MHz by default, 3.125MHz with --ftdi_sync",type=float, default=None)
 parser.add_argument("--adc_zone", help="ADS92x4R zone", type=int, default=2, choices=[1,2])
 parser.add_argument("--adc_oversampling", help="ADS92x4R oversampling", type=int, default=0, choices=[0,2,4])
 parser.add_argument("--external_smp_clk", action="store_true", help="Use external sampling clock", default=False)
+parser.add_argument("--samples_per_frame", help="Sample sets per frame header", type=int, default=1)
+parser.add_argument("--ftdi_sync", action="store_true", help="Use the FTDI synchronous 245 FIFO mode, sys runs from the 50MHz clk", default=False)
+parser.add_argument("--adc_ddr", action="store_true", help="Read the ADCs with SCLK at twice the sys clock, sys then runs from a PLL", default=False)
 
 args = parser.parse_args()
 
@@ -23,6 +26,7 @@ __HERE__ = os.path.abspath(os.path.dirname(__file__))
 
 from fusion_rtl.platforms.PCB_LOB import PCB_LOB_Platform
 from fusion_rtl.acquisition_pipeline import AcquisitionPipelineFT245
+from fusion_rtl.adc.ads92x4_ddr import Ecp5Sys2xCRG
 
 
 class ClkDiv(LiteXModule):
@@ -44,8 +48,27 @@ class Blink(LiteXModule):
 
 class TopModule(LiteXModule):
     def __init__(
-        self, platform, smp_clk_div=60, external_smp_clk=False, over_sampling=1, zone=2
+        self, platform, smp_clk_div=60, external_smp_clk=False, over_sampling=1, zone=2, samples_per_frame=1, ftdi_sync=False, sys_clk_freq=60e6, adc_ddr=False
     ):
+        if ftdi_sync:
+            self.cd_ftdi = ClockDomain("ftdi")
+            self.comb += self.cd_ftdi.clk.eq(platform.request("ftdi_clk"))
+            platform.add_period_constraint(self.cd_ftdi.clk, 1e9/60e6)
+            sys_clk = platform.request("clk")
+            platform.add_period_constraint(sys_clk, 1e9/50e6)
+        else:
+            sys_clk = None
+        if adc_ddr:
+            # same sys frequency, plus the sys2x edge clock of the DDR IOs
+            self.crg = Ecp5Sys2xCRG(
+                clkin=sys_clk if ftdi_sync else platform.request("ftdi_clk"),
+                clkin_freq=sys_clk_freq,
+                sys_clk_freq=sys_clk_freq,
+            )
+        elif ftdi_sync:
+            self.cd_sys = ClockDomain("sys")
+            self.comb += self.cd_sys.clk.eq(sys_clk)
+
         self.blink = Blink()
         self.submodules += self.blink
         self.clkdiv=ClkDiv(MaxValue=smp_clk_div)
@@ -64,18 +87,26 @@ class TopModule(LiteXModule):
             smp_clk_is_synchronous=not external_smp_clk,
             oversampling=over_sampling,
             zone=zone,
+            samples_per_frame=samples_per_frame,
+            ft245_synchronous=ftdi_sync,
+            ddr_readout=adc_ddr,
+            sys_clk_freq=sys_clk_freq,
         )
 
         self.submodules += self.acquisition_pipeline
 
-        platform.connect_adc1(self.acquisition_pipeline.adcs[0])
-        platform.connect_adc2(self.acquisition_pipeline.adcs[1])
+        platform.connect_adc1(self.acquisition_pipeline.adc, lane=0)
+        platform.connect_adc2(self.acquisition_pipeline.adc, lane=1)
         
         self.comb += self.acquisition_pipeline.ft245.txf.eq(platform.FIFOA_pads.TXF)
         self.comb += platform.FIFOA_pads.WR.eq(self.acquisition_pipeline.ft245.wr)
         self.comb += platform.FIFOA_pads.RD.eq(self.acquisition_pipeline.ft245.rd)
-        self.comb += platform.FIFOA_pads.OE.eq(1)
-        self.comb += platform.FIFOA_pads.SIWU.eq(1)
+        if ftdi_sync:
+            self.comb += platform.FIFOA_pads.OE.eq(self.acquisition_pipeline.ft245.oe)
+            self.comb += platform.FIFOA_pads.SIWU.eq(self.acquisition_pipeline.ft245.siwu)
+        else:
+            self.comb += platform.FIFOA_pads.OE.eq(1)
+            self.comb += platform.FIFOA_pads.SIWU.eq(1)
         self.acquisition_pipeline.ft245.connect_data_pads(platform.FIFOA_pads.DATA)
         
         self.comb += platform.request("LED1").eq(self.blink.led)
@@ -92,19 +123,29 @@ class TopModule(LiteXModule):
 if __name__ == "__main__":
     
     platform = PCB_LOB_Platform()
-    smp_clk_div = round(1./(platform.default_clk_period*1e-9 * args.smp_clk))
+    sys_clk_period = 1e9/50e6 if args.ftdi_sync else platform.default_clk_period
+    if args.smp_clk is None:
+        # 3MHz is not a divider of the 50MHz clk, the closest one is
+        args.smp_clk = 50e6/16 if args.ftdi_sync else 3e6
+    smp_clk_div = round(1./(sys_clk_period*1e-9 * args.smp_clk))
     assert smp_clk_div > 1, "Sampling frequency too high"
-    actual_sampling_frequency = 1./(platform.default_clk_period*1e-9 * smp_clk_div)
+    actual_sampling_frequency = 1./(sys_clk_period*1e-9 * smp_clk_div)
     error = 100*abs(actual_sampling_frequency - args.smp_clk)/args.smp_clk
     assert error < 1, f"Sampling frequency too far from target, error: {error}%, actual: {actual_sampling_frequency/1e3} KHz target: {args.smp_clk/1e3} KHz"
     print(f"Actual sampling frequency: {actual_sampling_frequency/1e3} KHz")
     
-    top = TopModule(platform, smp_clk_div=smp_clk_div, zone=args.adc_zone, over_sampling=args.adc_oversampling, external_smp_clk=args.external_smp_clk)
+    top = TopModule(platform, smp_clk_div=smp_clk_div, zone=args.adc_zone, over_sampling=args.adc_oversampling, external_smp_clk=args.external_smp_clk, samples_per_frame=args.samples_per_frame, ftdi_sync=args.ftdi_sync, sys_clk_freq=1e9/sys_clk_period, adc_ddr=args.adc_ddr)
     
     if args.sim:
         from migen.fhdl.verilog import convert
 
-        convert(top).write("TopModule.v")
+        special_overrides = {}
+        if args.adc_ddr:
+            # reset synchronizers of the sys2x clocking, as the platform does
+            from migen.genlib.resetsync import AsyncResetSynchronizer
+            from litex.build.lattice.common import LatticeECP5AsyncResetSynchronizer
+            special_overrides[AsyncResetSynchronizer] = LatticeECP5AsyncResetSynchronizer
+        convert(top, special_overrides=special_overrides).write("TopModule.v")
     else:
         platform.build(top)
 
@@ -10,6 +10,7 @@
 #include <liblitesdcard/spisdcard.h>
 #include <liblitedram/sdram.h>
 #include <generated/csr.h>
+#include <system.h>
 
 #ifdef CUSTOM_SPI
 
@@ -320,9 +321,51 @@ static uint8_t spisdcardsend_cmd(uint8_t cmd, uint32_t arg)
     return byte;
 }
 
+#ifdef CSR_CUSTOM_SPI_BLOCK_WRITER_CONTROL_ADDR
+/* The block writer sends the tokens, data and CRCs read by its DMA from buf
+   and checks the data responses, the CPU only waits for the end. */
+static uint32_t spisdcard_write_blocks_dma(char *buf, uint32_t count)
+{
+    uint16_t timeout = 500;
+    while (timeout > 0) {
+        if (spi_xfer8(0xFF) == 0xFF)
+            break;
+        busy_wait_us(1);
+        timeout--;
+    }
+    if (timeout == 0)
+        return 0;
+
+    flush_cpu_dcache();
+    flush_l2_cache();
+    custom_spi_block_dma_enable_write(0);
+    custom_spi_block_dma_base_write((uint64_t)(uintptr_t)buf);
+    custom_spi_block_dma_length_write(count * 512);
+    custom_spi_block_writer_length_write(512);
+    custom_spi_block_writer_count_write(count);
+    custom_spi_block_writer_token_write(0xFC);
+    /* Start the writer first, it drops the words it gets while idle */
+    custom_spi_block_writer_control_write(1);
+    custom_spi_block_dma_enable_write(1);
+    while (custom_spi_block_writer_status_active_read());
+    custom_spi_block_dma_enable_write(0);
+
+    #ifdef SPISDCARD_DEBUG
+    if (custom_spi_block_writer_status_error_read())
+        printf("Block write error %d, data response: 0x%02X\n",
+            custom_spi_block_writer_status_error_read(),
+            custom_spi_block_writer_status_response_read());
+    #endif
+    return custom_spi_block_writer_written_read();
+}
+#endif
+
 int sd_write_blocks(char *buf, uint32_t block, uint32_t count) {
   uint32_t sent = 0;
   if (spisdcardsend_cmd(CMD25, block) == 0) {
+#ifdef CSR_CUSTOM_SPI_BLOCK_WRITER_CONTROL_ADDR
+    sent = spisdcard_write_blocks_dma(buf, count);
+#else
     while (count > 0) {
       if (!spisdcard_write_block(buf, 0xFC))
         break;
@@ -330,6 +373,7 @@ int sd_write_blocks(char *buf, uint32_t block, uint32_t count) {
       count--;
       sent++;
     }
+#endif
     spi_write8(0xFD);
     /* Wait not busy */
     uint32_t timeout = 1000000;
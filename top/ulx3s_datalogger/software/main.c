@@ -6,6 +6,7 @@
 #include <string.h>
 
 #include <irq.h>
+#include <system.h>
 #include <libbase/uart.h>
 #include <libbase/console.h>
 #include <liblitesdcard/sdcard.h>
@@ -25,8 +26,11 @@
 #endif
 
 #define DMA_BUFFER_SIZE (1024*1024*4)
-char DMA_buffer1[DMA_BUFFER_SIZE] __attribute__((section(".dma"), aligned(64)));
-char DMA_buffer2[DMA_BUFFER_SIZE] __attribute__((section(".dma"), aligned(64)));
+// The DMA loops over both halves, one is written to the SDCard while the other one is filled
+char DMA_buffer[2*DMA_BUFFER_SIZE] __attribute__((section(".dma"), aligned(64)));
+
+// Halves filled by the DMA, counted from the half and full events
+static volatile uint32_t filled_halves = 0;
 
 int sd_write_blocks(char *buf, uint32_t block, uint32_t count);
 uint8_t custom_spisdcard_init(void);
@@ -76,15 +80,43 @@ uint32_t elapsed_time(void)
     return (0xFFFFFFFF - timer1_value_read());
 }
 
-static inline void restart_adc_DMA(char *buffer, size_t size)
+static void adc_isr(void)
+{
+    uint32_t pending = adc_ev_pending_read();
+    adc_ev_pending_write(pending);
+    if (pending & (1 << CSR_ADC_EV_PENDING_HALF_OFFSET))
+        filled_halves++;
+    if (pending & (1 << CSR_ADC_EV_PENDING_FULL_OFFSET))
+        filled_halves++;
+}
+
+static inline void start_adc_ring_DMA(char *buffer, size_t size)
 {
+    adc_enable_write(0);
     adc_dma_enable_write(0);
     adc_dma_base_write((uint64_t)buffer);
     adc_dma_length_write(size);
+    adc_dma_loop_write(1);
+    adc_ev_pending_write(adc_ev_pending_read());
+#ifdef CONFIG_CPU_HAS_INTERRUPT
+    irq_attach(ADC_INTERRUPT, adc_isr);
+    irq_setmask(irq_getmask() | (1 << ADC_INTERRUPT));
+    adc_ev_enable_write((1 << CSR_ADC_EV_ENABLE_HALF_OFFSET) | (1 << CSR_ADC_EV_ENABLE_FULL_OFFSET));
+#endif
     adc_dma_enable_write(1);
     adc_enable_write(1);
 }
 
+static inline void wait_for_half(uint32_t pushed_halves)
+{
+    while (filled_halves == pushed_halves)
+    {
+#ifndef CONFIG_CPU_HAS_INTERRUPT
+        adc_isr();
+#endif
+    }
+}
+
 static inline uint32_t push_on_sdcard(char *buffer, size_t size, uint32_t block_address)
 {
     // Write the contents of the DMA buffer to the SDCard
@@ -104,12 +136,60 @@ static void test_sdcard_write_speed(char *buffer, size_t size)
     printf("Write Speed: %d KB/s\n", size / (elapsed / (CONFIG_CLOCK_FREQUENCY/1000)));
 }
 
-static inline void swap_buffers(char** current_buffer, char** next_buffer)
+static void test_dma_write_speed(char *buffer, size_t size)
+{
+    // The DMA is fed with a counter at one word per clock, done tells when the buffer is written
+    adc_enable_write(0);
+    adc_dma_enable_write(0);
+    adc_dma_base_write((uint64_t)buffer);
+    adc_dma_length_write(size);
+    adc_dma_loop_write(0);
+    adc_dma_test_write(1);
+    start_timer1();
+    adc_dma_enable_write(1);
+    while (adc_dma_done_read() == 0);
+    uint32_t elapsed = elapsed_time();
+    adc_dma_enable_write(0);
+    adc_dma_test_write(0);
+    flush_cpu_dcache();
+    flush_l2_cache();
+    // The DMA byte reverses the words for a little endian CPU, the counter reads swapped
+    uint32_t *words = (uint32_t *)buffer;
+    uint32_t errors = 0;
+    for (uint32_t i = 0; i < size / 4; i++)
+        if (words[i] != __builtin_bswap32(i))
+            errors++;
+    printf("DMA Write Speed: %d KB/s, %d errors\n", size / (elapsed / (CONFIG_CLOCK_FREQUENCY/1000)), errors);
+}
+
+#ifdef CSR_CUSTOM_SPI_SD_LOGGER_CONTROL_ADDR
+// The logger writes the ADC samples to the SDCard in gateware, the CPU only reports the progress
+static uint32_t log_on_sdcard(uint32_t block_address, uint32_t count)
 {
-    char* temp = *current_buffer;
-    *current_buffer = *next_buffer;
-    *next_buffer = temp;
+    adc_enable_write(0);
+    adc_dma_enable_write(0);
+    custom_spi_sd_logger_address_write(block_address);
+    custom_spi_sd_logger_count_write(count);
+    custom_spi_sd_logger_control_write(1 << CSR_CUSTOM_SPI_SD_LOGGER_CONTROL_START_OFFSET);
+    adc_enable_write(1);
+    while (custom_spi_sd_logger_status_active_read())
+    {
+        busy_wait_us(1000000); // 1 second
+        printf("Blocks written: %d, FIFO level: %d, dropped words: %d\n",
+            custom_spi_sd_logger_written_read(),
+            custom_spi_sd_logger_level_read(),
+            custom_spi_sd_logger_dropped_read());
+    }
+    adc_enable_write(0);
+    if (custom_spi_sd_logger_status_error_read())
+        printf("Logger error %d, CMD25 response: 0x%02X, write error %d, data response: 0x%02X\n",
+            custom_spi_sd_logger_status_error_read(),
+            custom_spi_sd_logger_status_r1_read(),
+            custom_spi_sd_logger_status_write_error_read(),
+            custom_spi_sd_logger_status_response_read());
+    return block_address + custom_spi_sd_logger_written_read();
 }
+#endif
 
 static inline void stop_leds(void)
 {
@@ -154,20 +234,38 @@ int main(void)
         putsnonl(header);
         putsnonl("Writing header at block address 0\n");
         block_address = push_on_sdcard(header, sizeof(header), block_address);
+        test_dma_write_speed(DMA_buffer, sizeof(DMA_buffer));
         putsnonl("Starting data acquisition...\n");
         stop_leds();
-        char* current_buffer = DMA_buffer1;
-        char* next_buffer = DMA_buffer2;
-        restart_adc_DMA(next_buffer, DMA_BUFFER_SIZE);
+#ifdef CSR_CUSTOM_SPI_SD_LOGGER_CONTROL_ADDR
+        block_address = log_on_sdcard(block_address, TOTAL_BLOCKS - block_address);
+        putsnonl("Data acquisition completed\n");
+        printf("Total blocks written: %d\n", block_address);
+        printf("Dropped words: %d, lost conversions: %d\n", custom_spi_sd_logger_dropped_read(), adc_overflows_read());
+#else
+        uint32_t pushed_halves = 0;
+        uint32_t lost_halves = 0;
+        start_adc_ring_DMA(DMA_buffer, 2*DMA_BUFFER_SIZE);
         while (block_address < TOTAL_BLOCKS)
         {
-           while (adc_dma_done_read() == 0);
-           swap_buffers(&current_buffer, &next_buffer);
-           restart_adc_DMA(next_buffer, DMA_BUFFER_SIZE);
-           block_address = push_on_sdcard(current_buffer, DMA_BUFFER_SIZE, block_address);
+           wait_for_half(pushed_halves);
+           if (filled_halves - pushed_halves > 1)
+           {
+               // the DMA went over a half before it was written to the SDCard
+               lost_halves += filled_halves - pushed_halves - 1;
+               pushed_halves = filled_halves - 1;
+           }
+           flush_cpu_dcache();
+           flush_l2_cache();
+           block_address = push_on_sdcard(DMA_buffer + (pushed_halves % 2) * DMA_BUFFER_SIZE, DMA_BUFFER_SIZE, block_address);
+           pushed_halves++;
         }
+        adc_enable_write(0);
+        adc_dma_enable_write(0);
         putsnonl("Data acquisition completed\n");
         printf("Total blocks written: %d\n", block_address);
+        printf("Overwritten buffers: %d, lost conversions: %d\n", lost_halves, adc_overflows_read());
+#endif
         while (1)
         {
             start_leds();
@@ -63,10 +63,13 @@ class Top(BaseSoC):
         self.add_custom_spi(loopback=kwargs.get("custom_spi_loopback", False), no_clk_div=kwargs.get("custom_spi_no_clk_div", False))
         self.add_timer(name="timer1")
         self.add_adc()
+        self.comb += self.adc.tap.connect(self.custom_spi.sd_logger.sink)
         
     def add_custom_spi(self, software_debug=True, loopback=False, no_clk_div=False):
         from fusion_rtl.sdcard.spi import SPI 
         self.submodules.custom_spi = SPI(sys_clk_freq=self.sys_clk_freq, with_clk_div=not no_clk_div)
+        self.custom_spi.add_block_writer(soc=self)
+        self.custom_spi.add_sd_logger(fifo_depth=8192, endianness=self.cpu.endianness)
         if loopback:
             self.comb += [
                 self.custom_spi.miso.eq(self.custom_spi.mosi)
@@ -95,6 +98,7 @@ class Top(BaseSoC):
             target_freq=3e6,
             fifo_depth=4096*1,
             with_dma=True,
+            dma_tap=True,
             soc=self,
             only_ch="cha"
         )
@@ -113,6 +117,8 @@ class Top(BaseSoC):
             self.adc.pads.ready_strobe.eq(adc_pads.ready_strobe),
         ]
         self.add_csr("adc")
+        if self.irq.enabled:
+            self.irq.add("adc", use_loc_if_exists=True)
         
         
         